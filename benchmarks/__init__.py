@@ -0,0 +1,3 @@
+"""
+Benchmark suite with synthetic media and subtitle corpora.
+"""
@@ -0,0 +1,122 @@
+"""
+Run the benchmark suite:
+
+    python -m benchmarks --output results.json --baseline baseline.json
+"""
+
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+
+from .suite import DEFAULT_WORKFLOW, Result, Suite, compare, run_suite
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Benchmark suite")
+
+    parser.add_argument("--output", default=None, help="Write the JSON report to a file")
+    parser.add_argument(
+        "--baseline", default=None, help="JSON report to compare the results against"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Relative slowdown of the median reported as a regression (default: 0.2)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs of each benchmark (default: 3)"
+    )
+    parser.add_argument(
+        "--events",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Events of the subtitle corpora (default: 1000 10000 100000)",
+    )
+    parser.add_argument(
+        "--streams",
+        type=int,
+        nargs="+",
+        default=[2, 8],
+        help="Subtitle streams of the media corpora (default: 2 8)",
+    )
+    parser.add_argument(
+        "--files",
+        type=int,
+        nargs="+",
+        default=[10000],
+        help="Files of the library trees (default: 10000)",
+    )
+    parser.add_argument(
+        "--workflow-file",
+        default=DEFAULT_WORKFLOW,
+        help="Postprocessing workflow (default: postprocess.yaml)",
+    )
+    parser.add_argument(
+        "--only", default=None, help="Only run benchmarks matching a glob, e.g. 'prober.*'"
+    )
+    parser.add_argument(
+        "--work-dir",
+        default=None,
+        help="Directory of the generated corpora, kept between runs (default: temporary)",
+    )
+
+    return parser.parse_args()
+
+
+def print_result(result: Result):
+    if result.skipped:
+        print(f"{result.name:<40} skipped ({result.skipped})")
+    else:
+        data = result.to_dict()
+        print(f"{result.name:<40} {data['median']:>10.4f}s  (min {data['min']:.4f}s)")
+
+
+def main() -> int:
+    args = get_args()
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="subextractor-bench-")
+
+    suite = Suite(
+        work_dir,
+        repeat=args.repeat,
+        events=tuple(args.events),
+        streams=tuple(args.streams),
+        files=tuple(args.files),
+        workflow_file=args.workflow_file,
+        only=args.only,
+    )
+
+    try:
+        report = run_suite(suite, print_result)
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = 0
+    print(f"\nCompared to {args.baseline}:")
+    for entry in compare(report, baseline, args.threshold):
+        flag = "REGRESSION" if entry["regression"] else ""
+        print(
+            f"{entry['name']:<40} {entry['baseline']:>10.4f}s -> "
+            f"{entry['median']:.4f}s  x{entry['ratio']:.2f} {flag}"
+        )
+        regressions += entry["regression"]
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
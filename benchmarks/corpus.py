@@ -0,0 +1,277 @@
+"""
+Generators of synthetic media and subtitle corpora.
+
+Every generator is seeded, the same parameters always give the same files.
+"""
+
+import os
+import random
+import shutil
+import struct
+import subprocess
+
+import pysubs2
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog what are you doing here "
+    "we have to go now i told you so never again look out behind"
+).split()
+
+# PGS segment types
+PCS, WDS, PDS, ODS, END = 0x16, 0x17, 0x14, 0x15, 0x80
+
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 9))).capitalize()
+
+
+def _drawing(rng: random.Random) -> str:
+    points = " ".join(f"{rng.randint(0, 400)} {rng.randint(0, 200)}" for _ in range(6))
+    return f"m 0 0 l {points}"
+
+
+def generate_subtitles(
+    path: str,
+    events: int,
+    drawings: float = 0.05,
+    tags: float = 0.3,
+    comments: float = 0.02,
+    seed: int = 0,
+) -> str:
+    """
+    Write a subtitle file of the given number of events, its format is taken
+    from the extension.
+
+    Args:
+        path: Output path, .ass, .srt or .vtt
+        events: Number of events
+        drawings: Ratio of drawing events, ASS only
+        tags: Ratio of events with positioning and styling override tags
+        comments: Ratio of comment events, ASS only
+        seed: Random seed
+
+    Returns:
+        The output path
+    """
+    rng = random.Random(seed)
+    ass = path.lower().endswith(".ass")
+
+    subs = pysubs2.SSAFile()
+    subs.info["PlayResX"] = "1280"
+    subs.info["PlayResY"] = "720"
+    subs.styles["Sign"] = pysubs2.SSAStyle(fontsize=30, alignment=pysubs2.Alignment.TOP_CENTER)
+
+    start = 0
+    for _ in range(events):
+        start += rng.randint(200, 3000)
+        event = pysubs2.SSAEvent(start=start, end=start + rng.randint(500, 4000))
+        roll = rng.random()
+
+        if ass and roll < drawings:
+            x, y = rng.randint(0, 1280), rng.randint(0, 720)
+            event.style = "Sign"
+            event.text = f"{{\\an7\\pos({x},{y})\\bord2\\p1}}{_drawing(rng)}{{\\p0}}"
+        elif ass and roll < drawings + comments:
+            event.type = "Comment"
+            event.text = _sentence(rng)
+        elif roll < drawings + comments + tags:
+            x, y = rng.randint(0, 1280), rng.randint(0, 720)
+            tag = rng.choice(
+                [
+                    f"\\pos({x},{y})",
+                    f"\\move({x},{y},{x + 100},{y})",
+                    f"\\an8\\fs{rng.randint(20, 60)}",
+                    f"\\clip(0,0,{x},{y})\\shad2",
+                    "\\i1",
+                ]
+            )
+            event.text = f"{{{tag}}}{_sentence(rng)}\\N{_sentence(rng)}"
+        else:
+            event.text = _sentence(rng)
+
+        subs.events.append(event)
+
+    subs.save(path)
+    return path
+
+
+def _rle_line(pixels: list[int]) -> bytes:
+    """Encode a line of palette indices with the PGS run-length encoding."""
+    out = bytearray()
+    i = 0
+
+    while i < len(pixels):
+        color = pixels[i]
+        run = 1
+        while i + run < len(pixels) and pixels[i + run] == color and run < 16383:
+            run += 1
+        i += run
+
+        if color == 0:
+            out += bytes([0, run]) if run < 64 else bytes([0, 0x40 | run >> 8, run & 0xFF])
+        elif run < 3:
+            out += bytes([color]) * run
+        elif run < 64:
+            out += bytes([0, 0x80 | run, color])
+        else:
+            out += bytes([0, 0xC0 | run >> 8, run & 0xFF, color])
+
+    return bytes(out + b"\x00\x00")
+
+
+def _segment(pts: int, kind: int, payload: bytes) -> bytes:
+    return b"PG" + struct.pack(">IIBH", pts, 0, kind, len(payload)) + payload
+
+
+def _bitmap(rng: random.Random, width: int, height: int) -> list[list[int]]:
+    """A bitmap of word-like blocks on a transparent background."""
+    lines = [[0] * width for _ in range(height)]
+    x = 4
+    while x < width - 12:
+        w = rng.randint(4, 12)
+        top = rng.randint(2, 6)
+        for y in range(top, height - 2):
+            lines[y][x : x + w] = [1] * w
+        x += w + rng.randint(2, 8)
+
+    return lines
+
+
+def generate_pgs(
+    path: str,
+    events: int,
+    size: tuple[int, int] = (1280, 720),
+    seed: int = 0,
+) -> str:
+    """Write a PGS (.sup) stream of the given number of bitmap subtitles."""
+    rng = random.Random(seed)
+    video_w, video_h = size
+    palette = bytes([0, 16, 128, 128, 0, 1, 235, 128, 128, 255])
+
+    with open(path, "wb") as f:
+        end = 0
+        for number in range(events):
+            start = end + rng.randint(200, 3000)
+            end = start + rng.randint(500, 4000)
+            width, height = rng.randint(120, 600), 40
+            x, y = (video_w - width) // 2, video_h - height - 40
+
+            rle = b"".join(_rle_line(line) for line in _bitmap(rng, width, height))
+            window = struct.pack(">BBHHHH", 1, 0, x, y, width, height)
+
+            pts = start * 90
+            f.write(
+                _segment(
+                    pts,
+                    PCS,
+                    struct.pack(">HHBHBBBB", video_w, video_h, 0x10, number * 2, 0x80, 0, 0, 1)
+                    + struct.pack(">HBBHH", 0, 0, 0, x, y),
+                )
+            )
+            f.write(_segment(pts, WDS, window))
+            f.write(_segment(pts, PDS, bytes([0, 0]) + palette))
+            f.write(
+                _segment(
+                    pts,
+                    ODS,
+                    struct.pack(">HBB", 0, 0, 0xC0)
+                    + (len(rle) + 4).to_bytes(3, "big")
+                    + struct.pack(">HH", width, height)
+                    + rle,
+                )
+            )
+            f.write(_segment(pts, END, b""))
+
+            # an empty composition clears the subtitle
+            pts = end * 90
+            f.write(
+                _segment(
+                    pts,
+                    PCS,
+                    struct.pack(">HHBHBBBB", video_w, video_h, 0x10, number * 2 + 1, 0, 0, 0, 0),
+                )
+            )
+            f.write(_segment(pts, WDS, window))
+            f.write(_segment(pts, END, b""))
+
+    return path
+
+
+def generate_media(
+    path: str,
+    text_streams: int = 2,
+    bitmap_streams: int = 0,
+    events: int = 200,
+    seed: int = 0,
+) -> str:
+    """
+    Mux a video with synthetic subtitle streams using ffmpeg.
+
+    The video is a black lavfi source lasting until the last event. Text streams
+    alternate between SRT and ASS, bitmap streams are PGS.
+
+    Raises:
+        RuntimeError: If ffmpeg is not available or fails
+    """
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg is not installed")
+
+    work_dir = path + ".parts"
+    os.makedirs(work_dir, exist_ok=True)
+
+    try:
+        inputs, codecs = [], []
+        duration = 1
+
+        for i in range(text_streams):
+            ext = "srt" if i % 2 == 0 else "ass"
+            part = generate_subtitles(
+                os.path.join(work_dir, f"{i}.{ext}"), events, seed=seed + i
+            )
+            inputs += ["-i", part]
+            codecs.append("srt" if ext == "srt" else "ass")
+            duration = max(duration, pysubs2.load(part).events[-1].end // 1000 + 1)
+
+        for i in range(bitmap_streams):
+            part = generate_pgs(
+                os.path.join(work_dir, f"{i}.sup"), events, seed=seed + text_streams + i
+            )
+            inputs += ["-i", part]
+            codecs.append("copy")
+            duration = max(duration, events * 7 + 1)  # upper bound of the last end
+
+        video = ["-f", "lavfi", "-i", f"color=c=black:s=1280x720:r=1:d={duration}"]
+        cmd = ["ffmpeg", "-v", "error", "-y", *video, *inputs, "-map", "0:v"]
+        for i, codec in enumerate(codecs, 1):
+            cmd += ["-map", f"{i}:s", f"-c:s:{i - 1}", codec]
+            cmd += [f"-metadata:s:s:{i - 1}", "language=eng"]
+
+        cmd += ["-c:v", "mpeg4", path]
+
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {result.stderr.strip()}")
+
+        return path
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def generate_tree(
+    root: str,
+    dirs: int = 100,
+    files_per_dir: int = 10,
+    extensions: tuple[str, ...] = ("mkv", "srt", "ass", "nfo", "jpg"),
+    depth: int = 2,
+) -> str:
+    """Create a library tree of empty files, dirs are spread over depth levels."""
+    for d in range(dirs):
+        parts = [f"d{(d // 10**level) % 10}" for level in range(depth - 1)]
+        directory = os.path.join(root, *parts, f"show{d}")
+        os.makedirs(directory, exist_ok=True)
+
+        for i in range(files_per_dir):
+            ext = extensions[i % len(extensions)]
+            open(os.path.join(directory, f"episode{i}.{ext}"), "w").close()
+
+    return root
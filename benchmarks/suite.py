@@ -0,0 +1,298 @@
+"""
+Benchmarks of the extraction and postprocessing hot paths.
+
+Each benchmark times a function over synthetic corpora and reports the
+individual runs. Benchmarks needing external tools (ffmpeg, ffprobe,
+tesseract) are reported as skipped when the tool is missing.
+"""
+
+import fnmatch
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+
+import pysubs2
+
+import extract
+from module import ExtractionModule, PostprocessorModule
+from postprocessing import SubtitleFormatter
+from postprocessing.runner import WorkflowRunner
+
+from .corpus import generate_media, generate_subtitles, generate_tree
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_WORKFLOW = os.path.join(ROOT, "postprocess.yaml")
+
+FORMAT_VERSION = 1
+
+
+@dataclass
+class Result:
+    name: str
+    params: dict[str, Any]
+    runs: list[float] = field(default_factory=list)
+    skipped: str | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        if self.skipped:
+            return {"params": self.params, "skipped": self.skipped}
+
+        return {
+            "params": self.params,
+            "runs": self.runs,
+            "min": min(self.runs),
+            "median": statistics.median(self.runs),
+        }
+
+
+def measure(
+    func: Callable[[Any], Any], repeat: int, setup: Callable[[], Any] | None = None
+) -> list[float]:
+    """Time func over repeated runs, the value returned by setup is passed to it untimed."""
+    runs = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        func(arg)
+        runs.append(time.perf_counter() - start)
+
+    return runs
+
+
+@dataclass
+class Suite:
+    work_dir: str
+    repeat: int = 3
+    events: tuple[int, ...] = (1000, 10000, 100000)
+    streams: tuple[int, ...] = (2, 8)
+    files: tuple[int, ...] = (10000,)
+    workflow_file: str = DEFAULT_WORKFLOW
+    only: str | None = None
+
+    def selected(self, name: str) -> bool:
+        return self.only is None or fnmatch.fnmatch(name, self.only)
+
+    def run(self) -> Iterator[Result]:
+        for benchmark in (
+            self.bench_workflow_runner,
+            self.bench_formatter,
+            self.bench_filelist,
+            self.bench_prober,
+            self.bench_text_extractor,
+            self.bench_bitmap_extractor,
+        ):
+            yield from benchmark()
+
+    def _subtitles(self, fmt: str, events: int) -> str:
+        path = os.path.join(self.work_dir, "subtitles", f"{events}.{fmt}")
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            generate_subtitles(path, events)
+
+        return path
+
+    def _media(self, text_streams: int, bitmap_streams: int) -> str:
+        directory = os.path.join(self.work_dir, f"media-{text_streams}-{bitmap_streams}")
+        path = os.path.join(directory, "video.mkv")
+        if not os.path.exists(path):
+            os.makedirs(directory, exist_ok=True)
+            generate_media(path, text_streams, bitmap_streams)
+
+        return path
+
+    def bench_workflow_runner(self) -> Iterator[Result]:
+        formatter = SubtitleFormatter(self.workflow_file)
+
+        for fmt in ("ass", "srt"):
+            for events in self.events:
+                name = f"workflow_runner.{fmt}.{events}"
+                if not self.selected(name):
+                    continue
+
+                path = self._subtitles(fmt, events)
+                plan = formatter.plans[fmt]
+                runs = measure(
+                    lambda subs: WorkflowRunner(plan, subs).process(),
+                    self.repeat,
+                    lambda: pysubs2.load(path),
+                )
+                yield Result(name, {"events": events}, runs)
+
+    def bench_formatter(self) -> Iterator[Result]:
+        formatter = SubtitleFormatter(self.workflow_file)
+
+        for fmt in ("ass", "srt"):
+            for events in self.events:
+                name = f"formatter.{fmt}.{events}"
+                if not self.selected(name):
+                    continue
+
+                source = self._subtitles(fmt, events)
+                target = os.path.join(self.work_dir, f"formatted.{fmt}")
+
+                def setup():
+                    shutil.copyfile(source, target)
+                    return target
+
+                runs = measure(formatter.format, self.repeat, setup)
+                yield Result(name, {"events": events}, runs)
+
+    def bench_filelist(self) -> Iterator[Result]:
+        modules = {
+            "extractor": lambda: ExtractionModule(extract.ExtractorConfig()),
+            "postprocessor": lambda: PostprocessorModule(self.workflow_file),
+        }
+
+        for files in self.files:
+            root = os.path.join(self.work_dir, f"library-{files}")
+            for kind, create in modules.items():
+                name = f"get_filelist.{kind}.{files}"
+                if not self.selected(name):
+                    continue
+
+                if not os.path.exists(root):
+                    generate_tree(root, dirs=max(1, files // 10), files_per_dir=10, depth=3)
+
+                runs = measure(lambda module: module.get_filelist(root), self.repeat, create)
+                yield Result(name, {"files": files}, runs)
+
+    def bench_prober(self) -> Iterator[Result]:
+        probes = {"native": True, "ffprobe": False}
+
+        for streams in self.streams:
+            for kind, native in probes.items():
+                name = f"prober.{kind}.{streams}"
+                if not self.selected(name):
+                    continue
+
+                params = {"streams": streams}
+                missing = _missing("ffmpeg", *([] if native else ["ffprobe"]))
+                if missing:
+                    yield Result(name, params, skipped=missing)
+                    continue
+
+                path = self._media(streams, 0)
+                runs = measure(
+                    lambda prober: prober.get_subtitle_streams(path, "eng"),
+                    self.repeat,
+                    lambda: extract.MediaProber(native_matroska=native),
+                )
+                yield Result(name, params, runs)
+
+    def _bench_extractor(
+        self, name: str, extractor_class, text_streams: int, bitmap_streams: int, tools
+    ) -> Result:
+        params = {"text_streams": text_streams, "bitmap_streams": bitmap_streams}
+        missing = _missing(*tools)
+        if missing:
+            return Result(name, params, skipped=missing)
+
+        path = self._media(text_streams, bitmap_streams)
+        config = extract.ExtractorConfig(overwrite=True, languages=("all",))
+
+        def setup():
+            # remove the outputs of the previous run
+            directory = os.path.dirname(path)
+            for entry in os.listdir(directory):
+                if entry != os.path.basename(path):
+                    os.remove(os.path.join(directory, entry))
+
+            return extractor_class(config, extract.MediaProber())
+
+        runs = measure(lambda extractor: extractor.extract(path), self.repeat, setup)
+        return Result(name, params, runs)
+
+    def bench_text_extractor(self) -> Iterator[Result]:
+        for streams in self.streams:
+            name = f"text_extractor.{streams}"
+            if self.selected(name):
+                yield self._bench_extractor(
+                    name, extract.TextSubtitleExtractor, streams, 0, ("ffmpeg", "ffprobe")
+                )
+
+    def bench_bitmap_extractor(self) -> Iterator[Result]:
+        for streams in self.streams:
+            name = f"bitmap_extractor.{streams}"
+            if self.selected(name):
+                yield self._bench_extractor(
+                    name,
+                    extract.BitmapSubtitleExtractor,
+                    0,
+                    streams,
+                    ("ffmpeg", "ffprobe", "tesseract"),
+                )
+
+
+def _missing(*tools: str) -> str | None:
+    missing = [tool for tool in tools if shutil.which(tool) is None]
+    return f"missing {', '.join(missing)}" if missing else None
+
+
+def _git_revision() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        )
+    except OSError:
+        return None
+
+    return result.stdout.strip() or None
+
+
+def run_suite(suite: Suite, on_result: Callable[[Result], None] | None = None) -> dict:
+    """Run the benchmarks of a suite, returning the JSON report."""
+    results = {}
+    for result in suite.run():
+        results[result.name] = result.to_dict()
+        if on_result is not None:
+            on_result(result)
+
+    return {
+        "version": FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeat": suite.repeat,
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float = 0.2) -> list[dict]:
+    """
+    Compare the median times of a report with a baseline.
+
+    Args:
+        report: Report of the current run
+        baseline: Stored report to compare against
+        threshold: Relative slowdown tolerated before reporting a regression
+
+    Returns:
+        One entry per benchmark timed in both reports, with the ratio of the
+        medians and whether it is a regression
+    """
+    comparison = []
+
+    for name, result in report["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None or "median" not in result or "median" not in base:
+            continue
+
+        ratio = result["median"] / base["median"] if base["median"] else float("inf")
+        comparison.append(
+            {
+                "name": name,
+                "median": result["median"],
+                "baseline": base["median"],
+                "ratio": ratio,
+                "regression": ratio > 1 + threshold,
+            }
+        )
+
+    return comparison
@@ -1,4 +1,5 @@
 import argparse
+import os
 
 
 def parse_args():
@@ -18,12 +19,35 @@ def parse_args():
         default=False,
         help="Enable app watch mode (default: false)",
     )
+    parser.add_argument(
+        "--app-watch-stability-window",
+        type=float,
+        default=5,
+        help="Seconds a watched file must be unchanged before processing (default: 5)",
+    )
     parser.add_argument(
         "--app-scan-interval",
         type=int,
         default=0,
         help="App scan interval in mins (default: 0), 0=disabled",
     )
+    parser.add_argument(
+        "--app-state-file",
+        default=None,
+        help="SQLite file indexing processed files, scans then only process changes (default: disabled)",
+    )
+    parser.add_argument(
+        "--app-pipeline",
+        action="store_true",
+        default=False,
+        help="Postprocess subtitles while other files are still extracted (default: false)",
+    )
+    parser.add_argument(
+        "--app-pipeline-queue-size",
+        type=int,
+        default=64,
+        help="Maximum number of subtitles waiting for postprocessing (default: 64)",
+    )
     parser.add_argument(
         "--app-enabled-extractor",
         action="store_true",
@@ -49,6 +73,29 @@ def parse_args():
         help="Disable postprocessor",
     )
 
+    parser.add_argument(
+        "--app-metrics-port",
+        type=int,
+        default=0,
+        help="Port serving stage metrics at /metrics in the Prometheus text format (default: 0), 0=disabled",
+    )
+    parser.add_argument(
+        "--app-metrics-host",
+        default="127.0.0.1",
+        help="Address the metrics endpoint listens on (default: 127.0.0.1)",
+    )
+    parser.add_argument(
+        "--app-metrics-file",
+        default=None,
+        help="JSON file the stage metrics are written to periodically (default: disabled)",
+    )
+    parser.add_argument(
+        "--app-metrics-interval",
+        type=float,
+        default=15,
+        help="Seconds between writes of the metrics file (default: 15)",
+    )
+
     # Extractor settings
     parser.add_argument(
         "--extractor-exclude-enable",
@@ -74,6 +121,30 @@ def parse_args():
         default=False,
         help="Extract bitmap (default: false)",
     )
+    parser.add_argument(
+        "--extractor-workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of files to extract concurrently (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--extractor-probe-cache-file",
+        type=str,
+        default=None,
+        help="Persistent probe cache database path (default: None)",
+    )
+    parser.add_argument(
+        "--extractor-native-probe",
+        action="store_true",
+        default=True,
+        help="Read subtitle tracks of Matroska files without ffprobe (default: true)",
+    )
+    parser.add_argument(
+        "--no-extractor-native-probe",
+        dest="extractor_native_probe",
+        action="store_false",
+        help="Always probe files with ffprobe",
+    )
     parser.add_argument(
         "--extractor-config-overwrite",
         action="store_true",
@@ -87,6 +158,29 @@ def parse_args():
         default=["srt", "ass"],
         help="List of desired formats (default: srt ass)",
     )
+    parser.add_argument(
+        "--extractor-config-ocr-workers",
+        type=int,
+        default=1,
+        help="Number of bitmap streams to OCR concurrently (default: 1)",
+    )
+    parser.add_argument(
+        "--extractor-config-keep-sup",
+        action="store_true",
+        default=True,
+        help="Keep extracted .sup files of bitmap subtitles (default: true)",
+    )
+    parser.add_argument(
+        "--no-extractor-config-keep-sup",
+        dest="extractor_config_keep_sup",
+        action="store_false",
+        help="OCR bitmap subtitles piped from ffmpeg without writing .sup files",
+    )
+    parser.add_argument(
+        "--extractor-config-ocr-cache-file",
+        default=None,
+        help="SQLite file caching OCR results of repeated bitmaps (default: disabled)",
+    )
     parser.add_argument(
         "--extractor-config-languages",
         nargs="+",
@@ -125,6 +219,35 @@ def parse_args():
         default="postprocess.yaml",
         help="Postprocessor workflow file (default: postprocess.yaml)",
     )
+    parser.add_argument(
+        "--postprocessor-workers",
+        type=int,
+        default=1,
+        help="Number of processes formatting subtitles in parallel (default: 1)",
+    )
+    parser.add_argument(
+        "--postprocessor-chunksize",
+        type=int,
+        default=16,
+        help="Number of files sent to a postprocessing process at once (default: 16)",
+    )
+    parser.add_argument(
+        "--postprocessor-index-file",
+        type=str,
+        default=None,
+        help="SQLite file recording the workflow and output hash of postprocessed files, files already processed by the same workflow are skipped (default: disabled)",
+    )
+    parser.add_argument(
+        "--postprocessor-profile",
+        action="store_true",
+        default=False,
+        help="Profile the time, item counts and allocations of every workflow task and log a ranked report, postprocesses serially (default: false)",
+    )
+    parser.add_argument(
+        "--postprocessor-profile-file",
+        default=None,
+        help="With --postprocessor-profile, write cProfile statistics of the workflow tasks to a file, readable with pstats (default: disabled)",
+    )
 
     args = parser.parse_args()
 
@@ -138,18 +261,37 @@ LOG_LEVEL = config.log_level
 LOG_FILE = config.log_file
 
 APP_WATCH = config.app_watch
+APP_WATCH_STABILITY_WINDOW = config.app_watch_stability_window
 APP_SCAN_INTERVAL = config.app_scan_interval
+APP_STATE_FILE = config.app_state_file
+APP_PIPELINE = config.app_pipeline
+APP_PIPELINE_QUEUE_SIZE = config.app_pipeline_queue_size
 APP_ENABLED_EXTRACTOR = config.app_enabled_extractor
 APP_ENABLED_POSTPROCESSOR = config.app_enabled_postprocessor
+APP_METRICS_PORT = config.app_metrics_port
+APP_METRICS_HOST = config.app_metrics_host
+APP_METRICS_FILE = config.app_metrics_file
+APP_METRICS_INTERVAL = config.app_metrics_interval
 EXTRACTOR_EXCLUDE_ENABLE = config.extractor_exclude_enable
 EXTRACTOR_EXCLUDE_FILE = config.extractor_exclude_file
 EXTRACTOR_EXCLUDE_APPEND = config.extractor_exclude_append
 EXTRACTOR_EXTRACT_BITMAP = config.extractor_extract_bitmap
+EXTRACTOR_WORKERS = config.extractor_workers
+EXTRACTOR_PROBE_CACHE_FILE = config.extractor_probe_cache_file
+EXTRACTOR_NATIVE_PROBE = config.extractor_native_probe
 EXTRACTOR_CONFIG_OVERWRITE = config.extractor_config_overwrite
 EXTRACTOR_CONFIG_DESIRED_FORMATS = config.extractor_config_desired_formats
 EXTRACTOR_CONFIG_LANGUAGES = config.extractor_config_languages
+EXTRACTOR_CONFIG_OCR_WORKERS = config.extractor_config_ocr_workers
+EXTRACTOR_CONFIG_KEEP_SUP = config.extractor_config_keep_sup
+EXTRACTOR_CONFIG_OCR_CACHE_FILE = config.extractor_config_ocr_cache_file
 EXTRACTOR_CONFIG_UNKNOWN_LANGUAGE_AS = config.extractor_config_unknown_language_as
 POSTPROCESSOR_EXCLUDE_ENABLE = config.postprocessor_exclude_enable
 POSTPROCESSOR_EXCLUDE_FILE = config.postprocessor_exclude_file
 POSTPROCESSOR_EXCLUDE_APPEND = config.postprocessor_exclude_append
 POSTPROCESSOR_CONFIG_WORKFLOW_FILE = config.postprocessor_config_workflow_file
+POSTPROCESSOR_WORKERS = config.postprocessor_workers
+POSTPROCESSOR_CHUNKSIZE = config.postprocessor_chunksize
+POSTPROCESSOR_INDEX_FILE = config.postprocessor_index_file
+POSTPROCESSOR_PROFILE = config.postprocessor_profile
+POSTPROCESSOR_PROFILE_FILE = config.postprocessor_profile_file
@@ -0,0 +1,178 @@
+"""
+Persistent set of processed files shared between workers and processes.
+"""
+
+import fcntl
+import logging
+import os
+import threading
+from typing import Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# number of buffered entries written to the log with a single fsync
+DEFAULT_BATCH_SIZE = 64
+
+# the log is compacted on load when it holds this many times more lines than
+# unique entries (and at least COMPACT_MIN_LINES lines)
+COMPACT_RATIO = 2
+COMPACT_MIN_LINES = 1024
+
+ENCODING = "utf-8"
+ERRORS = "surrogateescape"
+
+
+class ExclusionStore:
+    """
+    Append-only log of file paths with an in-memory index.
+
+    The log uses the newline separated format of the excluded filelist, so
+    existing files are imported as they are. Membership checks are served from
+    an in-memory set, which is refreshed incrementally by only reading what other
+    processes appended since the last read. Appends are buffered and written in
+    batches under an exclusive file lock and fsync'd, so concurrent writers never
+    interleave lines. Duplicate lines are removed by compaction.
+    """
+
+    def __init__(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+
+        self._entries: set[str] = set()
+        self._buffer: list[str] = []
+        self._inode: int | None = None
+        self._offset = 0
+        self._lines = 0
+        self._lock = threading.RLock()
+
+        self.refresh()
+
+        if self._lines >= COMPACT_MIN_LINES and self._lines > COMPACT_RATIO * len(self):
+            self.compact()
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _read_new(self, f):
+        """Read the lines appended to the locked log since the last read."""
+        st = os.fstat(f.fileno())
+
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            # replaced by a compaction or truncated, read it again from the start
+            self._entries = set(self._buffer)
+            self._inode = st.st_ino
+            self._offset = 0
+            self._lines = 0
+
+        if st.st_size == self._offset:
+            return
+
+        f.seek(self._offset)
+        data = f.read()
+
+        # a line is only complete once its newline has been written
+        end = data.rfind(b"\n") + 1
+        lines = [line for line in data[:end].split(b"\n") if line]
+
+        self._entries.update(line.decode(ENCODING, ERRORS) for line in lines)
+        self._offset += end
+        self._lines += len(lines)
+
+    def refresh(self):
+        """Load the entries other processes added to the log."""
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                return
+
+            if st.st_ino == self._inode and st.st_size == self._offset:
+                return
+
+            with open(self.path, "rb") as f:
+                fcntl.flock(f, fcntl.LOCK_SH)
+                self._read_new(f)
+
+    def add(self, paths: Iterable[str]):
+        """Add paths to the store, they are written once a batch is full."""
+        with self._lock:
+            for path in paths:
+                if path not in self._entries:
+                    self._entries.add(path)
+                    self._buffer.append(path)
+
+            if len(self._buffer) >= self.batch_size:
+                self.flush()
+
+    def _open_locked(self, mode: str):
+        """Open the current log file with an exclusive lock."""
+        while True:
+            f = open(self.path, mode)
+            fcntl.flock(f, fcntl.LOCK_EX)
+
+            # the file may have been replaced while waiting for the lock
+            try:
+                if os.stat(self.path).st_ino == os.fstat(f.fileno()).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+
+            f.close()
+
+    def flush(self):
+        """Write the buffered entries to the log and fsync it."""
+        with self._lock:
+            if not self._buffer:
+                return
+
+            with self._open_locked("a+b") as f:
+                self._read_new(f)
+
+                data = "".join(p + "\n" for p in self._buffer).encode(ENCODING, ERRORS)
+                if f.seek(0, os.SEEK_END) != self._offset:
+                    data = b"\n" + data  # terminate a line left by a crashed writer
+
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+                self._offset = f.tell()
+                self._lines += len(self._buffer)
+                self._buffer.clear()
+
+    def compact(self):
+        """Rewrite the log without duplicate lines."""
+        with self._lock:
+            self.flush()
+
+            with self._open_locked("a+b") as f:
+                self._read_new(f)
+
+                temp_path = f"{self.path}.tmp"
+                with open(temp_path, "wb") as temp:
+                    temp.write(
+                        "".join(p + "\n" for p in sorted(self._entries)).encode(
+                            ENCODING, ERRORS
+                        )
+                    )
+                    temp.flush()
+                    os.fsync(temp.fileno())
+
+                    st = os.fstat(temp.fileno())
+
+                os.replace(temp_path, self.path)
+
+                logger.info(
+                    f"Compacted {self.path}: {self._lines} lines to {len(self._entries)}"
+                )
+
+                self._inode = st.st_ino
+                self._offset = st.st_size
+                self._lines = len(self._entries)
@@ -2,10 +2,23 @@
 Subtitle extraction module with support for text and bitmap-based subtitles.
 """
 
+from .cache import OCRCache, ProbeCache
 from .config import ExtractorConfig
 from .constants import *
-from .exceptions import ExtractionError, FFmpegError, OCRError, UnsupportedCodecError
-from .extractors import BaseExtractor, BitmapSubtitleExtractor, TextSubtitleExtractor
+from .converter import SubtitleConverter
+from .exceptions import (
+    ConversionError,
+    ExtractionError,
+    FFmpegError,
+    OCRError,
+    UnsupportedCodecError,
+)
+from .extractors import (
+    BaseExtractor,
+    BitmapSubtitleExtractor,
+    CombinedSubtitleExtractor,
+    TextSubtitleExtractor,
+)
 from .subprocess import SubprocessRunner
 from .exceptions import *
 from .prober import MediaProber, StreamInfo
@@ -0,0 +1,180 @@
+"""
+Persistent caching of media probe results.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+FileSignature = tuple[int, int, int]
+
+
+def get_file_signature(path: str) -> FileSignature:
+    """Return the (size, mtime_ns, inode) triple identifying a file's content."""
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+class ProbeCache:
+    """
+    SQLite backed store of ffprobe stream data.
+
+    Entries are keyed on the file path and the probe mode (e.g. native Matroska
+    reader or ffprobe), and are only valid while the file's size, mtime and inode
+    are unchanged, so files replaced at the same path are probed again. An empty
+    stream list is stored for files without subtitle streams. The whole table is
+    loaded into memory when the cache is opened. Hits and misses are counted by
+    the MediaProber.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(probes)")]
+        if columns and "mode" not in columns:
+            # entries of earlier versions do not record how they were probed
+            logger.info(f"Resetting probe cache without probe modes: {path}")
+            self._conn.execute("DROP TABLE probes")
+
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS probes (
+                path TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                streams TEXT NOT NULL,
+                PRIMARY KEY (path, mode)
+            )
+            """
+        )
+        self._conn.commit()
+
+        self._entries: dict[tuple[str, str], tuple[FileSignature, str]] = {}
+        self._warm_up()
+
+    def _warm_up(self):
+        rows = self._conn.execute(
+            "SELECT path, mode, size, mtime_ns, inode, streams FROM probes"
+        )
+        for path, mode, size, mtime_ns, inode, streams in rows:
+            self._entries[(path, mode)] = ((size, mtime_ns, inode), streams)
+
+        logger.info(f"Loaded {len(self._entries)} probe cache entries from {self.path}")
+
+    def get(
+        self, path: str, signature: FileSignature, mode: str
+    ) -> list[dict[str, Any]] | None:
+        """
+        Get the cached stream data of a file.
+
+        Args:
+            path: Path to the video file
+            signature: Current signature of the file
+            mode: How the file is probed, entries of other modes are ignored
+
+        Returns:
+            List of ffprobe stream dicts, or None if missing or stale
+        """
+        with self._lock:
+            entry = self._entries.get((path, mode))
+
+        if entry is None or entry[0] != signature:
+            return None
+
+        return json.loads(entry[1])
+
+    def put(
+        self,
+        path: str,
+        signature: FileSignature,
+        mode: str,
+        streams: list[dict[str, Any]],
+    ):
+        """Store the stream data of a file, replacing any previous entry of the mode."""
+        data = json.dumps(streams)
+
+        with self._lock:
+            self._entries[(path, mode)] = (signature, data)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?)",
+                (path, mode, *signature, data),
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries)}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class OCRCache:
+    """
+    SQLite backed store of OCR results keyed on bitmap content.
+
+    Keys are hashes of a decoded subtitle bitmap and the OCR language, values are
+    the raw text recognised by tesseract before any post processing. Entries are
+    looked up on demand, the table may hold a whole library's worth of bitmaps.
+    Each process opens its own connection, SQLite serialises the writers.
+    """
+
+    # stay below SQLite's limit on the number of bound parameters
+    MAX_BATCH = 500
+
+    def __init__(self, path: str):
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ocr (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: list[str]) -> dict[str, str]:
+        """Return the cached text of the given keys, missing keys are omitted."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+
+        with self._lock:
+            for i in range(0, len(keys), self.MAX_BATCH):
+                batch = keys[i : i + self.MAX_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT key, text FROM ocr WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+                found.update(rows)
+
+        return found
+
+    def put_many(self, entries: dict[str, str]):
+        """Store OCR results, replacing any previous entries."""
+        if not entries:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO ocr VALUES (?, ?)", entries.items()
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
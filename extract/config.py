@@ -16,5 +16,14 @@ class ExtractorConfig:
     languages: list[str] | tuple[str] = ("all",)
     unknown_language_as: str = "unknown"
 
+    # number of bitmap streams OCR'd concurrently in worker processes (1 = inline)
+    ocr_workers: int = 1
+
+    # write bitmap streams to .sup files, otherwise they are OCR'd from memory
+    keep_sup: bool = True
+
+    # SQLite file caching OCR results of bitmaps by content (None = disabled)
+    ocr_cache_file: str | None = None
+
     def is_language_wanted(self, language: str) -> bool:
         return "all" in self.languages or language in self.languages
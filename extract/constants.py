@@ -40,5 +40,13 @@ FFMPEG_BITMAP_FORMATS = [
     "xsub",
 ]
 
+# Codecs that can be stream copied into a subtitle file of the given format
+FFMPEG_COPY_FORMATS = {
+    "ass": "ass",
+    "ssa": "ass",
+    "subrip": "srt",
+    "srt": "srt",
+    "webvtt": "vtt",
+}
 
 SUPPORTED_VIDEO_EXTENSION = ["mkv", "mp4", "webm", "ts", "ogg"]
@@ -0,0 +1,78 @@
+"""
+In-process subtitle format conversion.
+"""
+
+import logging
+from pathlib import Path
+
+import pysubs2
+
+from .exceptions import ConversionError
+
+logger = logging.getLogger(__name__)
+
+# Script resolution FFmpeg writes when encoding unstyled subtitles to ASS
+DEFAULT_PLAY_RES = ("384", "288")
+
+# Default style of FFmpeg's ASS encoder (libavcodec/ass.c)
+DEFAULT_STYLE = pysubs2.SSAStyle(
+    fontname="Arial",
+    fontsize=16,
+    primarycolor=pysubs2.Color(255, 255, 255),
+    secondarycolor=pysubs2.Color(255, 255, 255),
+    outlinecolor=pysubs2.Color(0, 0, 0),
+    backcolor=pysubs2.Color(0, 0, 0),
+    borderstyle=1,
+    outline=1,
+    shadow=0,
+    alignment=pysubs2.Alignment.BOTTOM_CENTER,
+    marginl=10,
+    marginr=10,
+    marginv=10,
+    encoding=0,
+)
+
+
+class SubtitleConverter:
+    """Converts subtitle files between formats with pysubs2 instead of FFmpeg."""
+
+    def convert(self, source_path: str, output_paths: list[str]) -> list[str]:
+        """
+        Convert a subtitle file into several formats, parsing it only once.
+
+        Args:
+            source_path: Path to the subtitle file to convert
+            output_paths: Target paths, the format is taken from the extension
+
+        Returns:
+            List of paths that were written
+
+        Raises:
+            ConversionError: If the source file cannot be loaded
+        """
+        try:
+            subs = pysubs2.load(source_path)
+        except Exception as e:
+            raise ConversionError(f"Failed to load '{source_path}': {e}")
+
+        converted = []
+        for output_path in output_paths:
+            fmt = Path(output_path).suffix[1:].lower()
+
+            if fmt in ("ass", "ssa"):
+                # keep the resolution FFmpeg would use, workflows scale from it
+                subs.info.setdefault("PlayResX", DEFAULT_PLAY_RES[0])
+                subs.info.setdefault("PlayResY", DEFAULT_PLAY_RES[1])
+
+                # unstyled sources get FFmpeg's style instead of pysubs2's
+                if subs.format not in ("ass", "ssa"):
+                    subs.styles["Default"] = DEFAULT_STYLE.copy()
+
+            try:
+                subs.save(output_path, format_=fmt)
+                converted.append(output_path)
+                logger.debug(f"Converted {source_path} to {output_path}")
+            except Exception as e:
+                logger.error(f"Failed to convert {source_path} to {output_path}: {e}")
+
+        return converted
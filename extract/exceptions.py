@@ -17,3 +17,11 @@ class FFmpegError(ExtractionError):
 
 class OCRError(ExtractionError):
     """Raised when OCR operations fail."""
+
+
+class ConversionError(ExtractionError):
+    """Raised when subtitle format conversion fails."""
+
+
+class MatroskaError(ExtractionError):
+    """Raised when a Matroska header cannot be read natively."""
@@ -1,9 +1,12 @@
-from .base import BaseExtractor
+from .base import BaseExtractor, ExtractionPlan
 from .bitmap import BitmapSubtitleExtractor
+from .combined import CombinedSubtitleExtractor
 from .text import TextSubtitleExtractor
 
 __all__ = [
     "BaseExtractor",
     "TextSubtitleExtractor",
     "BitmapSubtitleExtractor",
+    "CombinedSubtitleExtractor",
+    "ExtractionPlan",
 ]
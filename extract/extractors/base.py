@@ -3,17 +3,69 @@ Base extractor interface
 """
 
 import logging
+import os
 from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
 
 from extract.subprocess import SubprocessRunner
 
 from ..config import ExtractorConfig
+from ..converter import SubtitleConverter
+from ..exceptions import ConversionError
 from ..path import SubtitlePath
 from ..prober import MediaProber, StreamInfo
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class ExtractionPlan:
+    """FFmpeg output mappings to be written by a single pass over a video file."""
+
+    ffmpeg_args: list[str] = field(default_factory=list)
+    output_paths: list[str] = field(default_factory=list)
+
+    # files derived in-process from an FFmpeg output, keyed on that output
+    conversions: dict[str, list[str]] = field(default_factory=dict)
+
+    # outputs read back into memory as (key, output args without the pipe url)
+    pipe_outputs: list[tuple[str, list[str]]] = field(default_factory=list)
+
+    # data read from the piped outputs by BaseExtractor.run_plan, keyed the same
+    pipe_data: dict[str, bytes] = field(default_factory=dict)
+
+    def add_output(self, stream: StreamInfo, output_path: str, copy: bool = False):
+        self.ffmpeg_args.extend(["-map", f"0:{stream.index}"])
+        if copy:
+            self.ffmpeg_args.extend(["-c", "copy"])
+
+        self.ffmpeg_args.append(output_path)
+        self.output_paths.append(output_path)
+
+    def add_pipe_output(self, stream: StreamInfo, key: str, muxer: str):
+        self.pipe_outputs.append(
+            (key, ["-map", f"0:{stream.index}", "-c", "copy", "-f", muxer])
+        )
+
+    @property
+    def pipe_keys(self) -> list[str]:
+        return [key for key, _ in self.pipe_outputs]
+
+    def add_conversion(self, source_path: str, output_paths: list[str]):
+        self.conversions.setdefault(source_path, []).extend(output_paths)
+
+    def merge(self, other: "ExtractionPlan") -> "ExtractionPlan":
+        return ExtractionPlan(
+            self.ffmpeg_args + other.ffmpeg_args,
+            self.output_paths + other.output_paths,
+            {**self.conversions, **other.conversions},
+            self.pipe_outputs + other.pipe_outputs,
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.output_paths or self.pipe_outputs)
+
+
 class BaseExtractor(ABC):
     """Base class for subtitle extractors."""
 
@@ -21,6 +73,7 @@ class BaseExtractor(ABC):
         self.config = config
         self.subprocess_runner = SubprocessRunner()
         self.media_prober = media_probe
+        self.converter = SubtitleConverter()
 
     @abstractmethod
     def extract(self, video_path: str, streams: list[StreamInfo]) -> list[str]:
@@ -36,6 +89,83 @@ class BaseExtractor(ABC):
         """
         pass
 
+    def close(self):
+        """Release resources held by the extractor."""
+        pass
+
+    @abstractmethod
+    def _run_ffmpeg_extraction(
+        self,
+        video_path: str,
+        ffmpeg_args: list[str],
+        pipe_outputs: list[list[str]] = [],
+    ) -> list[bytes]:
+        """Run FFmpeg with the given output arguments on a video file."""
+        pass
+
+    def _run_ffmpeg(
+        self,
+        video_path: str,
+        ffmpeg_args: list[str],
+        pipe_outputs: list[list[str]] = [],
+    ) -> list[bytes]:
+        """
+        Run FFmpeg on a video file.
+
+        Args:
+            video_path: Path to video file
+            ffmpeg_args: Output arguments
+            pipe_outputs: Output arguments of outputs to be read back from pipes
+
+        Returns:
+            The data written to each piped output
+
+        Raises:
+            SubprocessError: If FFmpeg fails
+        """
+        base_args = ["ffmpeg", "-v", "error", "-y", "-i", video_path]
+
+        if pipe_outputs:
+            return self.subprocess_runner.run_piped(
+                base_args + ffmpeg_args, pipe_outputs
+            )
+
+        self.subprocess_runner.run(base_args + ffmpeg_args)
+        return []
+
+    def run_plan(self, video_path: str, plan: ExtractionPlan) -> list[str]:
+        """
+        Run a single FFmpeg pass writing every output of the plan, then derive
+        the remaining formats in-process. Piped outputs are stored in plan.pipe_data.
+
+        Empty output files are removed if FFmpeg fails.
+
+        Returns:
+            List of paths written by FFmpeg followed by the converted files
+        """
+        try:
+            pipe_data = self._run_ffmpeg_extraction(
+                video_path,
+                plan.ffmpeg_args,
+                [args for _, args in plan.pipe_outputs],
+            )
+            plan.pipe_data = dict(zip(plan.pipe_keys, pipe_data))
+        except:
+            for p in plan.output_paths:
+                if os.path.exists(p) and os.path.getsize(p) == 0:
+                    os.remove(p)
+
+            raise
+
+        converted = []
+        for source_path, output_paths in plan.conversions.items():
+            try:
+                converted += self.converter.convert(source_path, output_paths)
+            except ConversionError as e:
+                logger.error(f"Subtitle conversion failed: {e}")
+
+        return plan.output_paths + converted
+
     def should_extract_stream(
         self,
         video_path: str,
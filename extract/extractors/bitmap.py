@@ -2,26 +2,238 @@
 Bitmap-based subtitle extractor with OCR support.
 """
 
+import hashlib
 import logging
+import multiprocessing
 import os
-import shutil
-import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 from babelfish import Language
-from pgsrip import Options, Sup, pgsrip
+from pgsrip import Options
+from pgsrip.media import Pgs
+from pgsrip.media_path import MediaPath
+from pgsrip.ripper import PgsToSrtRipper
+from pysrt import SubRipFile, SubRipItem
 
+import metrics
+
+from ..cache import OCRCache
+from ..config import ExtractorConfig
 from ..constants import FFMPEG_BITMAP_FORMATS
-from ..exceptions import FFmpegError, OCRError
+from ..exceptions import ConversionError, FFmpegError, OCRError
 from ..path import SubtitlePath
-from ..prober import StreamInfo
-from .base import BaseExtractor
+from ..prober import MediaProber, StreamInfo
+from .base import BaseExtractor, ExtractionPlan
 
 logger = logging.getLogger(__name__)
 
+OCR_SECONDS = metrics.histogram("subextractor_ocr_seconds", "Time OCRing a PGS stream")
+OCR_STREAMS = metrics.counter(
+    "subextractor_ocr_streams_total", "PGS streams OCR'd", ["result"]
+)
+OCR_BYTES = metrics.counter("subextractor_ocr_input_bytes_total", "Bytes of PGS data OCR'd")
+OCR_CACHE = metrics.counter(
+    "subextractor_ocr_cache_requests_total", "Lookups of bitmaps in the OCR cache", ["result"]
+)
+OCR_BACKLOG = metrics.gauge(
+    "subextractor_ocr_backlog", "PGS streams waiting for or undergoing OCR"
+)
+metrics.gauge(
+    "subextractor_ocr_cache_hit_ratio", "Ratio of OCR cache lookups that were hits"
+).set_function(metrics.hit_ratio(OCR_CACHE))
+
+
+# OCR caches opened by this process, keyed on their file path
+_ocr_caches: dict[str, OCRCache] = {}
+_ocr_caches_lock = threading.Lock()
+
+
+def _get_ocr_cache(path: str) -> OCRCache:
+    with _ocr_caches_lock:
+        if path not in _ocr_caches:
+            _ocr_caches[path] = OCRCache(path)
+
+        return _ocr_caches[path]
+
+
+def _bitmap_key(item, language: str) -> str:
+    """Hash a decoded, palette-normalised subtitle bitmap and its OCR language."""
+    data = item.image.data
+    digest = hashlib.sha1(f"{language}:{data.shape}:{data.dtype.str}:".encode())
+    digest.update(data.tobytes())
+    return digest.hexdigest()
+
+
+def _ocr_pgs(
+    source: str | bytes, srt_path: str, language: str, cache_file: str | None = None
+) -> tuple[int, int]:
+    """
+    OCR a PGS stream into an SRT file.
+
+    The stream is given either as the path of a .sup file or as its raw data,
+    it is decoded in memory without intermediate copies. Defined at module level
+    so that it can be dispatched to an OCR worker process, see _ocr_in_worker.
+
+    With a cache file, bitmaps already seen in this or a previous stream are
+    served from the cache and only unseen bitmaps are sent to tesseract.
+
+    Returns:
+        Number of bitmaps served from the cache and number of bitmaps OCR'd
+    """
+    start = time.perf_counter()
+    try:
+        stats = _rip_pgs(source, srt_path, language, cache_file)
+    except OCRError:
+        OCR_STREAMS.inc(result="error")
+        raise
+    finally:
+        OCR_SECONDS.observe(time.perf_counter() - start)
+
+    OCR_STREAMS.inc(result="ok")
+    if cache_file is not None:
+        OCR_CACHE.inc(stats[0], result="hit")
+        OCR_CACHE.inc(stats[1], result="miss")
+
+    return stats
+
+
+def _ocr_in_worker(*args) -> tuple[tuple[int, int], list]:
+    """Run _ocr_pgs in a worker process, returning the metrics it recorded."""
+    return _ocr_pgs(*args), metrics.REGISTRY.export()
+
+
+def _rip_pgs(
+    source: str | bytes, srt_path: str, language: str, cache_file: str | None = None
+) -> tuple[int, int]:
+    """Decode and OCR a PGS stream, see _ocr_pgs."""
+    try:
+        lang = Language(language)
+    except ValueError:
+        raise OCRError(f"Invalid language for OCR: {language}")
+
+    try:
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                data = f.read()
+        else:
+            data = source
+
+        OCR_BYTES.inc(len(data))
+        options = Options(languages={lang}, overwrite=True, one_per_lang=False)
+
+        # pgsrip only uses the media path for naming, the data comes from memory
+        media_path = MediaPath("stream.sup")
+        media_path.language = lang
+        pgs = Pgs(media_path, options, data_reader=lambda: data, temp_folder="")
+        items = pgs.items
+
+        if not items:
+            raise OCRError("OCR did not produce output file")
+
+        logger.debug(f"Performing OCR with language: {language}")
+        rules = options.config.select_rules(tags=options.tags, languages={lang})
+
+        def post_process(text: str) -> str:
+            return rules.apply(text, "")[0]
+
+        if cache_file is None:
+            srt = PgsToSrtRipper(pgs, options).rip(post_process)
+            srt.save(srt_path)
+            return 0, len(items)
+
+        cache = _get_ocr_cache(cache_file)
+        keys = [_bitmap_key(item, language) for item in items]
+        texts = cache.get_many(keys)
+
+        # a single copy of every unseen bitmap is OCR'd, the raw text is cached
+        unseen = {}
+        for key, item in zip(keys, items):
+            if key not in texts:
+                unseen.setdefault(key, item)
+
+        if unseen:
+            pgs._items = list(unseen.values())
+            PgsToSrtRipper(pgs, options).rip(None)
+
+            ripped = {k: i.text for k, i in unseen.items() if i.text is not None}
+            cache.put_many(ripped)
+            texts.update(ripped)
+
+        srt = SubRipFile(path=srt_path)
+        for key, item in zip(keys, items):
+            text = texts.get(key)
+            if text:
+                text = post_process(text)
+            if text:
+                srt.append(SubRipItem(0, item.start, item.end, text))
+
+        srt.clean_indexes()
+        srt.save(srt_path)
+
+        return len(items) - len(unseen), len(unseen)
+
+    except OCRError:
+        raise
+    except Exception as e:
+        raise OCRError(f"OCR failed: {e}")
+
 
 class BitmapSubtitleExtractor(BaseExtractor):
     """Extracts bitmap-based subtitles with OCR conversion."""
 
+    def __init__(self, config: ExtractorConfig, media_probe: MediaProber):
+        super().__init__(config, media_probe)
+        self._ocr_executor: ProcessPoolExecutor | None = None
+        self._ocr_executor_lock = threading.Lock()
+
+        self.ocr_cache_hits = 0
+        self.ocr_cache_misses = 0
+        self._ocr_stats_lock = threading.Lock()
+
+    def close(self):
+        """Shut down the OCR worker processes, if any were started."""
+        with self._ocr_executor_lock:
+            if self._ocr_executor is not None:
+                self._ocr_executor.shutdown()
+                self._ocr_executor = None
+
+        if self.config.ocr_cache_file and self.ocr_cache_hits + self.ocr_cache_misses:
+            stats = self.ocr_cache_stats()
+            logger.info(
+                f"OCR cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.1%} hit rate)"
+            )
+
+    def ocr_cache_stats(self) -> dict[str, int | float]:
+        """Return the number of bitmaps served from the OCR cache and OCR'd."""
+        with self._ocr_stats_lock:
+            total = self.ocr_cache_hits + self.ocr_cache_misses
+            return {
+                "hits": self.ocr_cache_hits,
+                "misses": self.ocr_cache_misses,
+                "hit_rate": self.ocr_cache_hits / total if total else 0.0,
+            }
+
+    def _record_ocr_stats(self, stats: tuple[int, int]):
+        with self._ocr_stats_lock:
+            self.ocr_cache_hits += stats[0]
+            self.ocr_cache_misses += stats[1]
+
+    def _get_ocr_executor(self) -> ProcessPoolExecutor:
+        # A single pool is shared by every file handled by this extractor so that
+        # ocr_workers caps OCR processes globally, not per file.
+        with self._ocr_executor_lock:
+            if self._ocr_executor is None:
+                self._ocr_executor = ProcessPoolExecutor(
+                    max_workers=self.config.ocr_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+
+            return self._ocr_executor
+
     def extract(self, video_path: str) -> list[str]:
         """
         Extract bitmap-based subtitles from video file.
@@ -45,73 +257,159 @@ class BitmapSubtitleExtractor(BaseExtractor):
             logger.info("No bitmap-based subtitle streams found")
             return []
 
-        # Step 1: Extract to PGS format
-        sup_files = self._extract_to_sup(video_path, bitmap_streams)
+        # Step 1: Extract to PGS format, to .sup files or into memory
+        plan = self.plan_extraction(video_path, bitmap_streams)
+
+        if plan:
+            self.run_plan(video_path, plan)
+            logger.debug(f"Extracted {len(plan.output_paths + plan.pipe_keys)} PGS streams")
+
+        # Step 2 and 3: OCR to SRT format and convert to other formats
+        return plan.output_paths + self.process_sup_files(
+            video_path, bitmap_streams, plan.output_paths, plan.pipe_data
+        )
+
+    def process_sup_files(
+        self,
+        video_path: str,
+        streams: list[StreamInfo],
+        sup_files: list[str],
+        pgs_data: dict[str, bytes] | None = None,
+    ) -> list[str]:
+        """
+        OCR extracted PGS streams and convert them to the desired formats.
+
+        Args:
+            video_path: Path to video file
+            streams: Bitmap subtitle streams of the video
+            sup_files: PGS files extracted for these streams
+            pgs_data: PGS data piped from FFmpeg, keyed on the target SRT path
 
+        Returns:
+            List of paths to the created subtitle files
+        """
         # Step 2: OCR to SRT format
-        srt_files = self._ocr_to_srt(video_path, bitmap_streams, sup_files)
+        srt_files = self._ocr_to_srt(video_path, streams, sup_files, pgs_data or {})
 
         # Step 3: Convert to other formats if needed
-        converted_files = self._convert_to_formats(
-            video_path, bitmap_streams, srt_files
-        )
+        converted_files = self._convert_to_formats(video_path, streams, srt_files)
 
         all_files = sup_files + srt_files + converted_files
         logger.info(f"Extracted {len(all_files)} bitmap-based subtitle files")
 
-        return all_files
+        return srt_files + converted_files
 
-    def _extract_to_sup(self, video_path: str, streams: list[StreamInfo]) -> list[str]:
-        """Extract bitmap subtitles to PGS (.sup) format."""
+    def plan_extraction(
+        self, video_path: str, streams: list[StreamInfo]
+    ) -> ExtractionPlan:
+        """
+        Build the FFmpeg outputs copying bitmap streams to PGS.
+
+        Streams are written to .sup files, or piped to memory when keep_sup is
+        disabled, keyed on the SRT path the OCR will produce.
+        """
         path_manager = SubtitlePath(video_path)
-        ffmpeg_args = []
-        sup_files = []
+        plan = ExtractionPlan()
 
         for stream in streams:
-            sup_path = path_manager.generate_subtitle_path(stream, "sup")
+            if self.config.keep_sup:
+                sup_path = path_manager.generate_subtitle_path(stream, "sup")
 
-            if self.should_extract_stream(
-                video_path, stream, sup_path, FFMPEG_BITMAP_FORMATS
-            ):
-                ffmpeg_args.extend(
-                    ["-map", f"0:{stream.index}", "-c", "copy", sup_path]
-                )
-                sup_files.append(sup_path)
-
-        if ffmpeg_args:
-            try:
-                self._run_ffmpeg_extraction(video_path, ffmpeg_args)
-                logger.debug(f"Extracted {len(sup_files)} PGS files")
-            except:
-                for p in sup_files:
-                    if os.path.exists(p) and os.path.getsize(p) == 0:
-                        os.remove(p)
+                if self.should_extract_stream(
+                    video_path, stream, sup_path, FFMPEG_BITMAP_FORMATS
+                ):
+                    plan.add_output(stream, sup_path, copy=True)
+            else:
+                srt_path = path_manager.generate_subtitle_path(stream, "srt")
 
-                raise
+                if self.should_extract_stream(
+                    video_path, stream, srt_path, FFMPEG_BITMAP_FORMATS
+                ):
+                    plan.add_pipe_output(stream, srt_path, "sup")
 
-        return sup_files
+        return plan
 
     def _ocr_to_srt(
-        self, video_path: str, streams: list[StreamInfo], sup_files: list[str]
+        self,
+        video_path: str,
+        streams: list[StreamInfo],
+        sup_files: list[str],
+        pgs_data: dict[str, bytes],
     ) -> list[str]:
-        """Perform OCR on PGS files to create SRT files."""
+        """Perform OCR on PGS files or piped PGS data to create SRT files."""
         path_manager = SubtitlePath(video_path)
-        srt_files = []
+        jobs = []
 
         for stream in streams:
             sup_path = path_manager.generate_subtitle_path(stream, "sup")
             srt_path = path_manager.generate_subtitle_path(stream, "srt")
 
-            if (
-                sup_path in sup_files or os.path.exists(sup_path)
-            ) and self.should_extract_stream(video_path, stream, srt_path):
+            source: str | bytes
+            if srt_path in pgs_data:
+                source = pgs_data[srt_path]
+            elif sup_path in sup_files or os.path.exists(sup_path):
+                source = sup_path
+            else:
+                continue
 
-                try:
-                    self._perform_ocr(sup_path, srt_path, stream.language)
-                    srt_files.append(srt_path)
-                    logger.debug(f"OCR completed for stream {stream.index}")
-                except OCRError as e:
-                    logger.error(f"OCR failed for stream {stream.index}: {e}")
+            if self.should_extract_stream(video_path, stream, srt_path):
+                jobs.append((stream, source, srt_path))
+
+        OCR_BACKLOG.inc(len(jobs))
+
+        if self.config.ocr_workers > 1 and len(jobs) > 1:
+            return self._ocr_parallel(jobs)
+
+        srt_files = []
+        for stream, source, srt_path in jobs:
+            try:
+                self._perform_ocr(source, srt_path, stream.language)
+                srt_files.append(srt_path)
+                logger.debug(f"OCR completed for stream {stream.index}")
+            except OCRError as e:
+                logger.error(f"OCR failed for stream {stream.index}: {e}")
+            finally:
+                OCR_BACKLOG.dec()
+
+        return srt_files
+
+    def _ocr_parallel(
+        self, jobs: list[tuple[StreamInfo, str | bytes, str]]
+    ) -> list[str]:
+        """Dispatch OCR jobs to the worker processes and collect them in order."""
+        executor = self._get_ocr_executor()
+        futures: list[tuple[StreamInfo, str, Future]] = []
+
+        for stream, source, srt_path in jobs:
+            try:
+                language = self._resolve_ocr_language(stream.language)
+            except OCRError as e:
+                logger.error(f"OCR failed for stream {stream.index}: {e}")
+                OCR_BACKLOG.dec()
+                continue
+
+            future = executor.submit(
+                _ocr_in_worker, source, srt_path, language, self.config.ocr_cache_file
+            )
+            futures.append((stream, srt_path, future))
+
+        logger.debug(f"Dispatched {len(futures)} OCR jobs to worker processes")
+
+        srt_files = []
+        for stream, srt_path, future in futures:
+            try:
+                stats, changes = future.result()
+                metrics.REGISTRY.merge(changes)
+                self._record_ocr_stats(stats)
+                srt_files.append(srt_path)
+                logger.debug(f"OCR completed for stream {stream.index}")
+            except OCRError as e:
+                # the metrics of failed jobs stay in the worker until its next job
+                logger.error(f"OCR failed for stream {stream.index}: {e}")
+            except BrokenProcessPool as e:
+                logger.error(f"OCR failed for stream {stream.index}: {OCRError(e)}")
+            finally:
+                OCR_BACKLOG.dec()
 
         return srt_files
 
@@ -135,6 +433,7 @@ class BitmapSubtitleExtractor(BaseExtractor):
             if srt_path not in srt_files and not os.path.exists(srt_path):
                 continue
 
+            output_paths = []
             for fmt in self.config.desired_formats:
                 if fmt == "srt":
                     continue
@@ -142,71 +441,44 @@ class BitmapSubtitleExtractor(BaseExtractor):
                 output_path = path_manager.generate_subtitle_path(stream, fmt)
 
                 if self.should_extract_stream(video_path, stream, output_path):
-                    ffmpeg_args = ["-i", srt_path, output_path]
-                    self._run_ffmpeg_conversion(ffmpeg_args)
-                    converted_files.append(output_path)
+                    output_paths.append(output_path)
+
+            if output_paths:
+                # the OCR'd SRT is parsed once for all of its target formats
+                try:
+                    converted_files += self.converter.convert(srt_path, output_paths)
+                except ConversionError as e:
+                    logger.error(f"Conversion failed for stream {stream.index}: {e}")
 
         return converted_files
 
-    def _perform_ocr(self, sup_path: str, srt_path: str, language: str):
-        """Perform OCR on a PGS subtitle file."""
+    def _resolve_ocr_language(self, language: str) -> str:
         if language == "unknown":
             if self.config.unknown_language_as == "unknown":
                 raise OCRError("Cannot perform OCR on unknown language")
             else:
                 language = self.config.unknown_language_as
 
-        # Create temporary directory (pgsrip doesn't handle spaces well)
-        temp_dir = tempfile.mkdtemp()
-        temp_sup = os.path.join(temp_dir, "temp.sup")
-        temp_srt = os.path.join(temp_dir, "temp.srt")
+        return language
 
-        try:
-            # Copy to temp location
-            shutil.copy2(sup_path, temp_sup)
-
-            # Perform OCR
-            logger.debug(f"Performing OCR with language: {language}")
-            pgsrip.rip(
-                Sup(temp_sup),
-                Options(
-                    languages={Language(language)},
-                    overwrite=True,
-                    one_per_lang=False,
-                ),
-            )
-
-            # Copy result back
-            if os.path.exists(temp_srt):
-                shutil.copy2(temp_srt, srt_path)
-            else:
-                raise OCRError("OCR did not produce output file")
-
-        except ValueError as e:
-            raise OCRError(f"Invalid language for OCR: {language}")
-        except Exception as e:
-            raise OCRError(f"OCR failed: {e}")
-        finally:
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-
-    def _run_ffmpeg_extraction(self, video_path: str, ffmpeg_args: list[str]):
+    def _perform_ocr(self, source: str | bytes, srt_path: str, language: str):
+        """Perform OCR on a PGS subtitle file or PGS data."""
+        stats = _ocr_pgs(
+            source,
+            srt_path,
+            self._resolve_ocr_language(language),
+            self.config.ocr_cache_file,
+        )
+        self._record_ocr_stats(stats)
+
+    def _run_ffmpeg_extraction(
+        self,
+        video_path: str,
+        ffmpeg_args: list[str],
+        pipe_outputs: list[list[str]] = [],
+    ) -> list[bytes]:
         """Run FFmpeg to extract bitmap subtitles."""
-        base_args = ["ffmpeg", "-v", "error", "-y", "-i", video_path]
-
-        full_args = base_args + ffmpeg_args
-
         try:
-            self.subprocess_runner.run(full_args)
+            return self._run_ffmpeg(video_path, ffmpeg_args, pipe_outputs)
         except Exception as e:
             raise FFmpegError(f"Bitmap subtitle extraction failed: {e}")
-
-    def _run_ffmpeg_conversion(self, ffmpeg_args: list[str]):
-        """Run FFmpeg to convert subtitle formats."""
-        base_args = ["ffmpeg", "-v", "error", "-y"]
-        full_args = base_args + ffmpeg_args
-
-        try:
-            self.subprocess_runner.run(full_args)
-        except Exception as e:
-            raise FFmpegError(f"Subtitle conversion failed: {e}")
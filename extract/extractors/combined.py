@@ -0,0 +1,106 @@
+"""
+Single-pass extractor for text and bitmap subtitles.
+"""
+
+import logging
+
+from ..config import ExtractorConfig
+from ..constants import FFMPEG_BITMAP_FORMATS, FFMPEG_TEXT_FORMATS
+from ..exceptions import ExtractionError, FFmpegError
+from ..prober import MediaProber
+from ..subprocess import SubprocessError
+from .base import BaseExtractor
+from .bitmap import BitmapSubtitleExtractor
+from .text import TextSubtitleExtractor
+
+logger = logging.getLogger(__name__)
+
+
+class CombinedSubtitleExtractor(BaseExtractor):
+    """
+    Extracts text and bitmap subtitles with one FFmpeg pass over the video.
+
+    The text outputs and the PGS copies of the bitmap streams, written to .sup
+    files or piped to memory, are mapped into a single FFmpeg invocation. The
+    PGS streams are then handed to the OCR stage of BitmapSubtitleExtractor.
+    """
+
+    def __init__(self, config: ExtractorConfig, media_probe: MediaProber):
+        super().__init__(config, media_probe)
+        self.text_extractor = TextSubtitleExtractor(config, media_probe)
+        self.bitmap_extractor = BitmapSubtitleExtractor(config, media_probe)
+
+    def close(self):
+        self.bitmap_extractor.close()
+
+    def extract(self, video_path: str) -> list[str]:
+        """
+        Extract text and bitmap-based subtitles from video file.
+
+        Args:
+            video_path: Path to video file
+
+        Returns:
+            List of paths to extracted subtitle files
+        """
+        logger.debug(f"Extracting text and bitmap subtitles from {video_path}")
+
+        streams = self.media_prober.get_subtitle_streams(
+            video_path, self.config.unknown_language_as
+        )
+
+        text_streams = self.filter_streams_by_codec(streams, FFMPEG_TEXT_FORMATS)
+        bitmap_streams = self.filter_streams_by_codec(streams, FFMPEG_BITMAP_FORMATS)
+
+        text_plan = self.text_extractor.plan_extraction(video_path, text_streams)
+        sup_plan = self.bitmap_extractor.plan_extraction(video_path, bitmap_streams)
+        plan = text_plan.merge(sup_plan)
+
+        output_files = []
+
+        if plan:
+            try:
+                written = self.run_plan(video_path, plan)
+            except ExtractionError as e:
+                # keep whatever can be extracted, like separate passes would
+                logger.warning(f"Single-pass extraction failed, retrying separately: {e}")
+                return self._extract_separately(video_path)
+
+            sup_files = set(sup_plan.output_paths)
+            output_files = [p for p in written if p not in sup_files]
+            logger.info(f"Extracted {len(output_files)} text-based subtitle files")
+        else:
+            logger.info("No subtitles to extract")
+
+        if bitmap_streams:
+            output_files += sup_plan.output_paths
+            output_files += self.bitmap_extractor.process_sup_files(
+                video_path, bitmap_streams, sup_plan.output_paths, plan.pipe_data
+            )
+        else:
+            logger.info("No bitmap-based subtitle streams found")
+
+        return output_files
+
+    def _extract_separately(self, video_path: str) -> list[str]:
+        output_files = []
+
+        for extractor in (self.text_extractor, self.bitmap_extractor):
+            try:
+                output_files += extractor.extract(video_path)
+            except ExtractionError as e:
+                logger.error(f"{extractor.__class__.__name__} failed: {e}")
+
+        return output_files
+
+    def _run_ffmpeg_extraction(
+        self,
+        video_path: str,
+        ffmpeg_args: list[str],
+        pipe_outputs: list[list[str]] = [],
+    ) -> list[bytes]:
+        """Run FFmpeg to extract text and bitmap subtitles."""
+        try:
+            return self._run_ffmpeg(video_path, ffmpeg_args, pipe_outputs)
+        except SubprocessError as e:
+            raise FFmpegError(f"Subtitle extraction failed: {e}")
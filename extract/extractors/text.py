@@ -3,13 +3,12 @@ Text-based subtitle extractor using FFmpeg.
 """
 
 import logging
-import os
 
-from ..constants import FFMPEG_TEXT_FORMATS
+from ..constants import FFMPEG_COPY_FORMATS, FFMPEG_TEXT_FORMATS
 from ..exceptions import FFmpegError
 from ..path import SubtitlePath
 from ..prober import StreamInfo
-from .base import BaseExtractor
+from .base import BaseExtractor, ExtractionPlan
 from ..subprocess import SubprocessError
 
 logger = logging.getLogger(__name__)
@@ -42,53 +41,75 @@ class TextSubtitleExtractor(BaseExtractor):
             logger.debug("No text-based subtitle streams found")
             return []
 
+        plan = self.plan_extraction(video_path, text_streams)
+
+        if not plan:
+            logger.info("No text-based subtitles to extract")
+            return []
+
+        output_paths = self.run_plan(video_path, plan)
+        logger.info(f"Extracted {len(output_paths)} text-based subtitle files")
+
+        return output_paths
+
+    def plan_extraction(
+        self, video_path: str, streams: list[StreamInfo]
+    ) -> ExtractionPlan:
+        """
+        Build the FFmpeg outputs for all wanted text streams and formats.
+
+        Each stream is demuxed once, stream copied when its codec matches one of
+        the wanted formats. The other formats are derived from that file in-process.
+        """
         path_manager = SubtitlePath(video_path)
-        ffmpeg_args = []
-        output_paths = []
+        plan = ExtractionPlan()
 
-        # Build FFmpeg arguments for all streams and formats
-        for stream in text_streams:
+        for stream in streams:
+            wanted = {}
             for fmt in self.config.desired_formats:
                 output_path = path_manager.generate_subtitle_path(stream, fmt)
 
                 if self.should_extract_stream(
                     video_path, stream, output_path, FFMPEG_TEXT_FORMATS
                 ):
-                    ffmpeg_args.extend(["-map", f"0:{stream.index}", output_path])
-                    output_paths.append(output_path)
+                    wanted[fmt] = output_path
 
-        if ffmpeg_args:
-            try:
-                self._run_ffmpeg_extraction(video_path, ffmpeg_args)
-                logger.info(f"Extracted {len(output_paths)} text-based subtitle files")
-            except:
+            if not wanted:
+                continue
 
-                for p in output_path:
-                    if os.path.exists(p) and os.path.getsize(p) == 0:
-                        os.remove(p)
+            source_fmt = self._select_source_format(stream, list(wanted))
+            copy = FFMPEG_COPY_FORMATS.get(stream.codec_name) == source_fmt
+            plan.add_output(stream, wanted[source_fmt], copy=copy)
 
-                raise
+            derived = [path for fmt, path in wanted.items() if fmt != source_fmt]
+            if derived:
+                plan.add_conversion(wanted[source_fmt], derived)
 
-        else:
-            logger.info("No text-based subtitles to extract")
+        return plan
 
-        return output_paths
+    def _select_source_format(self, stream: StreamInfo, formats: list[str]) -> str:
+        """Select the format FFmpeg should write, the others are converted from it."""
+        copy_format = FFMPEG_COPY_FORMATS.get(stream.codec_name)
 
-    def _run_ffmpeg_extraction(self, video_path: str, ffmpeg_args: list[str]):
-        """Run FFmpeg to extract subtitles."""
-        base_args = [
-            "ffmpeg",
-            "-v",
-            "error",
-            "-y",  # Overwrite output files
-            "-i",
-            video_path,
-        ]
+        if copy_format in formats:
+            return copy_format
+
+        # ASS keeps the most styling information for the conversions
+        if "ass" in formats:
+            return "ass"
 
-        full_args = base_args + ffmpeg_args
+        return formats[0]
 
+    def _run_ffmpeg_extraction(
+        self,
+        video_path: str,
+        ffmpeg_args: list[str],
+        pipe_outputs: list[list[str]] = [],
+    ) -> list[bytes]:
+        """Run FFmpeg to extract subtitles."""
         try:
-            result = self.subprocess_runner.run(full_args)
+            result = self._run_ffmpeg(video_path, ffmpeg_args, pipe_outputs)
             logger.debug("FFmpeg extraction completed successfully")
+            return result
         except SubprocessError as e:
             raise FFmpegError(f"Text subtitle extraction failed: {e}")
@@ -0,0 +1,314 @@
+"""
+Native Matroska/WebM header reader for subtitle track discovery.
+
+Only the EBML header, the SeekHead and the Tracks element are read, which
+avoids spawning ffprobe for the most common container. Anything the reader
+does not understand raises MatroskaError so the caller can fall back to ffprobe.
+"""
+
+import logging
+from typing import Any, BinaryIO, Iterator
+
+from .exceptions import MatroskaError
+
+logger = logging.getLogger(__name__)
+
+MATROSKA_EXTENSIONS = (".mkv", ".mka", ".mks", ".webm")
+
+# EBML element ids
+EBML = 0x1A45DFA3
+DOC_TYPE = 0x4282
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+TRACKS = 0x1654AE6B
+CLUSTER = 0x1F43B675
+TRACK_ENTRY = 0xAE
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+FLAG_ENABLED = 0xB9
+FLAG_DEFAULT = 0x88
+FLAG_FORCED = 0x55AA
+FLAG_HEARING_IMPAIRED = 0x55AB
+FLAG_VISUAL_IMPAIRED = 0x55AC
+FLAG_ORIGINAL = 0x55AE
+FLAG_COMMENTARY = 0x55AF
+NAME = 0x536E
+LANGUAGE = 0x22B59C
+
+TRACK_TYPE_VIDEO = 0x01
+TRACK_TYPE_AUDIO = 0x02
+TRACK_TYPE_SUBTITLE = 0x11
+TRACK_TYPE_METADATA = 0x21
+
+# track types ffmpeg creates a stream for, every one of them takes a stream index
+STREAM_TRACK_TYPES = (
+    TRACK_TYPE_VIDEO,
+    TRACK_TYPE_AUDIO,
+    TRACK_TYPE_SUBTITLE,
+    TRACK_TYPE_METADATA,
+)
+
+# Matroska codec ids mapped to the codec names reported by ffprobe
+SUBTITLE_CODECS = {
+    "S_TEXT/UTF8": "subrip",
+    "S_TEXT/ASCII": "text",
+    "S_TEXT/SSA": "ass",
+    "S_TEXT/ASS": "ass",
+    "S_SSA": "ass",
+    "S_ASS": "ass",
+    "S_TEXT/WEBVTT": "webvtt",
+    "S_HDMV/PGS": "hdmv_pgs_subtitle",
+    "S_HDMV/TEXTST": "hdmv_text_subtitle",
+    "S_VOBSUB": "dvd_subtitle",
+    "S_DVBSUB": "dvb_subtitle",
+    "S_ARIBSUB": "arib_caption",
+}
+
+DISPOSITION_FLAGS = {
+    FLAG_DEFAULT: "default",
+    FLAG_FORCED: "forced",
+    FLAG_HEARING_IMPAIRED: "hearing_impaired",
+    FLAG_VISUAL_IMPAIRED: "visual_impaired",
+    FLAG_ORIGINAL: "original",
+    FLAG_COMMENTARY: "comment",
+}
+
+# Upper bound for the Tracks element, real files use a few KB
+MAX_TRACKS_SIZE = 4 * 1024 * 1024
+# Number of top level elements inspected before giving up on finding Tracks
+MAX_TOP_LEVEL_ELEMENTS = 64
+
+
+def _vint_length(first: int) -> int:
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+
+    if length > 8:
+        raise MatroskaError("Invalid EBML variable length integer")
+
+    return length
+
+
+def _parse_vint(data: bytes, pos: int, keep_marker: bool) -> tuple[int | None, int]:
+    """Parse an EBML variable length integer, returns (value, length)."""
+    if pos >= len(data):
+        raise MatroskaError("Truncated element")
+
+    length = _vint_length(data[pos])
+    if pos + length > len(data):
+        raise MatroskaError("Truncated element")
+
+    value = data[pos]
+    if not keep_marker:
+        value &= (0x80 >> (length - 1)) - 1
+
+    all_ones = value == (0x80 >> (length - 1)) - 1
+    for b in data[pos + 1 : pos + length]:
+        value = (value << 8) | b
+        all_ones = all_ones and b == 0xFF
+
+    if not keep_marker and all_ones:
+        return None, length  # unknown size
+
+    return value, length
+
+
+def _read_vint(f: BinaryIO, keep_marker: bool) -> tuple[int | None, int]:
+    first = f.read(1)
+    if not first:
+        raise MatroskaError("Unexpected end of file")
+
+    data = first + f.read(_vint_length(first[0]) - 1)
+    return _parse_vint(data, 0, keep_marker)
+
+
+def _read_element_header(f: BinaryIO) -> tuple[int, int | None]:
+    element_id, _ = _read_vint(f, keep_marker=True)
+    size, _ = _read_vint(f, keep_marker=False)
+    return element_id, size  # type: ignore[return-value]
+
+
+def _iter_elements(data: bytes) -> Iterator[tuple[int, bytes]]:
+    """Iterate over the child elements contained in a master element's data."""
+    pos = 0
+    end = len(data)
+
+    while pos < end:
+        ids = _parse_vint(data, pos, keep_marker=True)
+        pos += ids[1]
+        sizes = _parse_vint(data, pos, keep_marker=False)
+        pos += sizes[1]
+
+        if sizes[0] is None or pos + sizes[0] > end:
+            raise MatroskaError("Invalid element size")
+
+        yield ids[0], data[pos : pos + sizes[0]]
+        pos += sizes[0]
+
+
+def _uint(data: bytes) -> int:
+    return int.from_bytes(data, "big") if data else 0
+
+
+def _string(data: bytes) -> str:
+    return data.split(b"\x00", 1)[0].decode("utf-8", errors="replace")
+
+
+def _read_doc_type(f: BinaryIO) -> str:
+    element_id, size = _read_element_header(f)
+    if element_id != EBML or size is None:
+        raise MatroskaError("Not an EBML file")
+
+    doc_type = "matroska"  # default value defined by the specification
+    for child_id, data in _iter_elements(f.read(size)):
+        if child_id == DOC_TYPE:
+            doc_type = _string(data)
+
+    return doc_type
+
+
+def _find_tracks(f: BinaryIO) -> bytes:
+    """Locate the Tracks element inside the Segment and return its data."""
+    element_id, segment_size = _read_element_header(f)
+    if element_id != SEGMENT:
+        raise MatroskaError("Segment element not found")
+
+    segment_start = f.tell()
+    segment_end = segment_start + segment_size if segment_size is not None else None
+    tracks_position = None
+
+    for _ in range(MAX_TOP_LEVEL_ELEMENTS):
+        if segment_end is not None and f.tell() >= segment_end:
+            break
+
+        element_id, size = _read_element_header(f)
+
+        if element_id == TRACKS:
+            if size is None or size > MAX_TRACKS_SIZE:
+                raise MatroskaError("Unsupported Tracks element size")
+            return f.read(size)
+
+        if element_id == SEEK_HEAD and size is not None:
+            for seek_id, seek in _iter_elements(f.read(size)):
+                if seek_id != SEEK:
+                    continue
+
+                fields = dict(_iter_elements(seek))
+                if _uint(fields.get(SEEK_ID, b"")) == TRACKS:
+                    tracks_position = _uint(fields.get(SEEK_POSITION, b""))
+            continue
+
+        if element_id == CLUSTER or size is None:
+            # media data starts here, Tracks can only be found through the SeekHead
+            break
+
+        f.seek(size, 1)
+
+    if tracks_position is None:
+        raise MatroskaError("Tracks element not found")
+
+    f.seek(segment_start + tracks_position)
+    element_id, size = _read_element_header(f)
+    if element_id != TRACKS or size is None or size > MAX_TRACKS_SIZE:
+        raise MatroskaError("Invalid Tracks position in SeekHead")
+
+    return f.read(size)
+
+
+def _parse_track(index: int, fields: dict[int, bytes]) -> dict[str, Any] | None:
+    """Convert a TrackEntry into ffprobe's stream format (None for non subtitles)."""
+    if _uint(fields.get(TRACK_TYPE, b"")) != TRACK_TYPE_SUBTITLE:
+        return None
+
+    if _uint(fields.get(FLAG_ENABLED, b"\x01")) == 0:
+        raise MatroskaError(f"Disabled subtitle track {index}")
+
+    codec_id = _string(fields.get(CODEC_ID, b""))
+    if codec_id not in SUBTITLE_CODECS:
+        raise MatroskaError(f"Unknown subtitle codec '{codec_id}'")
+
+    disposition = {
+        name: int(bool(_uint(fields[flag])))
+        for flag, name in DISPOSITION_FLAGS.items()
+        if flag in fields
+    }
+    disposition.setdefault("default", 1)  # FlagDefault defaults to 1
+    for name in DISPOSITION_FLAGS.values():
+        disposition.setdefault(name, 0)
+
+    tags = {}
+    language = _string(fields[LANGUAGE]) if LANGUAGE in fields else "eng"
+    if language != "und":
+        tags["language"] = language
+
+    if NAME in fields:
+        tags["title"] = _string(fields[NAME])
+
+    return {
+        "index": index,
+        "codec_name": SUBTITLE_CODECS[codec_id],
+        "codec_type": "subtitle",
+        "disposition": disposition,
+        "tags": tags,
+    }
+
+
+def read_subtitle_streams(video_path: str) -> list[dict[str, Any]]:
+    """
+    Read the subtitle tracks of a Matroska/WebM file from its header.
+
+    Args:
+        video_path: Path to the video file
+
+    Returns:
+        List of stream dicts in the same shape as ffprobe's JSON output
+
+    Raises:
+        MatroskaError: If the file cannot be handled natively
+    """
+    try:
+        with open(video_path, "rb") as f:
+            doc_type = _read_doc_type(f)
+            if doc_type not in ("matroska", "webm"):
+                raise MatroskaError(f"Unsupported DocType '{doc_type}'")
+
+            tracks = _find_tracks(f)
+
+        # every track ffmpeg turns into a stream is numbered, whatever its type,
+        # so stream indices can be mapped with -map 0:N
+        entries = []
+        for element_id, data in _iter_elements(tracks):
+            if element_id != TRACK_ENTRY:
+                continue
+
+            fields = dict(_iter_elements(data))
+
+            # ffmpeg skips tracks without a codec
+            if CODEC_ID not in fields:
+                continue
+
+            track_type = _uint(fields.get(TRACK_TYPE, b""))
+            if track_type not in STREAM_TRACK_TYPES:
+                # whether ffmpeg numbers it is unknown, leave the mapping to ffprobe
+                raise MatroskaError(f"Unsupported track type {track_type:#x}")
+
+            entries.append(fields)
+
+        streams = []
+        for index, fields in enumerate(entries):
+            stream = _parse_track(index, fields)
+            if stream is not None:
+                streams.append(stream)
+
+        return streams
+
+    except MatroskaError:
+        raise
+    except Exception as e:
+        raise MatroskaError(f"Failed to read Matroska header: {e}")
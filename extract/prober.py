@@ -2,17 +2,40 @@
 Media file information extraction and caching.
 """
 
+import copy
 import json
 import logging
+import threading
+import time
 from typing import Any
 
 import cachetools
 
-from .exceptions import FFmpegError
+import metrics
+
+from .cache import FileSignature, ProbeCache, get_file_signature
+from .exceptions import FFmpegError, MatroskaError
+from .matroska import MATROSKA_EXTENSIONS, read_subtitle_streams
 from .subprocess import SubprocessRunner
 
 logger = logging.getLogger(__name__)
 
+PROBE_SECONDS = metrics.histogram(
+    "subextractor_probe_seconds", "Time getting the subtitle streams of a video", ["source"]
+)
+PROBED_FILES = metrics.counter(
+    "subextractor_probed_files_total", "Videos probed for subtitle streams", ["result"]
+)
+PROBED_STREAMS = metrics.counter(
+    "subextractor_probed_streams_total", "Subtitle streams found in probed videos"
+)
+PROBE_CACHE = metrics.counter(
+    "subextractor_probe_cache_requests_total", "Lookups of the probe cache", ["result"]
+)
+metrics.gauge(
+    "subextractor_probe_cache_hit_ratio", "Ratio of probe cache lookups that were hits"
+).set_function(metrics.hit_ratio(PROBE_CACHE))
+
 
 class StreamInfo:
     """Represents information about a subtitle stream."""
@@ -51,9 +74,27 @@ class StreamInfo:
 class MediaProber:
     """Handles media file probing using FFprobe."""
 
-    def __init__(self, cache_size: int = 128):
+    def __init__(
+        self,
+        cache_size: int = 128,
+        cache_file: str | None = None,
+        native_matroska: bool = True,
+    ):
         self.subprocess_runner = SubprocessRunner(30)
+        self.native_matroska = native_matroska
         self._cache = cachetools.LFUCache(maxsize=cache_size)
+        self._cache_lock = threading.Lock()
+        self._persistent_cache = ProbeCache(cache_file) if cache_file else None
+
+        # every lookup is counted here, persistent hits are a subset of the hits
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+
+    @property
+    def probe_mode(self) -> str:
+        """How files are probed, cached results of other modes are not used."""
+        return "native" if self.native_matroska else "ffprobe"
 
     def get_subtitle_streams(
         self, video_path: str, unknown_language_as
@@ -71,31 +112,111 @@ class MediaProber:
         Raises:
             FFmpegError: If ffprobe fails
         """
-        cache_key = f"{video_path}:{unknown_language_as}"
-
-        if cache_key in self._cache:
-            logger.debug(f"Using cached probe data for {video_path}")
-            return self._cache[cache_key]
+        start = time.perf_counter()
+        source = "cache"
 
         try:
-            stream_data = self._probe_file(video_path)
+            signature = get_file_signature(video_path)
+            stream_data = self._get_cached(video_path, signature)
+
+            if stream_data is None:
+                source = "probe"
+                stream_data = self._probe_file(video_path)
+                self._set_cached(video_path, signature, stream_data)
+            else:
+                logger.debug(f"Using cached probe data for {video_path}")
+
             streams = []
 
-            for data in stream_data:
+            # cached data is shared, give every caller its own copy to modify
+            for data in copy.deepcopy(stream_data):
                 stream = StreamInfo(data)
                 if not stream.language or stream.language == "und":
                     stream.language = unknown_language_as
                 streams.append(stream)
 
-            self._cache[cache_key] = streams
             logger.debug(f"Found {len(streams)} subtitle stream(s) in {video_path}")
 
+            PROBED_FILES.inc(result="ok")
+            PROBED_STREAMS.inc(len(streams))
             return streams
 
         except Exception as e:
+            PROBED_FILES.inc(result="error")
             raise FFmpegError(f"Failed to probe video file '{video_path}': {e}")
 
+        finally:
+            PROBE_SECONDS.observe(time.perf_counter() - start, source=source)
+
+    def _get_cached(self, video_path: str, signature: FileSignature) -> list | None:
+        cache_key = (video_path, signature)
+
+        with self._cache_lock:
+            stream_data = self._cache.get(cache_key)
+
+        persistent = False
+        if stream_data is None and self._persistent_cache is not None:
+            stream_data = self._persistent_cache.get(
+                video_path, signature, self.probe_mode
+            )
+            persistent = stream_data is not None
+
+            if persistent:
+                with self._cache_lock:
+                    self._cache[cache_key] = stream_data
+
+        with self._cache_lock:
+            if stream_data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.persistent_hits += persistent
+
+        PROBE_CACHE.inc(result="miss" if stream_data is None else "hit")
+
+        return stream_data
+
+    def _set_cached(self, video_path: str, signature: FileSignature, stream_data: list):
+        with self._cache_lock:
+            self._cache[(video_path, signature)] = stream_data
+
+        if self._persistent_cache is not None:
+            self._persistent_cache.put(
+                video_path, signature, self.probe_mode, stream_data
+            )
+
+    def stats(self) -> dict[str, Any]:
+        """Return probe cache statistics."""
+        total = self.hits + self.misses
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+        if self._persistent_cache is not None:
+            stats["persistent"] = {
+                **self._persistent_cache.stats(),
+                "hits": self.persistent_hits,
+            }
+
+        return stats
+
     def _probe_file(self, video_path: str) -> list:
+        """Get the subtitle streams of a video file, reading Matroska headers natively."""
+        if self.native_matroska and str(video_path).lower().endswith(
+            MATROSKA_EXTENSIONS
+        ):
+            try:
+                streams = read_subtitle_streams(video_path)
+                logger.debug(f"Read subtitle tracks from Matroska header: {video_path}")
+                return streams
+            except MatroskaError as e:
+                logger.debug(f"Falling back to ffprobe for {video_path}: {e}")
+
+        return self._run_ffprobe(video_path)
+
+    def _run_ffprobe(self, video_path: str) -> list:
         """Run ffprobe on a video file."""
         args = [
             "ffprobe",
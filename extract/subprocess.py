@@ -4,10 +4,27 @@ Subprocess execution with proper error handling.
 
 import atexit
 import logging
+import os
 import subprocess
+import threading
+import time
+
+import metrics
 
 logger = logging.getLogger(__name__)
 
+SUBPROCESS_SECONDS = metrics.histogram(
+    "subextractor_subprocess_seconds", "Run time of external commands", ["command"]
+)
+SUBPROCESS_ERRORS = metrics.counter(
+    "subextractor_subprocess_errors_total", "External commands that failed", ["command"]
+)
+SUBPROCESS_OUTPUT_BYTES = metrics.counter(
+    "subextractor_subprocess_output_bytes_total",
+    "Bytes read from the outputs of external commands",
+    ["command"],
+)
+
 
 running_subprocesses: list[subprocess.Popen] = []
 
@@ -23,6 +40,10 @@ class SubprocessError(Exception):
     pass
 
 
+def _command_name(args: list[str]) -> str:
+    return os.path.basename(str(args[0])) if args else ""
+
+
 class SubprocessRunner:
     """Handles subprocess execution with proper error handling and logging."""
 
@@ -45,6 +66,8 @@ class SubprocessRunner:
         """
         logger.debug(f"Running command: {' '.join(args)}")
 
+        command = _command_name(args)
+        start = time.perf_counter()
         process = None
 
         try:
@@ -61,6 +84,7 @@ class SubprocessRunner:
             result = subprocess.CompletedProcess(
                 args=args, returncode=process.returncode, stdout=out, stderr=err
             )
+            SUBPROCESS_OUTPUT_BYTES.inc(len(out or ""), command=command)
 
             if result.returncode != 0:
                 error_msg = (
@@ -76,16 +100,123 @@ class SubprocessRunner:
             return result
 
         except subprocess.TimeoutExpired as e:
+            SUBPROCESS_ERRORS.inc(command=command)
             error_msg = f"Command timed out after {self.timeout}s: {' '.join(args)}"
             logger.error(error_msg)
             raise SubprocessError(error_msg)
 
         except Exception as e:
+            SUBPROCESS_ERRORS.inc(command=command)
+            error_msg = f"Subprocess execution failed: {e}"
+            logger.error(error_msg)
+            raise SubprocessError(error_msg)
+
+        finally:
+            SUBPROCESS_SECONDS.observe(time.perf_counter() - start, command=command)
+
+            if process is not None:
+
+                if process.poll() == None:
+                    process.terminate()
+
+                running_subprocesses.remove(process)
+
+    def run_piped(self, args: list[str], pipe_outputs: list[list[str]]) -> list[bytes]:
+        """
+        Run a subprocess that writes additional outputs to anonymous pipes.
+
+        Every output gets the write end of its own pipe appended as a
+        ``pipe:<fd>`` url, the syntax understood by FFmpeg.
+
+        Args:
+            args: Command and arguments to execute
+            pipe_outputs: Arguments of each piped output
+
+        Returns:
+            The data written to each pipe
+
+        Raises:
+            SubprocessError: If process fails
+        """
+        pipes = [os.pipe() for _ in pipe_outputs]
+        buffers = [bytearray() for _ in pipes]
+
+        full_args = list(args)
+        for (_, write_fd), output_args in zip(pipes, pipe_outputs):
+            full_args += output_args + [f"pipe:{write_fd}"]
+
+        logger.debug(f"Running command: {' '.join(full_args)}")
+
+        def drain(read_fd: int, buffer: bytearray):
+            with os.fdopen(read_fd, "rb") as f:
+                while chunk := f.read(1024 * 1024):
+                    buffer += chunk
+
+        readers = [
+            threading.Thread(target=drain, args=(read_fd, buffer), daemon=True)
+            for (read_fd, _), buffer in zip(pipes, buffers)
+        ]
+
+        command = _command_name(args)
+        start = time.perf_counter()
+        process = None
+
+        try:
+            try:
+                process = subprocess.Popen(
+                    full_args,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    pass_fds=[write_fd for _, write_fd in pipes],
+                    text=True,
+                )
+            finally:
+                # the child holds its own copies, readers see EOF once it exits
+                for _, write_fd in pipes:
+                    os.close(write_fd)
+
+            running_subprocesses.append(process)
+
+            for reader in readers:
+                reader.start()
+
+            _, err = process.communicate()
+
+            for reader in readers:
+                reader.join()
+
+            if process.returncode != 0:
+                error_msg = (
+                    f"Command failed with code {process.returncode}: {' '.join(full_args)}"
+                )
+                if err:
+                    error_msg += f"\nSTDERR: {err}"
+
+                logger.error(error_msg)
+
+                raise SubprocessError(error_msg)
+
+            SUBPROCESS_OUTPUT_BYTES.inc(sum(map(len, buffers)), command=command)
+            return [bytes(buffer) for buffer in buffers]
+
+        except SubprocessError:
+            SUBPROCESS_ERRORS.inc(command=command)
+            raise
+
+        except Exception as e:
+            SUBPROCESS_ERRORS.inc(command=command)
             error_msg = f"Subprocess execution failed: {e}"
             logger.error(error_msg)
             raise SubprocessError(error_msg)
 
         finally:
+            SUBPROCESS_SECONDS.observe(time.perf_counter() - start, command=command)
+
+            for (read_fd, _), reader in zip(pipes, readers):
+                if not reader.is_alive() and reader.ident is None:
+                    os.close(read_fd)  # never handed to a reader
+
             if process is not None:
 
                 if process.poll() == None:
@@ -1,48 +1,88 @@
 import argparse
+import atexit
 import datetime
 import logging
 import os
-import queue
 import signal
 import sys
-import time
 
-from watchdog.events import DirCreatedEvent, FileCreatedEvent, FileSystemEventHandler
+from watchdog.events import (
+    DirCreatedEvent,
+    DirMovedEvent,
+    FileClosedEvent,
+    FileCreatedEvent,
+    FileMovedEvent,
+    FileSystemEventHandler,
+)
 from watchdog.observers import Observer
 
+import metrics
 from extract.constants import SUPPORTED_VIDEO_EXTENSION
 from module import ExtractionModule, PostprocessorModule
+from pipeline import run_pipeline
+from scheduler import FileEventScheduler
 
 logger = logging.getLogger(__name__)
 
 
 class EventWatcher(FileSystemEventHandler):
-    def __init__(self, queue) -> None:
+    def __init__(self, scheduler: FileEventScheduler) -> None:
         super().__init__()
-        self.queue = queue
-
-    def on_created(self, event: DirCreatedEvent | FileCreatedEvent) -> None:
-        path = str(event.src_path)
+        self.scheduler = scheduler
 
+    def schedule(self, path: str, settled: bool = False):
         if any(path.endswith(ext) for ext in SUPPORTED_VIDEO_EXTENSION):
             logger.info(f"Detected change: {path}, adding to queue")
-            self.queue.put(path)
+            self.scheduler.notify(path, settled)
         else:
             logger.debug(f"Detected change: {path}, skipping... (not supported file)")
 
+    def on_created(self, event: DirCreatedEvent | FileCreatedEvent) -> None:
+        if not event.is_directory:
+            self.schedule(str(event.src_path))
+
+    def on_moved(self, event: DirMovedEvent | FileMovedEvent) -> None:
+        # downloaders commonly write to a temporary name and rename when done
+        if not event.is_directory:
+            self.schedule(str(event.dest_path))
+
+    def on_closed(self, event: FileClosedEvent) -> None:
+        # closed after writing, the copy is complete
+        self.schedule(str(event.src_path), settled=True)
+
+
+def start_metrics():
+    if config.APP_METRICS_PORT:
+        metrics.MetricsServer(config.APP_METRICS_HOST, config.APP_METRICS_PORT).start()
+
+    if config.APP_METRICS_FILE:
+        writer = metrics.StatsFileWriter(config.APP_METRICS_FILE, config.APP_METRICS_INTERVAL)
+        # the final values are written on exit, including single runs
+        atexit.register(writer.stop)
+        writer.start()
+
 
 def main(mainpath: str):
+    start_metrics()
+
     extract_mod = ExtractionModule.from_dict(
         {
             "excluded_enable": config.EXTRACTOR_EXCLUDE_ENABLE,
             "excluded_filelist": config.EXTRACTOR_EXCLUDE_FILE,
             "excluded_append": config.EXTRACTOR_EXCLUDE_APPEND,
+            "state_file": config.APP_STATE_FILE,
             "extract_bitmap": config.EXTRACTOR_EXTRACT_BITMAP,
+            "workers": config.EXTRACTOR_WORKERS,
+            "probe_cache_file": config.EXTRACTOR_PROBE_CACHE_FILE,
+            "native_probe": config.EXTRACTOR_NATIVE_PROBE,
             "config": {
                 "overwrite": config.EXTRACTOR_CONFIG_OVERWRITE,
                 "desired_formats": config.EXTRACTOR_CONFIG_DESIRED_FORMATS,
                 "languages": config.EXTRACTOR_CONFIG_LANGUAGES,
                 "unknown_language_as": config.EXTRACTOR_CONFIG_UNKNOWN_LANGUAGE_AS,
+                "ocr_workers": config.EXTRACTOR_CONFIG_OCR_WORKERS,
+                "keep_sup": config.EXTRACTOR_CONFIG_KEEP_SUP,
+                "ocr_cache_file": config.EXTRACTOR_CONFIG_OCR_CACHE_FILE,
             },
         }
     )
@@ -52,18 +92,37 @@ def main(mainpath: str):
             "excluded_enable": config.POSTPROCESSOR_EXCLUDE_ENABLE,
             "excluded_filelist": config.POSTPROCESSOR_EXCLUDE_FILE,
             "excluded_append": config.POSTPROCESSOR_EXCLUDE_APPEND,
+            "state_file": config.APP_STATE_FILE,
+            "workers": config.POSTPROCESSOR_WORKERS,
+            "chunksize": config.POSTPROCESSOR_CHUNKSIZE,
+            "index_file": config.POSTPROCESSOR_INDEX_FILE,
+            "profile": config.POSTPROCESSOR_PROFILE,
+            "profile_file": config.POSTPROCESSOR_PROFILE_FILE,
             "config": {"workflow_file": config.POSTPROCESSOR_CONFIG_WORKFLOW_FILE},
         }
     )
+    # the postprocessing workers are kept running between runs
+    atexit.register(post_mod.close)
 
     def run(path):
         try:
-            if config.APP_ENABLED_EXTRACTOR and config.APP_ENABLED_POSTPROCESSOR:
-                post_mod.process(extract_mod.process(extract_mod.get_filelist(path)))
+            if (
+                config.APP_ENABLED_EXTRACTOR
+                and config.APP_ENABLED_POSTPROCESSOR
+                and config.APP_PIPELINE
+            ):
+                run_pipeline(
+                    extract_mod,
+                    post_mod,
+                    extract_mod.iter_filelist(path),
+                    queue_size=config.APP_PIPELINE_QUEUE_SIZE,
+                )
+            elif config.APP_ENABLED_EXTRACTOR and config.APP_ENABLED_POSTPROCESSOR:
+                post_mod.process(extract_mod.process(extract_mod.iter_filelist(path)))
             elif config.APP_ENABLED_EXTRACTOR:
-                extract_mod.process(extract_mod.get_filelist(path))
+                extract_mod.process(extract_mod.iter_filelist(path))
             elif config.APP_ENABLED_POSTPROCESSOR:
-                post_mod.process(post_mod.get_filelist(path))
+                post_mod.process(post_mod.iter_filelist(path))
             else:
                 logger.warning("No modules are enabled!")
         except Exception as e:
@@ -73,10 +132,13 @@ def main(mainpath: str):
         run(mainpath)
         return
 
-    task_queue = queue.SimpleQueue()
+    scheduler = FileEventScheduler(config.APP_WATCH_STABILITY_WINDOW)
+    metrics.gauge(
+        "subextractor_watch_pending_files", "Watched files waiting to become stable"
+    ).set_function(scheduler.pending)
     if config.APP_WATCH:
         logger.info(f"Monitoring {os.path.abspath(mainpath)} for changes")
-        event_handler = EventWatcher(task_queue)
+        event_handler = EventWatcher(scheduler)
         observer = Observer()
         observer.schedule(event_handler, os.path.abspath(mainpath), recursive=True)
         observer.start()
@@ -87,13 +149,19 @@ def main(mainpath: str):
 
     try:
         while True:
-            if not task_queue.empty():
-                p = task_queue.get(block=False)
+            timeout = None
+            if config.APP_SCAN_INTERVAL > 0:
+                timeout = max(0, (next_run - datetime.datetime.now()).total_seconds())
+
+            # blocks until a watched file is stable or the next scan is due
+            p = scheduler.get(timeout)
+
+            if p is not None:
                 logger.info(
-                    f"Processing queue item: {p} (remaining: {task_queue.qsize()})"
+                    f"Processing queue item: {p} (remaining: {scheduler.pending()})"
                 )
                 run(p)
-            elif config.APP_SCAN_INTERVAL > 0 and datetime.datetime.now() > next_run:
+            elif config.APP_SCAN_INTERVAL > 0 and datetime.datetime.now() >= next_run:
                 run(mainpath)
 
                 next_run = datetime.datetime.now() + datetime.timedelta(
@@ -101,8 +169,6 @@ def main(mainpath: str):
                 )
 
                 logger.info("Running next run on: " + str(next_run))
-            else:
-                time.sleep(5)
     finally:
         if config.APP_WATCH:
             observer.stop()
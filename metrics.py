@@ -0,0 +1,379 @@
+"""
+Metrics of the processing stages.
+
+Counters, gauges and latency histograms are kept in a process-wide registry and
+exposed in the Prometheus text format over HTTP and/or written periodically to
+a JSON file. Worker processes record into their own registry and return the
+changes with their results, which are merged into the registry of the main
+process.
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+
+Labels = tuple[str, ...]
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict[Labels, Any] = {}
+
+    def _key(self, labels: dict[str, Any]) -> Labels:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> list[tuple[Labels, Any]]:
+        with self._lock:
+            return list(self._values.items())
+
+
+class Counter(Metric):
+    """A monotonically increasing value."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """A value that goes up and down, or is read from a function when collected."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._function: Callable[[], float] | None = None
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float] | None):
+        """Read the value from a function when collected, None to stop."""
+        with self._lock:
+            self._function = function
+            if function is None:
+                self._values[()] = 0
+
+    def samples(self) -> list[tuple[Labels, Any]]:
+        with self._lock:
+            function = self._function
+
+        if function is not None:
+            try:
+                return [((), function())]
+            except Exception as e:
+                logger.debug(f"Failed to collect {self.name}: {e}")
+                return []
+
+        return super().samples()
+
+
+class Histogram(Metric):
+    """Distribution of observed values, e.g. latencies in seconds."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _add(self, key: Labels, counts: list[int], total: float, count: int):
+        with self._lock:
+            data = self._values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            data[0] = [a + b for a, b in zip(data[0], counts)]
+            data[1] += total
+            data[2] += count
+
+    def observe(self, value: float, **labels):
+        counts = [0] * (len(self.buckets) + 1)
+        counts[bisect.bisect_left(self.buckets, value)] = 1
+        self._add(self._key(labels), counts, value, 1)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the time spent in the block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class Registry:
+    """The metrics of a process, by name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: dict[str, Metric] = {}
+
+    def _get(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+
+            metric = self._metrics[name]
+
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get(Gauge, name, help, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get(Histogram, name, help, labelnames, buckets)
+
+    def metrics(self) -> list[Metric]:
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda m: m.name)
+
+    def export(self) -> list[tuple[str, Labels, Any]]:
+        """
+        Take the counter and histogram values recorded so far, resetting them.
+        Used by worker processes to send their changes to the main process.
+        """
+        changes = []
+        for metric in self.metrics():
+            if isinstance(metric, (Counter, Histogram)):
+                with metric._lock:
+                    values, metric._values = metric._values, {}
+
+                changes += [(metric.name, key, value) for key, value in values.items()]
+
+        return changes
+
+    def merge(self, changes: list[tuple[str, Labels, Any]]):
+        """Add the changes exported by another process."""
+        with self._lock:
+            metrics = dict(self._metrics)
+
+        for name, key, value in changes:
+            metric = metrics.get(name)
+
+            if isinstance(metric, Counter):
+                with metric._lock:
+                    metric._values[key] = metric._values.get(key, 0) + value
+            elif isinstance(metric, Histogram):
+                metric._add(key, *value)
+
+    def to_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = []
+
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+
+            for key, value in sorted(metric.samples()):
+                labels = dict(zip(metric.labelnames, key))
+
+                if not isinstance(metric, Histogram):
+                    lines.append(f"{metric.name}{_labels(labels)} {_number(value)}")
+                    continue
+
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip((*metric.buckets, "+Inf"), counts):
+                    cumulative += bucket_count
+                    le = bound if isinstance(bound, str) else _number(bound)
+                    lines.append(
+                        f"{metric.name}_bucket{_labels({**labels, 'le': le})} {cumulative}"
+                    )
+                lines.append(f"{metric.name}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{metric.name}_count{_labels(labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict[str, Any]:
+        """The metrics as JSON serializable data."""
+        data = {}
+
+        for metric in self.metrics():
+            values = []
+            for key, value in sorted(metric.samples()):
+                labels = dict(zip(metric.labelnames, key))
+
+                if isinstance(metric, Histogram):
+                    counts, total, count = value
+                    values.append(
+                        {
+                            "labels": labels,
+                            "count": count,
+                            "sum": total,
+                            "mean": total / count if count else 0.0,
+                            "buckets": dict(zip(map(str, (*metric.buckets, "+Inf")), counts)),
+                        }
+                    )
+                else:
+                    values.append({"labels": labels, "value": value})
+
+            data[metric.name] = {"type": metric.kind, "help": metric.help, "values": values}
+
+        return data
+
+
+def _labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+REGISTRY = Registry()
+
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+def hit_ratio(requests: Counter) -> Callable[[], float]:
+    """Hit ratio of a counter with a 'result' label of hit or miss."""
+
+    def ratio() -> float:
+        hits = requests.value(result="hit")
+        total = hits + requests.value(result="miss")
+        return hits / total if total else 0.0
+
+    return ratio
+
+
+class MetricsServer:
+    """Serves the metrics of a registry at /metrics in the Prometheus format."""
+
+    def __init__(self, host: str, port: int, registry: Registry = REGISTRY):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+
+                body = registry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, name="metrics-server", daemon=True
+        )
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self) -> "MetricsServer":
+        self._thread.start()
+        logger.info(f"Serving metrics on port {self.port}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StatsFileWriter:
+    """Writes the metrics of a registry to a JSON file periodically."""
+
+    def __init__(self, path: str, interval: float = 15, registry: Registry = REGISTRY):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-file", daemon=True)
+
+    def write(self):
+        data = {"time": time.time(), "metrics": self.registry.to_dict()}
+        tmp_path = f"{self.path}.tmp"
+
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                logger.error(f"Failed to write metrics to {self.path}: {e}")
+
+    def start(self) -> "StatsFileWriter":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop writing, the final values are written once more."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+        try:
+            self.write()
+        except OSError as e:
+            logger.error(f"Failed to write metrics to {self.path}: {e}")
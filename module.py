@@ -1,18 +1,51 @@
+import dataclasses
+import functools
+import hashlib
+import json
 import logging
+import multiprocessing
 import os
-import re
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator
 
 from extract import (
-    BitmapSubtitleExtractor,
+    BaseExtractor,
+    CombinedSubtitleExtractor,
     ExtractorConfig,
     MediaProber,
     TextSubtitleExtractor,
 )
+from exclusion import ExclusionStore
+import metrics
 from postprocessing import SubtitleFormatter
+from postprocessing.profiler import WorkflowProfiler
+from state import StateIndex
+from walker import walk_files
 
 logger = logging.getLogger(__name__)
 
+# formatter of a postprocessing worker process, set by its initializer
+_worker_formatter: SubtitleFormatter | None = None
+
+
+def _init_format_worker(workflows: dict[str, list[dict]], index_file: str | None):
+    global _worker_formatter
+    _worker_formatter = SubtitleFormatter.from_workflows(workflows, index_file)
+
+
+def _format_in_worker(path: str) -> tuple[list[str], str | None, list]:
+    """
+    Format a file in a worker process, errors are returned to keep the batch going.
+    The metrics recorded by the worker are returned to be merged by the parent.
+    """
+    try:
+        files, error = _worker_formatter.format(path), None  # type: ignore[union-attr]
+    except Exception as e:
+        files, error = [], str(e)
+
+    return files, error, metrics.REGISTRY.export()
+
 
 class Module(ABC):
     def __init__(
@@ -20,12 +53,15 @@ class Module(ABC):
         excluded_enable: bool = False,
         excluded_filelist: str = "",
         excluded_append: bool = True,
+        state_file: str | None = None,
         **kwargs,
     ) -> None:
 
+        self.state_file = state_file
         self.excluded_enable = excluded_enable
         self.excluded_filelist = excluded_filelist
         self.excluded_append = excluded_append
+        self.excluded_store: ExclusionStore | None = None
 
         if excluded_enable:
             if not excluded_append and not os.path.exists(excluded_filelist):
@@ -38,51 +74,88 @@ class Module(ABC):
                 with open(self.excluded_filelist, "a") as f:
                     pass
 
+            self.excluded_store = ExclusionStore(excluded_filelist)
+
     @property
     def should_add_excluded(self):
         return self.excluded_enable and self.excluded_append
 
     def add_excluded_files(self, paths: list[str]):
-        if len(paths) == 0:
+        if len(paths) == 0 or self.excluded_store is None:
             return
 
-        logger.info(f"Adding {len(paths)} files to excluded")
+        logger.debug(f"Adding {len(paths)} files to excluded")
+        self.excluded_store.add(paths)
 
-        with open(self.excluded_filelist, "a") as f:
-            f.write("\n".join(paths))
-            f.write("\n")
+    def flush_excluded_files(self):
+        if self.excluded_store is not None:
+            self.excluded_store.flush()
 
     def get_excluded_files(self) -> set[str]:
-        if self.excluded_enable == False:
+        if self.excluded_store is None:
             return set()
 
-        with open(self.excluded_filelist) as f:
-            return set(f.read().splitlines())
+        self.excluded_store.refresh()
+        return set(self.excluded_store)
 
-    def get_filelist(self, path) -> list[str]:
-        extensions = "|".join(self.get_file_extensions())
-        regex = f"(?i)\\.({extensions})$"
-        excluded_files = self.get_excluded_files()
-        files = []
+    @functools.cached_property
+    def state_index(self) -> StateIndex | None:
+        if not self.state_file:
+            return None
+
+        return StateIndex(
+            self.state_file, self.__class__.__name__, self.get_state_signature()
+        )
+
+    def refresh_state_signature(self):
+        """Scan and record files under the current configuration."""
+        if self.state_index is not None:
+            self.state_index.signature = self.get_state_signature()
+
+    def record_processed_files(self, paths: list[str]):
+        if self.state_index is not None:
+            self.state_index.record(paths)
+
+    def iter_filelist(self, path) -> Iterator[str]:
+        """Yield the files to be processed while the directory walk is running."""
+        excluded_files = self.excluded_store if self.excluded_store is not None else set()
+        if self.excluded_store is not None:
+            self.excluded_store.refresh()
+
+        found = 0
 
         if os.path.isdir(path):
-            for root, dirs, filenames in os.walk(path):
-                for filename in filenames:
-                    f = os.path.join(root, filename)
-                    if re.search(regex, f) and f not in excluded_files:
-                        files.append(f)
+            if self.state_index is not None:
+                self.refresh_state_signature()
+                # only new, modified or outdated files
+                files = self.state_index.scan(path, self.get_file_extensions())
+            else:
+                files = walk_files(path, self.get_file_extensions())
+
+            for f in files:
+                if f not in excluded_files:
+                    found += 1
+                    yield f
         else:
-            files = [path]
+            found = 1
+            yield path
 
         logger.info(
-            f"Found {len(files)} files to be processed, {len(excluded_files)} excluded"
+            f"Found {found} files to be processed, {len(excluded_files)} excluded"
         )
-        return files
+
+    def get_filelist(self, path) -> list[str]:
+        return list(self.iter_filelist(path))
 
     @abstractmethod
     def get_file_extensions(self) -> list[str]:
         pass
 
+    @abstractmethod
+    def get_state_signature(self) -> str:
+        """Identify the configuration files are processed with."""
+        pass
+
     @abstractmethod
     def process(self, path):
         pass
@@ -95,12 +168,23 @@ class Module(ABC):
 
 class ExtractionModule(Module):
 
-    def __init__(self, config: ExtractorConfig, extract_bitmap=False, **kwargs) -> None:
+    def __init__(
+        self,
+        config: ExtractorConfig,
+        extract_bitmap=False,
+        workers: int | None = None,
+        probe_cache_file: str | None = None,
+        native_probe: bool = True,
+        **kwargs,
+    ) -> None:
         super().__init__(**kwargs)
         self.config = config
 
         self.extract_bitmap = extract_bitmap
-        self.prober = MediaProber()
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.prober = MediaProber(
+            cache_file=probe_cache_file, native_matroska=native_probe
+        )
 
     @classmethod
     def from_dict(cls, settings: dict):
@@ -111,26 +195,90 @@ class ExtractionModule(Module):
     def get_file_extensions(self) -> tuple[str, str, str, str, str]:
         return ("mkv", "mp4", "webm", "ts", "ogg")
 
-    def process(self, filepaths: list[str]):
-        extractor1 = TextSubtitleExtractor(self.config, self.prober)
-        extractor2 = BitmapSubtitleExtractor(self.config, self.prober)
+    def get_state_signature(self) -> str:
+        settings = dataclasses.asdict(self.config)
+        settings["extract_bitmap"] = self.extract_bitmap
+        return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()
 
+    def _extract_file(
+        self,
+        path: str,
+        extractor: BaseExtractor,
+        on_output: Callable[[list[str]], None] | None = None,
+    ) -> list[str]:
         output_files = []
-        for path in filepaths:
-            try:
-                output_files += extractor1.extract(path)
-
-                if self.extract_bitmap:
-                    output_files += extractor2.extract(path)
 
-            except Exception as e:
-                logger.critical(f"An error has occuerd while extracting: {e}")
+        try:
+            output_files += extractor.extract(path)
+            succeeded = True
+        except Exception as e:
+            logger.critical(f"An error has occuerd while extracting {path}: {e}")
+            succeeded = False
 
         if self.should_add_excluded:
-            self.add_excluded_files(filepaths)
+            self.add_excluded_files([path])
+
+        # failed files are retried by the next scan
+        if succeeded:
+            self.record_processed_files([path])
+
+        if on_output is not None:
+            on_output(output_files)
+            return []
+
+        return output_files
+
+    def process(
+        self,
+        filepaths: Iterable[str],
+        on_output: Callable[[list[str]], None] | None = None,
+    ):
+        """
+        Extract the subtitles of video files.
+
+        Args:
+            filepaths: Paths of the video files
+            on_output: Called from the worker threads with the outputs of each
+                video as soon as it is extracted, they are then not collected
+
+        Returns:
+            List of paths to the extracted subtitle files
+        """
+        # text and bitmap subtitles are demuxed together in a single ffmpeg pass
+        if self.extract_bitmap:
+            extractor = CombinedSubtitleExtractor(self.config, self.prober)
         else:
+            extractor = TextSubtitleExtractor(self.config, self.prober)
+
+        self.state_index  # opened before the workers share it
+
+        if not self.should_add_excluded:
             logger.debug("No adding excluded files")
 
+        output_files = []
+        try:
+            with ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="extractor"
+            ) as executor:
+                # map() submits files as the iterable yields them and returns
+                # results in input order regardless of completion order
+                results = executor.map(
+                    lambda path: self._extract_file(path, extractor, on_output),
+                    filepaths,
+                )
+
+                for files in results:
+                    output_files += files
+        finally:
+            extractor.close()
+            self.flush_excluded_files()
+
+        stats = self.prober.stats()
+        logger.info(
+            f"Probe cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.1%} hit rate)"
+        )
+
         return output_files
 
 
@@ -139,11 +287,35 @@ class PostprocessorModule(Module):
     def __init__(
         self,
         workflow_file: str,
+        workers: int = 1,
+        chunksize: int = 16,
+        index_file: str | None = None,
+        profile: bool = False,
+        profile_file: str | None = None,
         **kwargs,
     ) -> None:
         super().__init__(**kwargs)
 
         self.workflow_file = workflow_file
+        self.workers = max(1, workers)
+        self.chunksize = max(1, chunksize)
+        self.index_file = index_file
+
+        self.profile_file = profile_file
+        self.profiler: WorkflowProfiler | None = None
+
+        # loaded once and reused by every run, see get_formatter
+        self._formatter: SubtitleFormatter | None = None
+        self._formatter_signature: str | None = None
+        self._executor: ProcessPoolExecutor | None = None
+
+        if profile:
+            self.profiler = WorkflowProfiler(cprofile=profile_file is not None)
+
+            if self.workers > 1:
+                # the tasks are profiled in this process
+                logger.info("Profiling workflows, postprocessing files serially")
+                self.workers = 1
 
     @classmethod
     def from_dict(cls, settings: dict):
@@ -152,19 +324,172 @@ class PostprocessorModule(Module):
     def get_file_extensions(self) -> tuple[str, str, str]:
         return ("ass", "srt", "vtt")
 
-    def process(self, filepaths: list[str]):
-        formatter = SubtitleFormatter(self.workflow_file)
+    def get_state_signature(self) -> str:
+        with open(self.workflow_file, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
 
-        output_files = []
-        for path in filepaths:
-            try:
-                output_files += formatter.format(path)
-            except Exception as e:
-                logger.critical(f"An error has occuerd while formatting: {e}")
+    def create_formatter(self) -> SubtitleFormatter:
+        return SubtitleFormatter(self.workflow_file, self.index_file, self.profiler)
+
+    def create_executor(self, formatter: SubtitleFormatter) -> ProcessPoolExecutor:
+        """Start the worker processes, the loaded workflows are sent to each once."""
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_format_worker,
+            initargs=(formatter.workflows, self.index_file),
+        )
+
+    def get_formatter(self) -> SubtitleFormatter:
+        """
+        The formatter of the workflow file, loaded on first use and reused by
+        later runs. It is loaded again when the workflow file has changed.
+        """
+        signature = self.get_state_signature()
+
+        if self._formatter is None or signature != self._formatter_signature:
+            if self._formatter is not None:
+                logger.info("Workflow file has changed, reloading workflows")
+
+            # the workers hold the previous workflows
+            self._shutdown_executor()
+            self._formatter = self.create_formatter()
+            self._formatter_signature = signature
+
+            # files are processed again under the reloaded workflows
+            if self.state_index is not None:
+                self.state_index.signature = signature
+
+        return self._formatter
+
+    def get_executor(self) -> ProcessPoolExecutor | None:
+        """
+        The worker processes of the formatter, started on first use and kept
+        running until close(). None if files are formatted in-process.
+        """
+        if self.workers <= 1:
+            return None
+
+        formatter = self.get_formatter()
+        if self._executor is None:
+            self._executor = self.create_executor(formatter)
+
+        return self._executor
+
+    def _shutdown_executor(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def close(self):
+        """Stop the worker processes and release the loaded workflows."""
+        self._shutdown_executor()
+
+        if self.profiler is not None:
+            self.profiler.close()
+
+        self._formatter = None
+        self._formatter_signature = None
+
+    def _finish_file(self, path: str, error: str | None):
+        if error is not None:
+            logger.critical(f"An error has occuerd while formatting: {error}")
 
         if self.should_add_excluded:
-            self.add_excluded_files(filepaths)
-        else:
+            self.add_excluded_files([path])
+
+        # failed files are retried by the next scan
+        if error is None:
+            self.record_processed_files([path])
+
+    def format_file(
+        self,
+        formatter: SubtitleFormatter,
+        path: str,
+        executor: ProcessPoolExecutor | None = None,
+    ) -> list[str]:
+        """
+        Format a single file, errors are logged and isolated to the file.
+
+        Args:
+            formatter: Formatter of the loaded workflows
+            path: Path of the subtitle file
+            executor: Worker processes from get_executor, formats in-process if None
+
+        Returns:
+            List of paths to the formatted files
+        """
+        output_files, error = [], None
+
+        try:
+            if executor is None:
+                output_files = formatter.format(path)
+            else:
+                output_files, error, changes = executor.submit(
+                    _format_in_worker, path
+                ).result()
+                metrics.REGISTRY.merge(changes)
+        except Exception as e:
+            error = str(e)
+
+        self._finish_file(path, error)
+
+        return output_files
+
+    def process(self, filepaths: Iterable[str]):
+        formatter = self.get_formatter()
+        executor = self.get_executor()
+
+        if not self.should_add_excluded:
             logger.debug("No adding excluded files")
 
+        output_files = []
+        if executor is not None:
+            output_files = self._process_parallel(executor, filepaths)
+        else:
+            for path in filepaths:
+                output_files += self.format_file(formatter, path)
+
+        self.flush_excluded_files()
+        self.report_profile()
+
+        return output_files
+
+    def report_profile(self):
+        """
+        Log the ranked workflow profile and write the cProfile statistics. The
+        allocation tracing of the run is stopped, it slows every thread.
+        """
+        if self.profiler is None:
+            return
+
+        self.profiler.close()
+        if not self.profiler.profiles:
+            return
+
+        logger.info(self.profiler.report())
+
+        if self.profile_file:
+            self.profiler.dump_stats(self.profile_file)
+            logger.info(f"Wrote cProfile statistics of the workflow to {self.profile_file}")
+
+    def _process_parallel(
+        self, executor: ProcessPoolExecutor, filepaths: Iterable[str]
+    ) -> list[str]:
+        output_files = []
+        filepaths = list(filepaths)
+
+        # files are dispatched in chunks to amortise the IPC round trips
+        results = executor.map(_format_in_worker, filepaths, chunksize=self.chunksize)
+
+        try:
+            for path, (files, error, changes) in zip(filepaths, results):
+                metrics.REGISTRY.merge(changes)
+                output_files += files
+                self._finish_file(path, error)
+        except Exception as e:
+            logger.critical(f"Postprocessing workers failed: {e}")
+            # a broken pool is started again by the next run
+            self._shutdown_executor()
+
         return output_files
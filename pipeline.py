@@ -0,0 +1,104 @@
+"""
+Streaming extraction to postprocessing pipeline.
+"""
+
+import logging
+import os
+import queue
+import threading
+from typing import Iterable
+
+import metrics
+from module import ExtractionModule, PostprocessorModule
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 64
+
+QUEUE_DEPTH = metrics.gauge(
+    "subextractor_pipeline_queue_depth", "Extracted subtitles waiting for postprocessing"
+)
+
+
+def run_pipeline(
+    extract_mod: ExtractionModule,
+    post_mod: PostprocessorModule,
+    filepaths: Iterable[str],
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+) -> int:
+    """
+    Extract video files and postprocess their subtitles concurrently.
+
+    Every subtitle produced by the extraction workers is put into a bounded
+    queue consumed by postprocessing threads, so subtitles are formatted while
+    other videos are still being extracted. Extraction workers block when the
+    queue is full, which keeps the backlog of the postprocessor bounded. Each of
+    the postprocessor's workers gets a consumer thread, formatting in a worker
+    process when there is more than one.
+
+    Args:
+        extract_mod: Module extracting the video files
+        post_mod: Module formatting the extracted subtitles
+        filepaths: Paths of the video files
+        queue_size: Maximum number of subtitles waiting for postprocessing
+
+    Returns:
+        Number of postprocessed subtitle files
+    """
+    # the workers are owned by the module and reused by later runs
+    formatter = post_mod.get_formatter()
+    executor = post_mod.get_executor()
+    extensions = {"." + ext for ext in post_mod.get_file_extensions()}
+
+    subtitles: queue.Queue[str | None] = queue.Queue(maxsize=max(1, queue_size))
+    formatted = 0
+    formatted_lock = threading.Lock()
+
+    def consume():
+        nonlocal formatted
+
+        while True:
+            path = subtitles.get()
+            if path is None:
+                break
+
+            try:
+                count = len(post_mod.format_file(formatter, path, executor))
+            except Exception as e:
+                # keep consuming, producers would block on a full queue otherwise
+                logger.critical(f"An unexpected error has occurred for {path}: {e}")
+                continue
+
+            with formatted_lock:
+                formatted += count
+
+    def produce(output_files: list[str]):
+        for path in output_files:
+            # extraction also outputs files the postprocessor does not handle (e.g. .sup)
+            if os.path.splitext(path)[1].lower() in extensions:
+                subtitles.put(path)
+
+    consumers = [
+        threading.Thread(target=consume, name=f"postprocessor-{i}", daemon=True)
+        for i in range(post_mod.workers)
+    ]
+    for consumer in consumers:
+        consumer.start()
+
+    QUEUE_DEPTH.set_function(subtitles.qsize)
+
+    try:
+        extract_mod.process(filepaths, on_output=produce)
+    finally:
+        for _ in consumers:
+            subtitles.put(None)
+        for consumer in consumers:
+            consumer.join()
+
+        QUEUE_DEPTH.set_function(None)
+
+        post_mod.flush_excluded_files()
+        post_mod.report_profile()
+
+    logger.info(f"Pipeline postprocessed {formatted} subtitle files")
+    return formatted
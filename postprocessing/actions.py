@@ -1,15 +1,21 @@
 import re
-from typing import Any
+from typing import Any, Iterable
 
+import numpy as np
 from pysubs2 import SSAEvent, SSAFile, SSAStyle
 
+from .ass_tags import scale_text
+from .columnar import EventTable, columnar, preserves_columns, with_table
+from .selection import EventSelection
 from .user_actions import *
 
 
+@preserves_columns
 def info_select_current_info(ssafile: SSAFile, **kwargs) -> list[dict[str, Any]]:
     return [ssafile.info]
 
 
+@preserves_columns
 def info_action_update(ssafile: SSAFile, items: list[dict[str, Any]], **kwargs) -> list:
     for info in items:
         info.update(kwargs)
@@ -17,10 +23,12 @@ def info_action_update(ssafile: SSAFile, items: list[dict[str, Any]], **kwargs)
     return items
 
 
+@preserves_columns
 def styles_select_all(ssafile: SSAFile, **kwargs) -> list[SSAStyle]:
     return [ssafile.styles[k] for k in ssafile.styles]
 
 
+@preserves_columns
 def styles_select_top(ssafile: SSAFile, **kwargs) -> list[SSAStyle]:
     counts = {}
     for event in ssafile.events:
@@ -35,6 +43,7 @@ def styles_select_top(ssafile: SSAFile, **kwargs) -> list[SSAStyle]:
     return [ssafile.styles[key]]
 
 
+@preserves_columns
 def styles_action_scale_margins(
     ssafile: SSAFile, items: list[SSAStyle], **kwargs
 ) -> list:
@@ -52,53 +61,140 @@ def styles_action_scale_margins(
     return items
 
 
+@preserves_columns
 def styles_action_scale(ssafile: SSAFile, items: list[SSAStyle], **kwargs) -> list:
     styles_action_scale_margins(ssafile, items, **kwargs)
 
     return items
 
 
+@preserves_columns
 def events_action_scale_position(
     ssafile: SSAFile, items: list[SSAEvent], **kwargs
 ) -> list:
-    """Scale position for all events in the items list."""
+    """Scale positions, clips, drawings and sizes in the override tags of all events."""
     y_ratio = float(kwargs["y_new"]) / float(kwargs["y_old"])
     x_ratio = float(kwargs["x_new"]) / float(kwargs["x_old"])
 
     for event in items:
         if isinstance(event, SSAEvent):
-            m: re.Match
-            for m in re.finditer(r"\\pos\(([0-9\.]+),([0-9\.]+)\)", str(event.text)):
-                x_pos = float(m.group(1)) * x_ratio
-                y_pos = float(m.group(2)) * y_ratio
-
-                new_pos = f"\\pos({x_pos:.1f},{y_pos:.1f})"
-                event.text = event.text.replace(str(m.group(0)), new_pos)
+            event.text = scale_text(event.text, x_ratio, y_ratio)
     return items
 
 
+@columnar
 def events_action_scale_margins(
-    ssafile: SSAFile, items: list[SSAEvent], **kwargs
+    ssafile: SSAFile, items: list[SSAEvent], table: EventTable | None = None, **kwargs
 ) -> list:
     """Scale margins for all events in the items list."""
     y_ratio = float(kwargs["y_new"]) / float(kwargs["y_old"])
     x_ratio = float(kwargs["x_new"]) / float(kwargs["x_old"])
 
-    for event in items:
-        if isinstance(event, SSAEvent):
-            event.marginv = round(event.marginv * y_ratio)
-            event.marginl = round(event.marginl * x_ratio)
-            event.marginr = round(event.marginr * x_ratio)
+    def scale(table: EventTable):
+        rows = table.rows(items)
+        # np.rint rounds half to even like round()
+        table.update("marginv", rows, np.rint(table["marginv"][rows] * y_ratio))
+        table.update("marginl", rows, np.rint(table["marginl"][rows] * x_ratio))
+        table.update("marginr", rows, np.rint(table["marginr"][rows] * x_ratio))
+
+    with_table(table, ssafile.events, scale)
     return items
 
 
-def events_action_scale(ssafile: SSAFile, items: list[SSAEvent], **kwargs) -> list:
+@columnar
+def events_action_scale(
+    ssafile: SSAFile, items: list[SSAEvent], table: EventTable | None = None, **kwargs
+) -> list:
     """Scale both margins and position for all events in the items list."""
-    events_action_scale_margins(ssafile, items, **kwargs)
+    events_action_scale_margins(ssafile, items, table=table, **kwargs)
     events_action_scale_position(ssafile, items, **kwargs)
     return items
 
 
+@columnar
+def events_action_shift(
+    ssafile: SSAFile,
+    items: list[SSAEvent],
+    table: EventTable | None = None,
+    h: float = 0,
+    m: float = 0,
+    s: float = 0,
+    ms: float = 0,
+    **kwargs,
+) -> list:
+    """Shift the events in the items list in time, times are clamped at 0."""
+    delta = round(float(ms) + 1000 * (float(s) + 60 * (float(m) + 60 * float(h))))
+
+    def shift(table: EventTable):
+        rows = table.rows(items)
+        table.update("start", rows, np.maximum(table["start"][rows] + delta, 0))
+        table.update("end", rows, np.maximum(table["end"][rows] + delta, 0))
+
+    with_table(table, ssafile.events, shift)
+    return items
+
+
+@columnar
+def events_action_retime(
+    ssafile: SSAFile,
+    items: list[SSAEvent],
+    table: EventTable | None = None,
+    **kwargs,
+) -> list:
+    """Convert the times of the events in the items list from fps_old to fps_new."""
+    ratio = float(kwargs["fps_old"]) / float(kwargs["fps_new"])
+
+    def retime(table: EventTable):
+        rows = table.rows(items)
+        table.update("start", rows, np.rint(table["start"][rows] * ratio))
+        table.update("end", rows, np.rint(table["end"][rows] * ratio))
+
+    with_table(table, ssafile.events, retime)
+    return items
+
+
+@columnar
+def events_action_fix_durations(
+    ssafile: SSAFile,
+    items: list[SSAEvent],
+    table: EventTable | None = None,
+    min_duration: float = 0,
+    min_gap: float = 0,
+    **kwargs,
+) -> list:
+    """
+    Enforce a minimum duration and a minimum gap between the events in the items list.
+
+    Events are extended to min_duration without running into the min_gap before
+    the next event. Events ending less than min_gap before the next event starts,
+    or slightly overlapping it, are shortened. Events overlapping the whole next
+    event (e.g. signs) are left as they are.
+    """
+    min_duration, min_gap = round(float(min_duration)), round(float(min_gap))
+
+    def fix(table: EventTable):
+        rows = table.rows(items)
+        if len(rows) == 0:
+            return
+
+        rows = rows[np.argsort(table["start"][rows], kind="stable")]
+        start, end = table["start"][rows], table["end"][rows]
+
+        next_start = np.append(start[1:], np.iinfo(np.int64).max // 2)
+        next_end = np.append(end[1:], np.iinfo(np.int64).max // 2)
+        limit = next_start - min_gap
+
+        extended = np.maximum(end, start + min_duration)
+        extended = np.where(extended > limit, np.maximum(end, limit), extended)
+
+        too_close = (extended > limit) & (limit > start) & (extended <= next_end)
+        table.update("end", rows, np.where(too_close, limit, extended))
+
+    with_table(table, ssafile.events, fix)
+    return items
+
+
+@preserves_columns
 def styles_action_update_properties(
     ssafile: SSAFile, items: list[SSAStyle], **kwargs
 ) -> list:
@@ -109,6 +205,7 @@ def styles_action_update_properties(
     return items
 
 
+@preserves_columns
 def styles_remove(ssafile: SSAFile, items: list[SSAStyle], **kwargs) -> list:
     """Remove all styles in the items list."""
     for style in items:
@@ -121,31 +218,28 @@ def styles_remove(ssafile: SSAFile, items: list[SSAStyle], **kwargs) -> list:
     return items
 
 
-def events_select_all(ssafile: SSAFile, **kwargs) -> list[SSAEvent]:
-    return ssafile.events
+@preserves_columns
+def events_select_all(ssafile: SSAFile, **kwargs) -> EventSelection:
+    return EventSelection.all(ssafile.events)
 
 
+@preserves_columns
 def events_filter_regex(
     ssafile: SSAFile, items: list[SSAEvent], regex: str = "", **kwargs
-) -> list[SSAEvent]:
+) -> EventSelection:
     """Filter events by regex pattern."""
-    return [
-        event
-        for event in items
-        if isinstance(event, SSAEvent) and bool(re.match(regex, event.text))
-    ]
+    selection = EventSelection.from_items(ssafile.events, items)
+    return selection.filter(lambda event: re.match(regex, event.text))
 
 
+@preserves_columns
 def events_filter_properties(
     ssafile: SSAFile, items: list[SSAEvent], **kwargs
-) -> list[SSAEvent]:
+) -> EventSelection:
     """Filter events by properties."""
-    results = []
-
-    for event in items:
-        if not isinstance(event, SSAEvent):
-            continue
+    selection = EventSelection.from_items(ssafile.events, items)
 
+    def matches(event: SSAEvent) -> bool:
         fil = True
 
         if "is_comment" in kwargs:
@@ -154,12 +248,46 @@ def events_filter_properties(
         if "is_drawing" in kwargs:
             fil = fil and event.is_drawing == kwargs["is_drawing"]
 
-        if fil:
-            results.append(event)
+        return fil
+
+    return selection.filter(matches)
+
+
+def _as_selection(selection: Any, uses: str) -> Iterable:
+    if isinstance(selection, str) or not isinstance(selection, Iterable):
+        raise ValueError(f"{uses} requires a 'selection' of events, got: {selection}")
+
+    # aligned by the set operation, stored selections are copies of the events
+    return selection
+
+
+@preserves_columns
+def events_filter_union(
+    ssafile: SSAFile, items: list[SSAEvent], selection: Any = None, **kwargs
+) -> EventSelection:
+    """Add the events of another selection, e.g. {{outputs['id']}}, to the items."""
+    other = _as_selection(selection, "events_filter_union")
+    return EventSelection.from_items(ssafile.events, items).union(other)
 
-    return results
 
+@preserves_columns
+def events_filter_intersection(
+    ssafile: SSAFile, items: list[SSAEvent], selection: Any = None, **kwargs
+) -> EventSelection:
+    """Keep the items that are also in another selection, e.g. {{outputs['id']}}."""
+    other = _as_selection(selection, "events_filter_intersection")
+    return EventSelection.from_items(ssafile.events, items).intersection(other)
 
+
+@preserves_columns
+def events_filter_invert(
+    ssafile: SSAFile, items: list[SSAEvent], **kwargs
+) -> EventSelection:
+    """Select the events of the file that are not in the items."""
+    return EventSelection.from_items(ssafile.events, items).invert()
+
+
+@preserves_columns
 def events_action_regex_substitution(
     ssafile: SSAFile,
     items: list[SSAEvent],
@@ -176,9 +304,10 @@ def events_action_regex_substitution(
 
 def events_action_delete(ssafile: SSAFile, items: list[SSAEvent], **kwargs) -> list:
     """Delete all events in the items list."""
-    for event in items:
-        if isinstance(event, SSAEvent) and event in ssafile.events:
-            ssafile.events.remove(event)
+    deleted = EventSelection.from_items(ssafile.events, items).mask.tolist()
+
+    # rebuilt as a new list, selections made before stay bound to the old one
+    ssafile.events = [e for e, d in zip(ssafile.events, deleted) if not d]
 
     return items
 
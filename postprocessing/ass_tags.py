@@ -0,0 +1,203 @@
+"""
+Tokenizer of ASS override blocks and scaling of the tags holding coordinates.
+
+The text of an event is parsed once into plain text and override blocks split
+into (name, value) tags. Tokens are cached by text for the duration of a
+workflow, so several actions working on the tags of the same events only parse
+them once, and rendering the tokens back gives the original text.
+"""
+
+import re
+from functools import lru_cache
+
+TEXT = "text"
+BLOCK = "block"
+
+# ("text", str) or ("block", ((name, value), ...)), a tag named "" is a comment
+Token = tuple[str, object]
+Tag = tuple[str, str]
+
+NAME_PATTERN = re.compile(r"[0-9]?[a-zA-Z]*")
+NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d*)?|-?\.\d+")
+
+# tags with a single length, scaled by the horizontal or vertical ratio
+X_TAGS = {"xbord", "xshad", "fsp"}
+Y_TAGS = {"fs", "bord", "shad", "ybord", "yshad", "pbo"}
+# tags with (x, y, ...) coordinates, the number of coordinates to scale
+POINT_TAGS = {"pos": 2, "org": 2, "move": 4}
+
+
+def _split_tags(content: str) -> tuple[Tag, ...]:
+    """Split the content of an override block into tags."""
+    tags: list[Tag] = []
+    i = 0
+
+    while i < len(content):
+        if content[i] != "\\":
+            end = content.find("\\", i)
+            end = len(content) if end == -1 else end
+            tags.append(("", content[i:end]))
+            i = end
+            continue
+
+        name = NAME_PATTERN.match(content, i + 1).group(0)  # type: ignore[union-attr]
+        j = i + 1 + len(name)
+        depth = 0
+
+        # the value runs until the next tag outside of parentheses
+        while j < len(content) and (depth or content[j] != "\\"):
+            if content[j] == "(":
+                depth += 1
+            elif content[j] == ")":
+                depth = max(depth - 1, 0)
+            j += 1
+
+        tags.append((name, content[i + 1 + len(name) : j]))
+        i = j
+
+    return tuple(tags)
+
+
+@lru_cache(maxsize=65536)
+def tokenize(text: str) -> tuple[Token, ...]:
+    """Split the text of an event into plain text and override blocks."""
+    tokens: list[Token] = []
+    i = 0
+
+    while i < len(text):
+        start = text.find("{", i)
+        end = text.find("}", start) if start != -1 else -1
+
+        if start == -1 or end == -1:
+            tokens.append((TEXT, text[i:]))
+            break
+
+        if start > i:
+            tokens.append((TEXT, text[i:start]))
+
+        tokens.append((BLOCK, _split_tags(text[start + 1 : end])))
+        i = end + 1
+
+    return tuple(tokens)
+
+
+def clear_cache():
+    """Release the tokens cached while running a workflow."""
+    tokenize.cache_clear()
+
+
+def _render_tags(tags) -> str:
+    return "".join(f"\\{name}{value}" if name else value for name, value in tags)
+
+
+def render(tokens) -> str:
+    """Join tokens back into the text of an event."""
+    return "".join(
+        content if kind == TEXT else "{" + _render_tags(content) + "}"  # type: ignore[operator]
+        for kind, content in tokens
+    )
+
+
+def _format(value: float) -> str:
+    formatted = f"{value:.2f}".rstrip("0").rstrip(".")
+    return "0" if formatted == "-0" else formatted
+
+
+def scale_drawing(drawing: str, x_ratio: float, y_ratio: float) -> str:
+    """Scale the coordinates of drawing commands, numbers alternate x and y."""
+    index = -1
+
+    def scale(match: re.Match) -> str:
+        nonlocal index
+        index += 1
+        ratio = x_ratio if index % 2 == 0 else y_ratio
+        return _format(float(match.group(0)) * ratio)
+
+    return NUMBER_PATTERN.sub(scale, drawing)
+
+
+def _scale_args(args: list[str], count: int, x_ratio: float, y_ratio: float) -> list:
+    scaled = list(args)
+    for i in range(min(count, len(args))):
+        try:
+            value = float(args[i])
+        except ValueError:
+            continue
+        scaled[i] = _format(value * (x_ratio if i % 2 == 0 else y_ratio))
+
+    return scaled
+
+
+def _scale_tag(name: str, value: str, x_ratio: float, y_ratio: float) -> str:
+    if name in X_TAGS or name in Y_TAGS:
+        try:
+            number = float(value)
+        except ValueError:
+            return value  # reset to the style value or not a number
+        return _format(number * (x_ratio if name in X_TAGS else y_ratio))
+
+    if not (value.startswith("(") and value.endswith(")")):
+        return value
+
+    args = value[1:-1]
+
+    if name in POINT_TAGS:
+        parts = [part.strip() for part in args.split(",")]
+        scaled = _scale_args(parts, POINT_TAGS[name], x_ratio, y_ratio)
+        return "(" + ",".join(scaled) + ")"
+
+    if name in ("clip", "iclip"):
+        parts = [part.strip() for part in args.split(",")]
+        if len(parts) == 4:
+            return "(" + ",".join(_scale_args(parts, 4, x_ratio, y_ratio)) + ")"
+
+        # vector clip with an optional scale, only the drawing is scaled
+        parts[-1] = scale_drawing(parts[-1], x_ratio, y_ratio)
+        return "(" + ",".join(parts) + ")"
+
+    if name == "t":
+        # animated tags follow the optional times and acceleration
+        start = args.find("\\")
+        if start == -1:
+            return value
+        tags = scale_tags(_split_tags(args[start:]), x_ratio, y_ratio)
+        return "(" + args[:start] + _render_tags(tags) + ")"
+
+    return value
+
+
+def scale_tags(tags, x_ratio: float, y_ratio: float) -> tuple[Tag, ...]:
+    return tuple(
+        (name, _scale_tag(name, value, x_ratio, y_ratio) if name else value)
+        for name, value in tags
+    )
+
+
+def scale_text(text: str, x_ratio: float, y_ratio: float) -> str:
+    """
+    Scale every coordinate-bearing override tag and drawing of an event text.
+
+    Positions (pos, move, org), clips, font size, spacing, border and shadow
+    sizes are scaled, as are drawings following \\p tags.
+    """
+    if "{" not in text:
+        return text
+
+    scaled = []
+    drawing = False
+
+    for kind, content in tokenize(text):
+        if kind == TEXT:
+            if drawing:
+                content = scale_drawing(content, x_ratio, y_ratio)  # type: ignore[arg-type]
+            scaled.append((kind, content))
+            continue
+
+        tags = scale_tags(content, x_ratio, y_ratio)
+        for name, value in tags:
+            if name == "p":
+                drawing = value.strip() not in ("", "0")
+
+        scaled.append((kind, tags))
+
+    return render(scaled)
@@ -0,0 +1,112 @@
+"""
+Columnar view of the numeric event fields for vectorized actions.
+"""
+
+from typing import Callable, Iterable
+
+import numpy as np
+from pysubs2 import SSAEvent
+
+from .selection import EventSelection
+
+# numeric SSAEvent fields held as columns, all of them are integers
+COLUMNS = ("start", "end", "marginl", "marginr", "marginv", "layer")
+
+
+def columnar(func: Callable) -> Callable:
+    """Mark an action operating on the EventTable passed as 'table'."""
+    func.columnar = True  # type: ignore[attr-defined]
+    return func
+
+
+def preserves_columns(func: Callable) -> Callable:
+    """
+    Mark a task that neither reads nor writes the columnar fields and does not
+    add, remove or reorder events, so the EventTable stays valid across it.
+    """
+    func.preserves_columns = True  # type: ignore[attr-defined]
+    return func
+
+
+class EventTable:
+    """
+    NumPy arrays of the numeric fields of a list of events.
+
+    Columns are read from the events when first used and written back by sync(),
+    so a series of columnar actions touches the SSAEvent objects only once. The
+    event list must not be modified while the table is in use.
+    """
+
+    def __init__(self, events: list[SSAEvent]):
+        self.events = events
+        self._columns: dict[str, np.ndarray] = {}
+        self._dirty: set[str] = set()
+        self._rows_by_id: dict[int, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in self._columns:
+            if name not in COLUMNS:
+                raise KeyError(f"Not a columnar field: {name}")
+
+            self._columns[name] = np.fromiter(
+                (getattr(e, name) for e in self.events),
+                dtype=np.int64,
+                count=len(self.events),
+            )
+
+        return self._columns[name]
+
+    def update(self, name: str, rows: np.ndarray, values: np.ndarray):
+        """Set the values of a column for the given rows."""
+        column = self[name]
+        column[rows] = values
+        self._dirty.add(name)
+
+    def rows(self, items: Iterable) -> np.ndarray:
+        """Return the row indices of the events among the items, in item order."""
+        if isinstance(items, EventSelection) and items.events is self.events:
+            return items.indices
+
+        items = list(items)
+
+        # the common case of a selection of all events in order
+        if len(items) == len(self.events) and all(
+            a is b for a, b in zip(items, self.events)
+        ):
+            return np.arange(len(self.events))
+
+        if self._rows_by_id is None:
+            self._rows_by_id = {id(e): i for i, e in enumerate(self.events)}
+
+        rows = [
+            self._rows_by_id[id(item)] for item in items if id(item) in self._rows_by_id
+        ]
+        return np.asarray(rows, dtype=np.intp)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._dirty)
+
+    def sync(self):
+        """Write the modified columns back to the events."""
+        for name in self._dirty:
+            for event, value in zip(self.events, self._columns[name].tolist()):
+                setattr(event, name, value)
+
+        self._dirty.clear()
+
+
+def with_table(
+    table: EventTable | None, events: list[SSAEvent], action: Callable[[EventTable], None]
+):
+    """Run a columnar action, on a temporary table synced at once if none is given."""
+    if table is not None:
+        action(table)
+        return
+
+    table = EventTable(events)
+    action(table)
+    table.sync()
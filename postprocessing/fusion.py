@@ -0,0 +1,179 @@
+"""
+Fusion of consecutive regex tasks into a single pass over the events.
+
+Cleanup workflows chain many regex filters and substitutions on the same
+selection. Consecutive tasks with constant patterns are replaced by one task
+compiling the patterns once and applying all of them to each event in turn,
+which gives the same result as running the tasks one after the other.
+"""
+
+import re
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Iterable
+
+from pysubs2 import SSAEvent, SSAFile
+
+from .selection import EventSelection
+from .task import Task
+
+
+def required_literal(pattern: re.Pattern) -> str | None:
+    """
+    Find a substring contained in every match of a pattern.
+
+    Only literals at the top level of the pattern are considered, the longest
+    run of consecutive literals is returned. None if no literal is required or
+    the pattern cannot be analysed.
+    """
+    if not isinstance(pattern.pattern, str) or pattern.flags & re.IGNORECASE:
+        return None
+
+    try:
+        from re import _parser  # type: ignore[attr-defined]
+
+        parsed = _parser.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return None
+
+    best, run = "", ""
+    for op, value in parsed:
+        if op is _parser.LITERAL:
+            run += chr(value)
+        else:
+            run = ""
+
+        if len(run) > len(best):
+            best = run
+
+    return best or None
+
+
+@dataclass(frozen=True)
+class TextRule:
+    """A compiled pattern with its replacement and literal prefilter."""
+
+    pattern: re.Pattern
+    replace: str = ""
+    literal: str | None = None
+
+    @classmethod
+    def compile(cls, regex: str, replace: str = "") -> "TextRule":
+        pattern = re.compile(regex)
+        return cls(pattern, replace, required_literal(pattern))
+
+    def may_match(self, text: str) -> bool:
+        return self.literal is None or self.literal in text
+
+
+class RegexFilter:
+    """Keep the events matching every rule, like a series of events_filter_regex."""
+
+    preserves_columns = True
+
+    def __init__(self, rules: Iterable[TextRule]):
+        self.rules = tuple(rules)
+
+    def matches(self, event: SSAEvent) -> bool:
+        text = event.text
+        return all(
+            rule.may_match(text) and rule.pattern.match(text) for rule in self.rules
+        )
+
+    def __call__(self, ssafile: SSAFile, items: list, **kwargs) -> EventSelection:
+        return EventSelection.from_items(ssafile.events, items).filter(self.matches)
+
+
+class RegexSubstitution:
+    """Apply every rule to each event, like a series of events_action_regex_substitution."""
+
+    preserves_columns = True
+
+    def __init__(self, rules: Iterable[TextRule]):
+        self.rules = tuple(rules)
+
+    def __call__(self, ssafile: SSAFile, items: list, **kwargs) -> list:
+        for event in items:
+            if not isinstance(event, SSAEvent):
+                continue
+
+            text = original = event.text
+            for rule in self.rules:
+                if rule.may_match(text):
+                    text = rule.pattern.sub(rule.replace, text)
+
+            if text is not original:
+                event.text = text
+
+        return items
+
+
+# fusable actions -> (fused implementation, parameter names)
+FUSABLE = {
+    "events_filter_regex": (RegexFilter, ("regex",)),
+    "events_action_regex_substitution": (RegexSubstitution, ("regex", "replace")),
+}
+
+
+def _fusable(task: Task) -> bool:
+    if task.func_name not in FUSABLE or task.id or task.templates:
+        return False
+
+    _, names = FUSABLE[task.func_name]
+    return all(isinstance(task.params.get(name, ""), str) for name in names)
+
+
+def _fuse(tasks: list[Task]) -> Task:
+    func_name = tasks[0].func_name
+    implementation, names = FUSABLE[func_name]
+
+    rules = []
+    for task in tasks:
+        try:
+            rules.append(TextRule.compile(*(task.params.get(name, "") for name in names)))
+        except re.error as e:
+            raise ValueError(f"Invalid regex in {func_name}: {e}")
+
+    return Task(
+        func_name,
+        implementation(rules),
+        None,
+        MappingProxyType({}),
+        MappingProxyType({}),
+    )
+
+
+def fuse_regex_tasks(tasks: tuple[Task, ...]) -> tuple[Task, ...]:
+    """
+    Replace consecutive regex tasks of the same kind with constant parameters by
+    a single compiled task.
+
+    Raises:
+        ValueError: If a pattern is invalid
+    """
+    fused: list[Task] = []
+    group: list[Task] = []
+
+    for task in (*tasks, None):
+        if (
+            group
+            and task is not None
+            and _fusable(task)
+            and task.func_name == group[0].func_name
+        ):
+            group.append(task)
+            continue
+
+        if group:
+            fused.append(_fuse(group))
+            group = []
+
+        if task is None:
+            break
+
+        if _fusable(task):
+            group.append(task)
+        else:
+            fused.append(task)
+
+    return tuple(fused)
@@ -0,0 +1,66 @@
+"""
+Sidecar index of postprocessed files.
+
+Every file written by a workflow is recorded with a hash of the workflow and a
+hash of the content written. A file whose content still has the recorded hash
+was produced by that workflow and is not processed again, even if it was touched
+or the exclusion list was reset.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+
+
+def workflow_digest(tasks: list[dict]) -> str:
+    """Hash of the workflow tasks of a format."""
+    data = json.dumps(tasks, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """Hash of the content of a file, read in blocks."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha1").hexdigest()
+
+
+class ProcessedIndex:
+    """SQLite record of the workflow and output hash of postprocessed files."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS processed (
+                path TEXT PRIMARY KEY,
+                workflow TEXT NOT NULL,
+                digest TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def is_processed(self, path: str, workflow: str, digest: str) -> bool:
+        """Check if the content of a file was written by the given workflow."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT workflow, digest FROM processed WHERE path = ?", (path,)
+            ).fetchone()
+
+        return row == (workflow, digest)
+
+    def record(self, path: str, workflow: str, digest: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO processed VALUES (?, ?, ?)",
+                (path, workflow, digest),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,100 @@
+"""
+Compilation of workflow definitions into reusable execution plans.
+"""
+
+from dataclasses import dataclass, replace
+
+from .fusion import fuse_regex_tasks
+from .snapshot import analyze_references
+from .task import Task
+
+SECTIONS = ("selectors", "filters", "actions", "misc")
+
+
+@dataclass(frozen=True)
+class WorkflowStep:
+    """The compiled sections of a workflow task, in execution order."""
+
+    selectors: tuple[Task, ...] = ()
+    filters: tuple[Task, ...] = ()
+    actions: tuple[Task, ...] = ()
+    misc: tuple[Task, ...] = ()
+
+
+@dataclass(frozen=True)
+class WorkflowPlan:
+    """Immutable, compiled workflow of a subtitle format."""
+
+    steps: tuple[WorkflowStep, ...]
+
+    @property
+    def tasks(self) -> tuple[Task, ...]:
+        return tuple(
+            task
+            for step in self.steps
+            for section in SECTIONS
+            for task in getattr(step, section)
+        )
+
+
+def compile_workflow(workflows: list[dict]) -> WorkflowPlan:
+    """
+    Compile the tasks of a workflow.
+
+    Args:
+        workflows: Workflow tasks as loaded from the workflow file
+
+    Returns:
+        The compiled plan
+
+    Raises:
+        ValueError: If a task or section is invalid
+    """
+    steps = []
+
+    for workflow_task in workflows or []:
+        if not isinstance(workflow_task, dict):
+            raise ValueError(f"Workflow task must be a mapping: {workflow_task}")
+
+        sections = {}
+
+        for section_name, task_list in workflow_task.items():
+            if section_name not in SECTIONS:
+                raise ValueError(f"Unknown workflow section: {section_name}")
+
+            # consecutive regex filters or substitutions run as a single pass
+            sections[section_name] = fuse_regex_tasks(
+                tuple(Task.from_dict(task_dict) for task_dict in task_list or [])
+            )
+
+        steps.append(WorkflowStep(**sections))
+
+    return _bind_snapshots(WorkflowPlan(tuple(steps)))
+
+
+def _bind_snapshots(plan: WorkflowPlan) -> WorkflowPlan:
+    """Restrict the outputs stored by tasks to the values read by templates."""
+    references = analyze_references(
+        expression for task in plan.tasks for expression in task.expressions
+    )
+
+    if references is None:
+        return plan  # full copies when the references cannot be analysed
+
+    def bind(task: Task) -> Task:
+        if not task.id:
+            return task
+
+        return replace(task, snapshot=frozenset(references.get(task.id, ())))
+
+    return WorkflowPlan(
+        tuple(
+            WorkflowStep(
+                **{
+                    section: tuple(bind(task) for task in getattr(step, section))
+                    for section in SECTIONS
+                }
+            )
+            for step in plan.steps
+        )
+    )
@@ -0,0 +1,183 @@
+"""
+Profiling of the tasks of postprocessing workflows.
+"""
+
+import cProfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from .plan import SECTIONS, WorkflowPlan
+from .task import Task
+
+
+@dataclass
+class TaskProfile:
+    """Totals of a task over every run."""
+
+    label: str
+    calls: int = 0
+    seconds: float = 0.0
+    items_in: int = 0
+    # None while the task never returned a value, e.g. actions
+    items_out: int | None = None
+    # largest allocation peak of a single call
+    peak_bytes: int = 0
+    # memory still allocated after the calls, e.g. stored outputs
+    net_bytes: int = 0
+
+
+def _count(value: Any) -> int:
+    if value is None:
+        return 0
+
+    return len(value) if hasattr(value, "__len__") else 1
+
+
+def _describe(task: Task) -> str:
+    name = task.func_name
+
+    rules = getattr(task.func, "rules", None)
+    if rules is not None:
+        name += f" (fused x{len(rules)})"
+    if task.id:
+        name += f" [{task.id}]"
+
+    return name
+
+
+class WorkflowProfiler:
+    """
+    Records the wall time, item counts and allocations of every task run by the
+    workflow runners it is given to, summed over all files.
+
+    Tasks of registered plans are reported by format, step and section, the
+    totals of a task are kept when its workflow is loaded again.
+
+    Allocations are traced with tracemalloc from the first measured task until
+    close(). Tracing is process-wide, allocations of other threads running at
+    the same time are counted against the measured task.
+    """
+
+    def __init__(self, memory: bool = True, cprofile: bool = False):
+        self.memory = memory
+        self.cprofile = cProfile.Profile() if cprofile else None
+        self.files = 0
+        self.profiles: dict[str, TaskProfile] = {}
+
+        self._plans: dict[str, WorkflowPlan] = {}
+        self._labels: dict[int, str] = {}
+        self._tracing = False
+
+    def add_plan(self, name: str, plan: WorkflowPlan):
+        """Label the tasks of the plan of a format."""
+        # the plans are kept referenced, the ids of their tasks stay unique
+        self._plans[name] = plan
+        self._labels = {}
+
+        for fmt, registered in self._plans.items():
+            for number, step in enumerate(registered.steps, 1):
+                for section in SECTIONS:
+                    for i, task in enumerate(getattr(step, section)):
+                        label = f"{fmt} step {number} {section}[{i}]: {_describe(task)}"
+                        self._labels[id(task)] = label
+
+    def _profile(self, task: Task) -> TaskProfile:
+        label = self._labels.get(id(task)) or _describe(task)
+
+        if label not in self.profiles:
+            self.profiles[label] = TaskProfile(label)
+
+        return self.profiles[label]
+
+    def measure(self, task: Task, items: Any, func: Callable, *args) -> Any:
+        """
+        Run func(*args) as the execution of a task.
+
+        Args:
+            task: The task executed
+            items: Items the task is given, counted as its input
+            func: Function executing the task
+        """
+        profile = self._profile(task)
+
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracing = True
+
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+
+        if self.cprofile is not None:
+            self.cprofile.enable()
+
+        start = time.perf_counter()
+
+        try:
+            result = func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+
+            if self.cprofile is not None:
+                self.cprofile.disable()
+
+            profile.calls += 1
+            profile.seconds += elapsed
+            profile.items_in += _count(items)
+
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                profile.peak_bytes = max(profile.peak_bytes, peak - before)
+                profile.net_bytes += current - before
+
+        if result is not None:
+            profile.items_out = (profile.items_out or 0) + _count(result)
+
+        return result
+
+    def ranked(self) -> list[TaskProfile]:
+        """Profiles of the tasks, slowest first."""
+        return sorted(self.profiles.values(), key=lambda p: p.seconds, reverse=True)
+
+    def report(self, limit: int | None = None) -> str:
+        """Format the profiles as a table ranked by total time."""
+        ranked = self.ranked()
+        total = sum(p.seconds for p in ranked)
+
+        lines = [
+            f"Workflow profile of {self.files} file(s), {total:.3f}s in {len(ranked)} task(s)",
+            f"{'#':>3}  {'calls':>6} {'total s':>9} {'share':>6} {'mean ms':>9} "
+            f"{'items in':>9} {'items out':>9} {'peak KiB':>9} {'net KiB':>9}  task",
+        ]
+
+        for rank, p in enumerate(ranked[:limit], 1):
+            share = p.seconds / total if total else 0.0
+            mean = p.seconds / p.calls * 1000 if p.calls else 0.0
+            items_out = "-" if p.items_out is None else str(p.items_out)
+            memory = (
+                (f"{p.peak_bytes / 1024:.1f}", f"{p.net_bytes / 1024:.1f}")
+                if self.memory
+                else ("-", "-")
+            )
+
+            lines.append(
+                f"{rank:>3}  {p.calls:>6} {p.seconds:>9.4f} {share:>6.1%} {mean:>9.3f} "
+                f"{p.items_in:>9} {items_out:>9} {memory[0]:>9} {memory[1]:>9}  {p.label}"
+            )
+
+        return "\n".join(lines)
+
+    def dump_stats(self, path: str):
+        """Write the cProfile statistics of the tasks, readable with pstats."""
+        if self.cprofile is None:
+            raise RuntimeError("The profiler was created without cProfile")
+
+        self.cprofile.dump_stats(path)
+
+    def close(self):
+        """Stop tracing allocations, if the tracing was started by the profiler."""
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
@@ -1,46 +1,119 @@
+import hashlib
 import logging
+import os
+import time
 from pathlib import Path
 
 import pysubs2
 import yaml
 
+import metrics
+
+from . import ass_tags
+from .columnar import EventTable
+from .index import ProcessedIndex, file_digest, workflow_digest
+from .plan import WorkflowPlan, compile_workflow
+from .profiler import WorkflowProfiler
+from .selection import EventSelection
+from .streaming import STREAM_FORMATS, is_streamable, stream_file
 from .task import Task
 
 logger = logging.getLogger(__name__)
 
+FORMAT_SECONDS = metrics.histogram(
+    "subextractor_postprocess_seconds", "Time postprocessing a subtitle file", ["format"]
+)
+FORMATTED_FILES = metrics.counter(
+    "subextractor_postprocessed_files_total",
+    "Subtitle files postprocessed, processed, skipped or failed",
+    ["format", "result"],
+)
+FORMATTED_BYTES = metrics.counter(
+    "subextractor_postprocessed_bytes_total", "Bytes of subtitle files postprocessed", ["format"]
+)
+
 
 class WorkflowRunner:
     """Executes subtitle processing workflows on SSA files."""
 
-    def __init__(self, workflows: list[dict], ssafile: pysubs2.SSAFile) -> None:
+    def __init__(
+        self,
+        workflows: list[dict] | WorkflowPlan,
+        ssafile: pysubs2.SSAFile,
+        profiler: WorkflowProfiler | None = None,
+    ) -> None:
         self.outputs: dict = {}
         self.ssafile = ssafile
-        self.workflow: list[dict[str, list[Task]]] = []
-
-        # Convert each workflow task to Task objects
-        for workflow_task in workflows:
-            converted_task = {}
+        self.table: EventTable | None = None
+        self.profiler = profiler
+
+        # plans are compiled once per formatter, raw workflows are compiled here
+        if isinstance(workflows, WorkflowPlan):
+            self.plan = workflows
+        else:
+            self.plan = compile_workflow(workflows)
+
+    def _sync_table(self, discard: bool):
+        if self.table is not None:
+            self.table.sync()
+
+            if discard:
+                self.table = None
+
+    def _execute(self, task: Task, *args):
+        if self.profiler is None:
+            return self._run_task(task, *args)
+
+        # selectors and misc actions work on the whole file
+        items = args[0] if args else self.ssafile.events
+        return self.profiler.measure(task, items, self._run_task, task, *args)
+
+    def _run_task(self, task: Task, *args):
+        """
+        Execute a task, keeping the columns of the events in an EventTable across
+        consecutive columnar actions. The table is written back to the events only
+        before tasks that may use them, before outputs are stored and at the end.
+        """
+        if task.columnar:
+            if self.table is None:
+                self.table = EventTable(self.ssafile.events)
+
+            result = task.run(self.ssafile, self.outputs, *args, table=self.table)
+        else:
+            if not task.preserves_columns:
+                self._sync_table(discard=True)
+
+            result = task.run(self.ssafile, self.outputs, *args)
+
+        if task.id and self.table is not None and self.table.dirty:
+            self._sync_table(discard=False)
+
+        task.store(self.outputs, result)
+        return result
+
+    def _run_selectors(self, selectors: tuple[Task, ...]) -> list | EventSelection:
+        """
+        Combine the results of the selectors. Event selections of the same events
+        are merged into one selection, selecting an event found by several
+        selectors once. Other results are concatenated in a list.
+        """
+        selections: list | EventSelection = []
 
-            # Process each section (selectors, filters, actions, misc)
-            for section_name, task_list in workflow_task.items():
-                if task_list is None:
-                    converted_task[section_name] = []
-                    continue
-
-                converted_tasks = []
-                for task_dict in task_list:
-                    task = Task.from_dict(task_dict, self.outputs, self.ssafile)
-                    converted_tasks.append(task)
-
-                converted_task[section_name] = converted_tasks
+        for task in selectors:
+            result = self._execute(task)
 
-            self.workflow.append(converted_task)
+            if isinstance(result, EventSelection):
+                if isinstance(selections, EventSelection):
+                    selections = selections.union(result)
+                elif not selections:
+                    selections = result
+                else:
+                    selections.extend(result)
+                continue
 
-    def _run_selectors(self, selectors: list[Task]) -> list:
-        selections = []
+            if isinstance(selections, EventSelection):
+                selections = list(selections)
 
-        for task in selectors:
-            result = task.execute()
             if isinstance(result, list):
                 selections.extend(result)
             else:
@@ -48,39 +121,33 @@ class WorkflowRunner:
 
         return selections
 
-    def _run_filters(self, filters: list[Task], items: list) -> list:
+    def _run_filters(self, filters: tuple[Task, ...], items: list) -> list:
         filtered = items
 
         for task in filters:
-            filtered = task.execute(filtered)
+            filtered = self._execute(task, filtered)
 
         return filtered
 
-    def _run_actions(self, actions: list[Task], items: list) -> None:
+    def _run_actions(self, actions: tuple[Task, ...], items: list) -> None:
         for action in actions:
-            action.execute(items)
+            self._execute(action, items)
 
-    def _run_misc(self, misc_actions: list[Task]) -> None:
+    def _run_misc(self, misc_actions: tuple[Task, ...]) -> None:
         for misc in misc_actions:
-            misc.execute()
+            self._execute(misc)
 
     def process(self) -> pysubs2.SSAFile:
         """Process the SSA file through all tasks."""
 
-        for task in self.workflow:
-            selections = []
-
-            if "selectors" in task:
-                selections = self._run_selectors(task["selectors"])
-
-            if "filters" in task:
-                selections = self._run_filters(task["filters"], selections)
+        for step in self.plan.steps:
+            selections = self._run_selectors(step.selectors)
+            selections = self._run_filters(step.filters, selections)
+            self._run_actions(step.actions, selections)
+            self._run_misc(step.misc)
 
-            if "actions" in task:
-                self._run_actions(task["actions"], selections)
-
-            if "misc" in task:
-                self._run_misc(task["misc"])
+        self._sync_table(discard=True)
+        ass_tags.clear_cache()
 
         return self.ssafile
 
@@ -88,9 +155,53 @@ class WorkflowRunner:
 class SubtitleFormatter:
     """Main formatter class that handles different subtitle formats."""
 
-    def __init__(self, workflow_path: str) -> None:
+    def __init__(
+        self,
+        workflow_path: str | None = None,
+        index_file: str | None = None,
+        profiler: WorkflowProfiler | None = None,
+    ) -> None:
         self.logger = logging.getLogger(self.__class__.__name__)
-        self.workflows = self._load_config(workflow_path)
+        self.workflows: dict[str, list[dict]] = {}
+        self.plans: dict[str, WorkflowPlan] = {}
+        self.streamable: set[str] = set()
+        self.digests: dict[str, str] = {}
+        self.profiler = profiler
+
+        self.index_file = index_file
+        self.index = ProcessedIndex(index_file) if index_file else None
+
+        if workflow_path:
+            self._set_workflows(self._load_config(workflow_path))
+
+    @classmethod
+    def from_workflows(
+        cls, workflows: dict[str, list[dict]], index_file: str | None = None
+    ) -> "SubtitleFormatter":
+        """Create a formatter from already loaded workflows."""
+        formatter = cls(index_file=index_file)
+        formatter._set_workflows(workflows)
+        return formatter
+
+    def _set_workflows(self, workflows: dict[str, list[dict]]):
+        """Compile the workflow of every format, invalid workflows fail here."""
+        plans = {}
+        for fmt, tasks in workflows.items():
+            try:
+                plans[fmt] = compile_workflow(tasks)
+            except ValueError as e:
+                raise RuntimeError(f"Invalid {fmt} workflow: {e}")
+
+        self.workflows = workflows
+        self.plans = plans
+        self.streamable = {
+            fmt for fmt, plan in plans.items() if fmt in STREAM_FORMATS and is_streamable(plan)
+        }
+        self.digests = {fmt: workflow_digest(tasks) for fmt, tasks in workflows.items()}
+
+        if self.profiler is not None:
+            for fmt, plan in plans.items():
+                self.profiler.add_plan(fmt, plan)
 
     def _load_config(self, path) -> dict[str, list[dict]]:
         """Load and parse the YAML configuration file."""
@@ -103,27 +214,78 @@ class SubtitleFormatter:
         except Exception as e:
             raise RuntimeError(f"Failed to load config from {path}: {e}")
 
+    def _process_file(self, path: Path, plan: WorkflowPlan) -> str:
+        """
+        Load and process a file with pysubs2, writing it only if its content
+        changed. Returns the hash of the processed content.
+        """
+        original = path.read_bytes()
+
+        # Load subtitle file
+        ssafile = pysubs2.load(str(path))
+
+        # Process with appropriate workflow
+        runner = WorkflowRunner(plan, ssafile, self.profiler)
+        processed_file = runner.process()
+
+        # serialized like SSAFile.save, in text mode
+        format_ = pysubs2.formats.get_format_identifier(path.suffix.lower())
+        text = processed_file.to_string(format_)
+        data = text.replace("\n", os.linesep).encode("utf-8")
+
+        if data != original:
+            path.write_bytes(data)
+            self.logger.info(f"Saved processed file: {path}")
+        else:
+            self.logger.info(f"Processed file unchanged, not written: {path}")
+
+        return hashlib.sha1(data).hexdigest()
+
     def format(self, filepath: str) -> list[str]:
         """Format a subtitle file based on its extension."""
         path = Path(filepath)
         extension = path.suffix[1:].lower()  # Remove dot and lowercase
 
-        if extension not in self.workflows:
+        if extension not in self.plans:
             raise RuntimeError(f"Unsupported format: {extension}")
 
         self.logger.debug(f"Processing {extension} file: {path}")
 
+        start = time.perf_counter()
+        result = "error"
+
         try:
-            # Load subtitle file
-            ssafile = pysubs2.load(str(path))
+            key = os.path.abspath(path)
+            workflow = self.digests[extension]
+
+            # the content was written by this workflow, processing it is a no-op
+            if self.index is not None and self.index.is_processed(
+                key, workflow, file_digest(str(path))
+            ):
+                self.logger.debug(f"Skipping already processed file: {path}")
+                result = "skipped"
+                return [filepath]
+
+            FORMATTED_BYTES.inc(os.path.getsize(path), format=extension)
+            if self.profiler is not None:
+                self.profiler.files += 1
+
+            # Event-only workflows on SRT/VTT run cue by cue without loading the file
+            plan = self.plans[extension]
+            if extension in self.streamable and stream_file(
+                str(path),
+                lambda subs: WorkflowRunner(plan, subs, self.profiler).process(),
+                extension,
+            ):
+                self.logger.info(f"Processed file: {path}")
+                digest = file_digest(str(path)) if self.index is not None else ""
+            else:
+                digest = self._process_file(path, plan)
 
-            # Process with appropriate workflow
-            runner = WorkflowRunner(self.workflows[extension], ssafile)
-            processed_file = runner.process()
-
-            processed_file.save(str(path))
-            self.logger.info(f"Saved processed file: {path}")
+            if self.index is not None:
+                self.index.record(key, workflow, digest)
 
+            result = "processed"
             return [filepath]
 
         except pysubs2.FormatAutodetectionError as e:
@@ -132,3 +294,7 @@ class SubtitleFormatter:
         except Exception as e:
             self.logger.error(f"Error processing {path}: {e}")
             raise
+
+        finally:
+            FORMAT_SECONDS.observe(time.perf_counter() - start, format=extension)
+            FORMATTED_FILES.inc(format=extension, result=result)
@@ -0,0 +1,176 @@
+"""
+Selections of events stored as boolean masks over the event list of a file.
+"""
+
+import copy
+from collections.abc import Sequence
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+from pysubs2 import SSAEvent
+
+
+class EventSelection(Sequence):
+    """
+    Events of a list selected by a boolean mask, in list order. Selections made
+    from items in another order, e.g. returned by a user selector, keep the order
+    of the items; filtering keeps it while set operations return list order.
+
+    Selections are immutable: filtering and set operations return new masks over
+    the same list without copying any event. A selection stays bound to the list
+    object it was made from, actions changing the events of a file (e.g. delete)
+    replace the list instead of modifying it, so existing selections remain
+    valid and can be aligned to the new list by identity.
+
+    A deep copy selects copies of the events, e.g. an output stored as of its
+    task, and keeps the list it was made from to align set operations with
+    selections of that list.
+    """
+
+    __slots__ = ("events", "mask", "origin", "_order", "_indices")
+
+    def __init__(
+        self,
+        events: list[SSAEvent],
+        mask: np.ndarray | None = None,
+        order: np.ndarray | None = None,
+    ):
+        if mask is None:
+            mask = np.zeros(len(events), dtype=bool)
+        elif len(mask) != len(events):
+            raise ValueError("Selection mask does not match the events")
+
+        mask = np.asarray(mask, dtype=bool)
+        mask.flags.writeable = False
+
+        if order is not None:
+            order = np.asarray(order, dtype=np.intp)
+            order.flags.writeable = False
+
+        self.events = events
+        self.mask = mask
+        # list the mask was made over, the events are copies of it after deepcopy
+        self.origin = events
+        # indices of the selected events when not in list order
+        self._order = order
+        self._indices: np.ndarray | None = order
+
+    @classmethod
+    def all(cls, events: list[SSAEvent]) -> "EventSelection":
+        return cls(events, np.ones(len(events), dtype=bool))
+
+    @classmethod
+    def from_items(cls, events: list[SSAEvent], items: Iterable) -> "EventSelection":
+        """
+        Select the events of the list found among the items. The selection is in
+        item order, duplicated items are selected once.
+
+        Items are matched by identity. Events that are not in the list, e.g.
+        copies returned by a user action, are matched to the first equal event
+        not selected yet, as list.remove() does. pysubs2 compares events by their
+        start and end times.
+        """
+        if isinstance(items, EventSelection) and items.events is events:
+            return items
+
+        positions = {id(e): i for i, e in enumerate(events)}
+        rows: dict[int, None] = {}
+
+        for item in items:
+            row = positions.get(id(item))
+
+            if row is None and isinstance(item, SSAEvent):
+                row = next(
+                    (i for i, e in enumerate(events) if i not in rows and e == item),
+                    None,
+                )
+
+            if row is not None:
+                rows[row] = None
+
+        indices = np.fromiter(rows, dtype=np.intp, count=len(rows))
+
+        mask = np.zeros(len(events), dtype=bool)
+        mask[indices] = True
+
+        if np.all(indices[1:] > indices[:-1]):
+            return cls(events, mask)
+
+        return cls(events, mask, indices)
+
+    @property
+    def indices(self) -> np.ndarray:
+        """Indices of the selected events in the list, in selection order."""
+        if self._indices is None:
+            self._indices = np.flatnonzero(self.mask)
+
+        return self._indices
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __iter__(self) -> Iterator[SSAEvent]:
+        events = self.events
+        return (events[i] for i in self.indices.tolist())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.events[i] for i in self.indices[index].tolist()]
+
+        return self.events[int(self.indices[index])]
+
+    def __contains__(self, item) -> bool:
+        return any(item is event for event in self)
+
+    def __repr__(self) -> str:
+        return f"EventSelection({len(self)} of {len(self.events)} events)"
+
+    def __deepcopy__(self, memo: dict) -> "EventSelection":
+        events = copy.deepcopy(self.events, memo)
+        copied = EventSelection(events, self.mask.copy(), self._order)
+        copied.origin = self.origin
+        memo[id(self)] = copied
+        return copied
+
+    def _derive(
+        self, mask: np.ndarray, order: np.ndarray | None = None
+    ) -> "EventSelection":
+        selection = EventSelection(self.events, mask, order)
+        selection.origin = self.origin
+        return selection
+
+    def _align(self, other: Iterable) -> np.ndarray:
+        if isinstance(other, EventSelection):
+            # selections made over the same list match by position, copies included
+            if other.origin is self.origin:
+                return other.mask
+
+            # otherwise by the identity of the events it was made over
+            other = [other.origin[i] for i in other.indices.tolist()]
+
+        return EventSelection.from_items(self.events, other).mask
+
+    def filter(self, predicate: Callable[[SSAEvent], bool]) -> "EventSelection":
+        """Keep the selected events for which the predicate is true."""
+        indices = self.indices
+        keep = np.fromiter(
+            (bool(predicate(self.events[i])) for i in indices.tolist()),
+            dtype=bool,
+            count=len(indices),
+        )
+
+        mask = np.zeros(len(self.events), dtype=bool)
+        mask[indices[keep]] = True
+
+        order = None if self._order is None else indices[keep]
+        return self._derive(mask, order)
+
+    def union(self, other: Iterable) -> "EventSelection":
+        return self._derive(self.mask | self._align(other))
+
+    def intersection(self, other: Iterable) -> "EventSelection":
+        return self._derive(self.mask & self._align(other))
+
+    def invert(self) -> "EventSelection":
+        """Select the events of the list not in this selection."""
+        return self._derive(~self.mask)
@@ -0,0 +1,123 @@
+"""
+Partial snapshots of task outputs referenced by workflow templates.
+
+A task with an id stores its result in the outputs for later templates, as it
+is at the time the task runs. Deep-copying the whole result is expensive when it
+holds every event of a large file while templates only read a few fields, so the
+templates of a workflow are analysed and only the referenced values are copied.
+"""
+
+import ast
+import copy
+from types import SimpleNamespace
+from typing import Any, Iterable
+
+# one step of an access chain: ("item", key) for x[key], ("attr", name) for x.name
+Step = tuple[str, Any]
+Path = tuple[Step, ...]
+
+# names giving templates access to the outputs without a visible subscript
+UNSAFE_NAMES = {"globals", "locals", "vars", "eval", "exec"}
+
+
+def _access_path(name: ast.Name, parents: dict[ast.AST, ast.AST]) -> Path:
+    """Follow the constant subscripts and attributes applied to a name."""
+    path: list[Step] = []
+    node: ast.AST = name
+
+    while True:
+        parent = parents.get(node)
+
+        if (
+            isinstance(parent, ast.Subscript)
+            and parent.value is node
+            and isinstance(parent.slice, ast.Constant)
+        ):
+            path.append(("item", parent.slice.value))
+        elif isinstance(parent, ast.Attribute) and parent.value is node:
+            path.append(("attr", parent.attr))
+        else:
+            break
+
+        node = parent
+
+    # a called method must be bound to the snapshot, not to the live object
+    parent = parents.get(node)
+    if path and path[-1][0] == "attr" and isinstance(parent, ast.Call):
+        if parent.func is node:
+            path.pop()
+
+    return tuple(path)
+
+
+def analyze_references(expressions: Iterable[str]) -> dict[str, set[Path]] | None:
+    """
+    Find the output values read by template expressions.
+
+    Args:
+        expressions: Python expressions of the templates
+
+    Returns:
+        Paths read below each output id, an empty path meaning the whole
+        output. None if the outputs are used in a way that cannot be analysed.
+    """
+    references: dict[str, set[Path]] = {}
+
+    for expression in expressions:
+        tree = ast.parse(expression, mode="eval")
+        parents = {
+            child: node for node in ast.walk(tree) for child in ast.iter_child_nodes(node)
+        }
+
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.Name):
+                continue
+
+            if node.id in UNSAFE_NAMES:
+                return None
+
+            if node.id != "outputs":
+                continue
+
+            path = _access_path(node, parents)
+            if not path or path[0][0] != "item" or not isinstance(path[0][1], str):
+                return None
+
+            references.setdefault(path[0][1], set()).add(path[1:])
+
+    return references
+
+
+def _build(value: Any, paths: list[Path]) -> Any:
+    if any(len(path) == 0 for path in paths):
+        return copy.deepcopy(value)
+
+    children: dict[Step, list[Path]] = {}
+    for path in paths:
+        children.setdefault(path[0], []).append(path[1:])
+
+    kinds = {kind for kind, _ in children}
+    if len(kinds) > 1:
+        return copy.deepcopy(value)  # accessed both as a mapping and an object
+
+    snapshot = {}
+    for (kind, key), subpaths in children.items():
+        try:
+            child = value[key] if kind == "item" else getattr(value, key)
+        except Exception:
+            continue  # the lookup fails again when the template is evaluated
+
+        snapshot[key] = _build(child, subpaths)
+
+    return snapshot if kinds == {"item"} else SimpleNamespace(**snapshot)
+
+
+def take_snapshot(value: Any, paths: Iterable[Path]) -> Any:
+    """
+    Copy the values reached by the given access paths.
+
+    The snapshot is a tree of dicts (for subscripts) and namespaces (for
+    attributes) holding deep copies of the referenced values, so evaluating the
+    analysed templates on it gives the same result as on a full deep copy.
+    """
+    return _build(value, list(paths))
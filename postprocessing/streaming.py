@@ -0,0 +1,266 @@
+"""
+Streaming postprocessing of SRT and VTT files.
+
+Workflows that only select all events, filter them and change or delete them
+one at a time give the same result on any part of a file as on the whole file.
+Such workflows are run on chunks of cues read one after the other and written to
+the output as they are processed, so memory does not grow with the file size.
+Other workflows, and files that cannot be streamed, are loaded with pysubs2.
+"""
+
+import filecmp
+import itertools
+import logging
+import os
+import re
+import tempfile
+from typing import Callable, Iterator, TextIO
+
+from pysubs2 import SSAEvent, SSAFile, SSAStyle
+from pysubs2.formats import autodetect_format, get_format_class
+from pysubs2.formats.substation import parse_tags
+
+from . import actions
+from .fusion import RegexFilter, RegexSubstitution
+from .plan import WorkflowPlan
+from .task import Task
+
+logger = logging.getLogger(__name__)
+
+STREAM_FORMATS = ("srt", "vtt")
+
+# cues processed at once, bounds the memory used
+STREAM_CHUNK_SIZE = 1024
+
+# bytes read to detect the format of a file
+DETECT_SIZE = 65536
+
+# built-in tasks working on each event independently
+STREAMABLE_SELECTORS = {"events_select_all"}
+STREAMABLE_FILTERS = {
+    "events_filter_regex",
+    "events_filter_properties",
+    "events_filter_invert",
+}
+STREAMABLE_ACTIONS = {
+    "events_action_regex_substitution",
+    "events_action_delete",
+    "events_action_update_properties",
+}
+
+
+class NotStreamable(Exception):
+    """The file must be processed as a whole."""
+
+
+def _is_streamable_task(task: Task, names: set[str]) -> bool:
+    if task.id or task.templates:
+        return False
+
+    if isinstance(task.func, (RegexFilter, RegexSubstitution)):
+        return task.func_name in names
+
+    return task.func_name in names and task.func is getattr(actions, task.func_name)
+
+
+def is_streamable(plan: WorkflowPlan) -> bool:
+    """Whether every task of the plan selects all events or works on each event alone."""
+    for step in plan.steps:
+        if step.misc:
+            return False
+
+        if not step.selectors:
+            if step.filters or step.actions:
+                return False
+            continue
+
+        sections = (
+            (step.selectors, STREAMABLE_SELECTORS),
+            (step.filters, STREAMABLE_FILTERS),
+            (step.actions, STREAMABLE_ACTIONS),
+        )
+        for tasks, names in sections:
+            if not all(_is_streamable_task(task, names) for task in tasks):
+                return False
+
+    return True
+
+
+# conversions of SubripFormat.from_file with the default options
+EMPTY_CUE_LINE = re.compile(r"\s*$")
+NUMBER_LINE = re.compile(r"\s*\d+\s*$")
+NEXT_NUMBER = re.compile(r"\n+ *\d+ *$")
+HTML_TAGS = [
+    (re.compile(r"< *i *>"), r"{\\i1}"),
+    (re.compile(r"< */ *i *>"), r"{\\i0}"),
+    (re.compile(r"< *s *>"), r"{\\s1}"),
+    (re.compile(r"< */ *s *>"), r"{\\s0}"),
+    (re.compile(r"< *u *>"), r"{\\u1}"),
+    (re.compile(r"< */ *u *>"), r"{\\u0}"),
+    (re.compile(r"< *b *>"), r"{\\b1}"),
+    (re.compile(r"< */ *b *>"), r"{\\b0}"),
+    (re.compile(r"< */? *[a-zA-Z][^>]*>"), ""),
+]
+
+
+def _cue_text(lines: list[str]) -> str:
+    # a timestamp followed by blank lines and the number of the next cue
+    if (
+        len(lines) >= 2
+        and all(EMPTY_CUE_LINE.match(line) for line in lines[:-1])
+        and NUMBER_LINE.match(lines[-1])
+    ):
+        return ""
+
+    text = NEXT_NUMBER.sub("", "".join(lines).strip())
+    if "<" in text:
+        for pattern, replace in HTML_TAGS:
+            text = pattern.sub(replace, text)
+
+    return text.replace("\n", "\\N")
+
+
+def _make_cue(impl, stamps: list, lines: list[str]) -> SSAEvent:
+    start, end = map(impl.timestamp_to_ms, stamps)
+    return SSAEvent(start=start, end=end, text=_cue_text(lines))
+
+
+def read_cues(fp: TextIO, format_: str) -> Iterator[SSAEvent]:
+    """
+    Parse the cues of a SRT or VTT file one at a time, like pysubs2 loads them.
+    Lines following a timestamp line belong to its cue.
+    """
+    impl = get_format_class(format_)
+    stamps, lines = None, []
+
+    for line in fp:
+        found = impl.TIMESTAMP.findall(line)
+
+        if len(found) == 2:
+            if stamps is not None:
+                yield _make_cue(impl, stamps, lines)
+            stamps, lines = found, []
+        elif stamps is not None:
+            lines.append(line)
+
+    if stamps is not None:
+        yield _make_cue(impl, stamps, lines)
+
+
+class _CueWriter:
+    """Writes events like pysubs2 saves a file, numbering cues across chunks."""
+
+    def __init__(self, fp: TextIO, format_: str):
+        self.fp = fp
+        self.format_ = format_
+        self.impl = get_format_class(format_)
+        self.styles = SSAFile().styles
+        self.lineno = 0
+        self.last_start = 0
+
+        if format_ == "vtt":
+            print("WEBVTT\n", file=fp)
+
+    def _prepare_text(self, event: SSAEvent) -> str:
+        # same as SubripFormat.to_file with the default options
+        text = event.text.replace(r"\h", " ")
+        text = text.replace(r"\n", "\n")
+        text = text.replace(r"\N", "\n")
+
+        style = self.styles.get(event.style, SSAStyle.DEFAULT_STYLE)
+        body = []
+        for fragment, sty in parse_tags(text, style, self.styles):
+            if sty.italic:
+                fragment = f"<i>{fragment}</i>"
+            if sty.underline:
+                fragment = f"<u>{fragment}</u>"
+            if sty.strikeout:
+                fragment = f"<s>{fragment}</s>"
+            body.append(fragment)
+
+        return re.sub("\n+", "\n", "".join(body).strip())
+
+    def write(self, subs: SSAFile):
+        for event in subs.get_text_events():
+            # pysubs2 sorts VTT cues, which requires the whole file
+            if self.format_ == "vtt" and event.start < self.last_start:
+                raise NotStreamable("VTT cues are not in order")
+
+            self.last_start = event.start
+            self.lineno += 1
+
+            start = self.impl.ms_to_timestamp(event.start)
+            end = self.impl.ms_to_timestamp(event.end)
+
+            print(self.lineno, file=self.fp)
+            print(start, "-->", end, file=self.fp)
+            print(self._prepare_text(event), end="\n\n", file=self.fp)
+
+
+def detect_format(path: str) -> str | None:
+    """Detect the format of a file from its beginning, None if unknown."""
+    with open(path, encoding="utf-8") as fp:
+        head = fp.read(DETECT_SIZE)
+
+    if "[Script Info]" in head or "[V4+ Styles]" in head:
+        return None
+
+    try:
+        return autodetect_format(head)
+    except Exception:
+        return None
+
+
+def stream_file(
+    path: str,
+    process: Callable[[SSAFile], SSAFile],
+    format_: str,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> bool:
+    """
+    Process a subtitle file chunk by chunk, replacing it once fully written if
+    the output differs.
+
+    Args:
+        path: Path of the subtitle file
+        process: Runs a streamable workflow on a chunk of the file
+        format_: Format of the file, either srt or vtt
+        chunk_size: Number of cues processed at once
+
+    Returns:
+        False if the file cannot be streamed and was left untouched
+    """
+    if format_ not in STREAM_FORMATS or detect_format(path) != format_:
+        return False
+
+    fd, temp_path = tempfile.mkstemp(
+        prefix=".", suffix=".tmp", dir=os.path.dirname(os.path.abspath(path))
+    )
+
+    try:
+        with open(path, encoding="utf-8") as src, open(
+            fd, "w", encoding="utf-8"
+        ) as dst:
+            writer = _CueWriter(dst, format_)
+
+            cues = read_cues(src, format_)
+            while chunk := list(itertools.islice(cues, chunk_size)):
+                subs = SSAFile()
+                subs.format = format_
+                subs.events = chunk
+                writer.write(process(subs))
+
+        # the file is left untouched when the workflow changed nothing
+        if not filecmp.cmp(temp_path, path, shallow=False):
+            os.replace(temp_path, path)
+
+        return True
+
+    except NotStreamable as e:
+        logger.debug(f"Falling back to loading {path}: {e}")
+        return False
+
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
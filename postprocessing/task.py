@@ -1,73 +1,131 @@
 import copy
 import logging
 import re
+from dataclasses import dataclass
+from types import CodeType, MappingProxyType
+from typing import Any, Callable, Mapping
 
 import pysubs2
 
 from . import actions as WORKFLOW_ACTIONS
+from .snapshot import Path, take_snapshot
 
 logger = logging.getLogger(__name__)
 
+TEMPLATE_PATTERN = re.compile(r"{{(.+)}}")
 
-class Task:
 
-    def __init__(
-        self,
-        func: str,
-        id: str | None,
-        params: dict,
-        outputs: dict,
-        ssafile: pysubs2.SSAFile,
-    ) -> None:
-        self.func_name: str = func
-        self.id: str | None = id
-        self.params: dict = params or {}
-        self.outputs = outputs
-        self.ssafile = ssafile
+@dataclass(frozen=True)
+class Task:
+    """
+    A compiled workflow task.
+
+    The action is resolved and template parameters are compiled once when the
+    task is created, executing it only evaluates the templates against the
+    outputs of the current run. Tasks hold no per-file state and are shared by
+    every file processed with the same workflow.
+    """
+
+    func_name: str
+    func: Callable
+    id: str | None
+    params: Mapping[str, Any]
+    # parameter name -> (template string, compiled expression)
+    templates: Mapping[str, tuple[str, CodeType]]
+    # values of the result read by templates, None to store a full deep copy
+    snapshot: frozenset[Path] | None = None
+
+    @property
+    def columnar(self) -> bool:
+        """The action operates on an EventTable passed as 'table'."""
+        return getattr(self.func, "columnar", False)
+
+    @property
+    def preserves_columns(self) -> bool:
+        """The task leaves the columnar fields and the event list untouched."""
+        return getattr(self.func, "preserves_columns", False)
 
     @classmethod
-    def from_dict(
-        cls, task_dict: dict, outputs: dict, ssafile: pysubs2.SSAFile
-    ) -> "Task":
+    def from_dict(cls, task_dict: dict) -> "Task":
+        """
+        Compile a task from its workflow definition.
+
+        Raises:
+            ValueError: If the task is invalid
+        """
+        if not isinstance(task_dict, dict) or "uses" not in task_dict:
+            raise ValueError(f"Task is missing 'uses': {task_dict}")
+
         uses = task_dict["uses"]
         id = task_dict.get("id")
-        params = task_dict.get("with", {})
+        params = task_dict.get("with") or {}
 
-        return cls(uses, id, params, outputs, ssafile)
+        if not isinstance(params, dict):
+            raise ValueError(f"Parameters of {uses} must be a mapping")
 
-    def get_kwargs(self) -> dict:
-        resolved_kwargs = {}
+        try:
+            func = getattr(WORKFLOW_ACTIONS, uses)
+        except AttributeError:
+            raise ValueError(f"Unknown action: {uses}")
 
-        for key, value in self.params.items():
+        templates = {}
+        for key, value in params.items():
             if not isinstance(value, str):
-                resolved_kwargs[key] = value
                 continue
 
-            match = re.match(r"{{(.+)}}", value)
+            match = TEMPLATE_PATTERN.match(value)
             if match:
                 try:
-                    resolved_kwargs[key] = eval(
-                        match.group(1), {"outputs": self.outputs}
-                    )
+                    code = compile(match.group(1), f"<{uses}.{key}>", "eval")
+                except SyntaxError as e:
+                    raise ValueError(f"Invalid template '{value}' in {uses}: {e}")
+
+                templates[key] = (value, code)
+
+        return cls(
+            uses, func, id, MappingProxyType(dict(params)), MappingProxyType(templates)
+        )
+
+    @property
+    def expressions(self) -> list[str]:
+        """Python expressions of the template parameters."""
+        return [
+            TEMPLATE_PATTERN.match(value).group(1)  # type: ignore[union-attr]
+            for value, _ in self.templates.values()
+        ]
+
+    def get_kwargs(self, outputs: dict) -> dict:
+        resolved_kwargs = dict(self.params)
+
+        if self.templates:
+            scope = {"outputs": outputs}
+
+            for key, (value, code) in self.templates.items():
+                try:
+                    resolved_kwargs[key] = eval(code, scope)
                 except Exception as e:
                     logger.warning(
                         f"Failed to resolve template variable '{value}': {e}"
                     )
                     resolved_kwargs[key] = value  # Use original value as fallback
-            else:
-                resolved_kwargs[key] = value
 
         return resolved_kwargs
 
-    def execute(self, *args):
-        try:
-            func = getattr(WORKFLOW_ACTIONS, self.func_name)
-        except AttributeError:
-            raise ValueError(f"Unknown action: {self.func_name}")
-
-        result = func(self.ssafile, *args, **self.get_kwargs())
+    def run(self, ssafile: pysubs2.SSAFile, outputs: dict, *args, **extra):
+        """Run the action without storing its result in the outputs."""
+        return self.func(ssafile, *args, **self.get_kwargs(outputs), **extra)
 
+    def store(self, outputs: dict, result):
+        """Store the result of the action in the outputs if the task has an id."""
         if self.id:
-            self.outputs[self.id] = copy.deepcopy(result)
+            # keep the value as of this task, copying only what templates read
+            if self.snapshot is None:
+                outputs[self.id] = copy.deepcopy(result)
+            elif self.snapshot:
+                outputs[self.id] = take_snapshot(result, self.snapshot)
+
+    def execute(self, ssafile: pysubs2.SSAFile, outputs: dict, *args):
+        result = self.run(ssafile, outputs, *args)
+        self.store(outputs, result)
 
         return result
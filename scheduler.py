@@ -0,0 +1,117 @@
+"""
+Debounced scheduling of file system events.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+FileState = tuple[int, int]
+
+
+def get_file_state(path: str) -> FileState | None:
+    """Return the (size, mtime_ns) of a file, None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    return (st.st_size, st.st_mtime_ns)
+
+
+class FileEventScheduler:
+    """
+    Coalesces file events and releases paths once their files are stable.
+
+    Repeated events for a path are merged into one pending entry. A path is only
+    handed out after its size and mtime were unchanged for stability_window
+    seconds, so files that are still being copied are not processed. Paths whose
+    files disappear while pending are dropped.
+    """
+
+    def __init__(
+        self,
+        stability_window: float = 5,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.stability_window = stability_window
+        self.clock = clock
+
+        # path -> (due time, file state seen at the last check)
+        self._pending: dict[str, tuple[float, FileState | None]] = {}
+        self._cond = threading.Condition()
+
+    def notify(self, path: str, settled: bool = False):
+        """
+        Schedule a path for processing.
+
+        Args:
+            path: Path of the changed file
+            settled: The writer is known to be done (e.g. the file was closed),
+                the path is released as soon as its file state is confirmed
+        """
+        with self._cond:
+            if path in self._pending:
+                logger.debug(f"Coalescing event for pending path: {path}")
+
+            state = get_file_state(path)
+            delay = 0 if settled else self.stability_window
+            self._pending[path] = (self.clock() + delay, state)
+            self._cond.notify()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def get(self, timeout: float | None = None) -> str | None:
+        """
+        Wait for the next stable path.
+
+        Args:
+            timeout: Maximum number of seconds to wait, None to wait forever
+
+        Returns:
+            The path, or None if the timeout expired
+        """
+        end = None if timeout is None else self.clock() + timeout
+
+        with self._cond:
+            while True:
+                now = self.clock()
+
+                path = self._pop_stable(now)
+                if path is not None:
+                    return path
+
+                wait = None
+                if self._pending:
+                    wait = min(due for due, _ in self._pending.values()) - now
+                if end is not None:
+                    if now >= end:
+                        return None
+                    wait = end - now if wait is None else min(wait, end - now)
+
+                self._cond.wait(wait)
+
+    def _pop_stable(self, now: float) -> str | None:
+        for path, (due, state) in list(self._pending.items()):
+            if due > now:
+                continue
+
+            current = get_file_state(path)
+
+            if current is None:
+                logger.debug(f"Dropping pending path, file no longer exists: {path}")
+                del self._pending[path]
+            elif current != state:
+                logger.debug(f"File is still changing, waiting: {path}")
+                self._pending[path] = (now + self.stability_window, current)
+            else:
+                del self._pending[path]
+                return path
+
+        return None
@@ -0,0 +1,197 @@
+"""
+Persistent index of processed files for incremental library scans.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class StateIndex:
+    """
+    SQLite backed record of the files a module has processed.
+
+    For every processed file the size, mtime and the signature of the
+    configuration it was processed with are stored. Scans only yield files that
+    are new, were modified or were processed under another configuration.
+
+    The listing of every scanned directory is cached with the directory's mtime.
+    Adding, removing or renaming entries changes the mtime of their directory, so
+    directories with an unchanged mtime are not listed again and their files are
+    not stat'd; only their subdirectories are checked. Files rewritten in place,
+    without a rename, are therefore only picked up by watch mode.
+
+    Several modules can share the same file, each one under its own scope.
+    """
+
+    def __init__(self, path: str, scope: str, signature: str):
+        self.path = path
+        self.scope = scope
+        self.signature = signature
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                scope TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                signature TEXT NOT NULL,
+                PRIMARY KEY (scope, path)
+            );
+            CREATE TABLE IF NOT EXISTS dirs (
+                scope TEXT NOT NULL,
+                path TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                subdirs TEXT NOT NULL,
+                files TEXT NOT NULL,
+                PRIMARY KEY (scope, path)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def _get_file(self, path: str) -> tuple[int, int, str] | None:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT size, mtime_ns, signature FROM files WHERE scope = ? AND path = ?",
+                (self.scope, path),
+            ).fetchone()
+
+    def _get_dir(self, path: str) -> tuple[int, list[str], list[str]] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime_ns, subdirs, files FROM dirs WHERE scope = ? AND path = ?",
+                (self.scope, path),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return row[0], json.loads(row[1]), json.loads(row[2])
+
+    def _put_dir(self, path: str, mtime_ns: int, subdirs: list[str], files: list[str]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?)",
+                (self.scope, path, mtime_ns, json.dumps(subdirs), json.dumps(files)),
+            )
+
+    def is_current(self, path: str, stat: os.stat_result | None = None) -> bool:
+        """Check if a file was processed in its current state and configuration."""
+        row = self._get_file(path)
+        if row is None or row[2] != self.signature:
+            return False
+
+        if stat is None:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return False
+
+        return row[0] == stat.st_size and row[1] == stat.st_mtime_ns
+
+    def record(self, paths: Iterable[str]):
+        """Record files as processed in their current state and configuration."""
+        rows = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+
+            rows.append((self.scope, path, st.st_size, st.st_mtime_ns, self.signature))
+
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def scan(self, path: str, extensions: Iterable[str]) -> Iterator[str]:
+        """
+        Yield the files below a directory that need to be processed.
+
+        Args:
+            path: Directory to scan
+            extensions: File extensions to match, without dot and case-insensitive
+
+        Yields:
+            Paths of new, modified or outdated files
+        """
+        suffixes = {"." + ext.lower().lstrip(".") for ext in extensions}
+        stack = [path]
+        listed = skipped = 0
+
+        try:
+            while stack:
+                directory = stack.pop()
+
+                try:
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                except OSError:
+                    continue
+
+                cached = self._get_dir(directory)
+
+                if cached is not None and cached[0] == mtime_ns:
+                    skipped += 1
+                    subdirs, files = cached[1], cached[2]
+
+                    # entries are unchanged, only the configuration may differ
+                    for name in files:
+                        f = os.path.join(directory, name)
+                        row = self._get_file(f)
+                        if row is None or row[2] != self.signature:
+                            yield f
+
+                    stack.extend(os.path.join(directory, d) for d in reversed(subdirs))
+                    continue
+
+                listed += 1
+                subdirs, files = [], []
+                stats = {}
+
+                try:
+                    with os.scandir(directory) as it:
+                        for entry in it:
+                            try:
+                                if entry.is_dir():
+                                    if not entry.is_symlink():
+                                        subdirs.append(entry.name)
+                                elif os.path.splitext(entry.name)[1].lower() in suffixes:
+                                    files.append(entry.name)
+                                    stats[entry.name] = entry.stat()
+                            except OSError:
+                                continue
+                except OSError as e:
+                    logger.debug(f"Skipping unreadable directory {directory}: {e}")
+                    continue
+
+                subdirs.sort()
+                files.sort()
+                self._put_dir(directory, mtime_ns, subdirs, files)
+
+                for name in files:
+                    f = os.path.join(directory, name)
+                    if not self.is_current(f, stats[name]):
+                        yield f
+
+                stack.extend(os.path.join(directory, d) for d in reversed(subdirs))
+        finally:
+            with self._lock:
+                self._conn.commit()
+
+            logger.info(
+                f"Scanned {path}: listed {listed} changed directories, "
+                f"skipped {skipped} unchanged"
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,99 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import pysubs2
+from babelfish import Language
+from pgsrip import Options
+from pgsrip.media import Pgs
+from pgsrip.media_path import MediaPath
+
+from benchmarks.corpus import generate_pgs, generate_subtitles, generate_tree
+from benchmarks.suite import Suite, compare, run_suite
+
+
+class TestBenchmarkCorpus(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+
+    def test_subtitles(self):
+        path = generate_subtitles(os.path.join(self.temp_dir, "a.ass"), 500, seed=1)
+        subs = pysubs2.load(path)
+
+        self.assertEqual(len(subs.events), 500)
+        self.assertTrue(any(e.is_drawing for e in subs.events))
+        self.assertTrue(any(e.is_comment for e in subs.events))
+        self.assertTrue(any("\\pos(" in e.text for e in subs.events))
+
+        # reproducible
+        again = generate_subtitles(os.path.join(self.temp_dir, "b.ass"), 500, seed=1)
+        with open(path) as a, open(again) as b:
+            self.assertEqual(a.read(), b.read())
+
+    def test_pgs(self):
+        path = generate_pgs(os.path.join(self.temp_dir, "a.sup"), 3)
+        with open(path, "rb") as f:
+            data = f.read()
+
+        language = Language("eng")
+        media_path = MediaPath("stream.sup")
+        media_path.language = language
+        pgs = Pgs(media_path, Options(languages={language}), lambda: data, "")
+
+        self.assertEqual(len(pgs.items), 3)
+        self.assertEqual(pgs.items[0].image.data.shape[0], 40)
+
+    def test_tree(self):
+        generate_tree(self.temp_dir, dirs=12, files_per_dir=5, depth=3)
+        count = sum(len(files) for _, _, files in os.walk(self.temp_dir))
+        self.assertEqual(count, 60)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+
+    def test_run_and_compare(self):
+        suite = Suite(
+            self.temp_dir,
+            repeat=2,
+            events=(50,),
+            streams=(1,),
+            files=(20,),
+            only="[wg]*",
+        )
+        report = run_suite(suite)
+        json.dumps(report)
+
+        results = report["results"]
+        self.assertEqual(
+            sorted(results),
+            [
+                "get_filelist.extractor.20",
+                "get_filelist.postprocessor.20",
+                "workflow_runner.ass.50",
+                "workflow_runner.srt.50",
+            ],
+        )
+        self.assertEqual(len(results["workflow_runner.ass.50"]["runs"]), 2)
+
+        baseline = json.loads(json.dumps(report))
+        baseline["results"]["workflow_runner.ass.50"]["median"] /= 2
+        del baseline["results"]["get_filelist.extractor.20"]
+
+        comparison = {entry["name"]: entry for entry in compare(report, baseline, 0.5)}
+        self.assertEqual(len(comparison), 3)
+        self.assertTrue(comparison["workflow_runner.ass.50"]["regression"])
+        self.assertFalse(comparison["workflow_runner.srt.50"]["regression"])
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import exclusion
+from exclusion import ExclusionStore
+
+
+def append_entries(path: str, n: int):
+    store = ExclusionStore(path, batch_size=7)
+    store.add(f"/media/{n}/{i}.mkv" for i in range(200))
+    store.flush()
+
+
+class TestExclusionStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "extracted.txt")
+
+    def read_lines(self) -> list[str]:
+        with open(self.path) as f:
+            return f.read().splitlines()
+
+    def test_import_existing_filelist(self):
+        with open(self.path, "w") as f:
+            f.write("/media/a.mkv\n/media/b.mkv\n")
+
+        store = ExclusionStore(self.path)
+        self.assertIn("/media/a.mkv", store)
+        self.assertEqual(len(store), 2)
+
+    def test_batched_append(self):
+        store = ExclusionStore(self.path, batch_size=3)
+
+        store.add(["/media/a.mkv", "/media/b.mkv"])
+        self.assertIn("/media/a.mkv", store)
+        self.assertFalse(os.path.exists(self.path) and self.read_lines())
+
+        store.add(["/media/a.mkv", "/media/c.mkv"])
+        self.assertEqual(self.read_lines(), ["/media/a.mkv", "/media/b.mkv", "/media/c.mkv"])
+
+    def test_incremental_refresh(self):
+        store = ExclusionStore(self.path)
+        other = ExclusionStore(self.path)
+
+        other.add(["/media/a.mkv"])
+        other.flush()
+
+        # a partially written line is not picked up
+        with open(self.path, "a") as f:
+            f.write("/media/b.m")
+
+        store.refresh()
+        self.assertEqual(set(store), {"/media/a.mkv"})
+
+        with open(self.path, "a") as f:
+            f.write("kv\n")
+
+        store.refresh()
+        self.assertEqual(set(store), {"/media/a.mkv", "/media/b.mkv"})
+
+    def test_concurrent_processes(self):
+        ctx = multiprocessing.get_context("spawn")
+        processes = [ctx.Process(target=append_entries, args=(self.path, n)) for n in range(4)]
+
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+
+        lines = self.read_lines()
+        self.assertEqual(len(lines), 4 * 200)
+        self.assertEqual(set(lines), {f"/media/{n}/{i}.mkv" for n in range(4) for i in range(200)})
+
+    def test_compaction(self):
+        with open(self.path, "w") as f:
+            f.write("/media/a.mkv\n" * 2000 + "/media/b.mkv\n")
+
+        with mock.patch.object(exclusion, "COMPACT_MIN_LINES", 10000):
+            old = ExclusionStore(self.path)
+        self.assertEqual(len(self.read_lines()), 2001)
+
+        store = ExclusionStore(self.path)
+
+        self.assertEqual(self.read_lines(), ["/media/a.mkv", "/media/b.mkv"])
+        self.assertEqual(len(store), 2)
+
+        # stores opened before the compaction reload the replaced file
+        old.add(["/media/c.mkv"])
+        old.flush()
+        store.refresh()
+        self.assertEqual(set(store), {"/media/a.mkv", "/media/b.mkv", "/media/c.mkv"})
+        self.assertEqual(len(self.read_lines()), 3)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,13 @@
 import logging
 import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
 import extract
 import extract.config
@@ -47,3 +54,319 @@ class TestSubtitleExtractor(unittest.TestCase):
     def tearDown(self) -> None:
         for f in self.output_files:
             os.remove(f)
+
+
+class TestMediaProberCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.temp_dir, "probe.db")
+        self.video = os.path.join(self.temp_dir, "video.mkv")
+
+        with open(self.video, "wb") as f:
+            f.write(b"video")
+
+    def _prober(self, streams: list) -> extract.prober.MediaProber:
+        prober = extract.prober.MediaProber(cache_file=self.cache_file)
+        prober._probe_file = mock.Mock(return_value=streams)
+        return prober
+
+    def test_persistent_cache(self):
+        data = [{"index": 2, "codec_name": "subrip", "tags": {"language": "und"}}]
+
+        prober = self._prober(data)
+        streams = prober.get_subtitle_streams(self.video, "eng")
+        self.assertEqual(streams[0].language, "eng")
+
+        # a new prober is served from disk, without running ffprobe
+        prober = self._prober([])
+        streams = prober.get_subtitle_streams(self.video, "jpn")
+        prober._probe_file.assert_not_called()
+        self.assertEqual(streams[0].index, 2)
+        self.assertEqual(streams[0].language, "jpn")
+        self.assertEqual(prober.stats()["persistent"]["hits"], 1)
+
+    def test_invalidation(self):
+        prober = self._prober([])
+        self.assertEqual(prober.get_subtitle_streams(self.video, "eng"), [])
+        self.assertEqual(prober.get_subtitle_streams(self.video, "eng"), [])
+        self.assertEqual(prober._probe_file.call_count, 1)
+
+        # replacing the file must not return the stale entry
+        with open(self.video, "wb") as f:
+            f.write(b"replaced video")
+
+        prober = self._prober([{"index": 0, "codec_name": "ass"}])
+        self.assertEqual(len(prober.get_subtitle_streams(self.video, "eng")), 1)
+        prober._probe_file.assert_called_once()
+
+    def test_probe_modes(self):
+        native = [{"index": 2, "codec_name": "subrip"}]
+        self._prober(native).get_subtitle_streams(self.video, "eng")
+
+        # results of the native reader are not served to ffprobe and vice versa
+        prober = extract.prober.MediaProber(cache_file=self.cache_file, native_matroska=False)
+        prober._probe_file = mock.Mock(return_value=[])
+        self.assertEqual(prober.get_subtitle_streams(self.video, "eng"), [])
+        prober._probe_file.assert_called_once()
+
+        prober = self._prober([])
+        self.assertEqual(prober.get_subtitle_streams(self.video, "eng")[0].index, 2)
+        prober._probe_file.assert_not_called()
+
+        stats = prober.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 0))
+        self.assertEqual(stats["persistent"], {"entries": 2, "hits": 1})
+
+    def test_cache_without_modes_is_reset(self):
+        conn = sqlite3.connect(self.cache_file)
+        conn.execute(
+            "CREATE TABLE probes (path TEXT PRIMARY KEY, size INTEGER, "
+            "mtime_ns INTEGER, inode INTEGER, streams TEXT)"
+        )
+        conn.execute("INSERT INTO probes VALUES (?, 5, 0, 0, '[]')", (self.video,))
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(extract.ProbeCache(self.cache_file).stats(), {"entries": 0})
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+
+class TestCombinedExtractor(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.video = os.path.join(self.temp_dir, "video.mkv")
+
+    def test_single_pass(self):
+        config = extract.config.ExtractorConfig(True, ["srt"], unknown_language_as="eng")
+        probe = extract.prober.MediaProber()
+        probe.get_subtitle_streams = mock.Mock(
+            return_value=[
+                extract.StreamInfo({"index": 2, "codec_name": "subrip"}),
+                extract.StreamInfo({"index": 3, "codec_name": "hdmv_pgs_subtitle"}),
+            ]
+        )
+
+        extractor = extract.CombinedSubtitleExtractor(config, probe)
+        extractor.subprocess_runner = mock.Mock()
+        extractor.bitmap_extractor.process_sup_files = mock.Mock(return_value=[])
+
+        files = extractor.extract(self.video)
+
+        extractor.subprocess_runner.run.assert_called_once()
+        args = extractor.subprocess_runner.run.call_args[0][0]
+        self.assertEqual(args.count("-i"), 1)
+        self.assertIn("0:2", args)
+        self.assertIn("0:3", args)
+
+        sup_path = os.path.join(self.temp_dir, "video.3.unknown.sup")
+        srt_path = os.path.join(self.temp_dir, "video.2.unknown.srt")
+        self.assertEqual(files, [srt_path, sup_path])
+        extractor.bitmap_extractor.process_sup_files.assert_called_once_with(
+            self.video, mock.ANY, [sup_path], {}
+        )
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+
+class TestFormatConversion(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+
+    def test_plan_copies_and_converts(self):
+        config = extract.config.ExtractorConfig(True, ["ass", "srt", "vtt"])
+        extractor = extract.TextSubtitleExtractor(config, extract.prober.MediaProber())
+        video = os.path.join(self.temp_dir, "video.mkv")
+        stream = extract.StreamInfo(
+            {"index": 2, "codec_name": "subrip", "tags": {"language": "eng"}}
+        )
+
+        plan = extractor.plan_extraction(video, [stream])
+
+        srt_path = os.path.join(self.temp_dir, "video.2.eng.srt")
+        self.assertEqual(plan.output_paths, [srt_path])
+        self.assertEqual(plan.ffmpeg_args, ["-map", "0:2", "-c", "copy", srt_path])
+        self.assertEqual(
+            plan.conversions,
+            {srt_path: [srt_path[:-3] + "ass", srt_path[:-3] + "vtt"]},
+        )
+
+    def test_converter(self):
+        import pysubs2
+
+        srt_path = os.path.join(self.temp_dir, "sub.srt")
+        with open(srt_path, "w") as f:
+            f.write("1\n00:00:01,000 --> 00:00:02,000\n<i>Hello</i>\n\n")
+
+        outputs = [srt_path[:-3] + "ass", srt_path[:-3] + "vtt"]
+        converted = extract.SubtitleConverter().convert(srt_path, outputs)
+        self.assertEqual(converted, outputs)
+
+        ass = pysubs2.load(outputs[0])
+        self.assertEqual(ass.info["PlayResY"], "288")
+        self.assertEqual(ass.events[0].text, "{\\i1}Hello{\\i0}")
+        self.assertEqual(pysubs2.load(outputs[1]).events[0].start, 1000)
+
+        # the style of FFmpeg's ASS encoder, not pysubs2's
+        with open(outputs[0]) as f:
+            self.assertIn(
+                "Style: Default,Arial,16,&H00FFFFFF,&H00FFFFFF,&H00000000,&H00000000,"
+                "0,0,0,0,100,100,0,0,1,1,0,2,10,10,10,0",
+                f.read(),
+            )
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+
+class TestOCRCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.temp_dir, "ocr.db")
+
+    def make_items(self, images):
+        import numpy as np
+        from pysrt import SubRipTime
+
+        items = []
+        for i, value in enumerate(images):
+            item = mock.Mock(text=None, start=SubRipTime(seconds=i), end=SubRipTime(seconds=i + 1))
+            item.image.data = np.full((4, 8), value, dtype=np.uint8)
+            items.append(item)
+
+        return items
+
+    def rip(self, images, srt_name):
+        from extract.extractors import bitmap
+
+        pgs = mock.Mock(items=self.make_items(images))
+        ocr_calls = []
+
+        def fake_rip(pgs, options):
+            def rip(post_process):
+                ocr_calls.append(len(pgs._items))
+                for item in pgs._items:
+                    item.text = f"text {int(item.image.data[0, 0])}"
+
+            return mock.Mock(rip=rip)
+
+        srt_path = os.path.join(self.temp_dir, srt_name)
+        with mock.patch.object(bitmap, "Pgs", return_value=pgs), mock.patch.object(
+            bitmap, "PgsToSrtRipper", side_effect=fake_rip
+        ):
+            stats = bitmap._ocr_pgs(b"", srt_path, "eng", self.cache_file)
+
+        with open(srt_path) as f:
+            return stats, ocr_calls, f.read()
+
+    def test_repeated_bitmaps(self):
+        # repeats within a stream are OCR'd once
+        stats, calls, srt = self.rip([1, 2, 1, 1], "a.srt")
+        self.assertEqual(stats, (2, 2))
+        self.assertEqual(calls, [2])
+        self.assertEqual(srt.count("text 1"), 3)
+        self.assertEqual(srt.count("text 2"), 1)
+
+        # repeats across streams are served from the persistent cache
+        stats, calls, srt = self.rip([2, 3, 1], "b.srt")
+        self.assertEqual(stats, (2, 1))
+        self.assertEqual(calls, [1])
+        self.assertIn("text 3", srt)
+
+    def tearDown(self) -> None:
+        from extract.extractors import bitmap
+
+        for cache in bitmap._ocr_caches.values():
+            cache.close()
+        bitmap._ocr_caches.clear()
+        shutil.rmtree(self.temp_dir)
+
+
+class TestParallelOCR(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.video = os.path.join(self.temp_dir, "video.mkv")
+        self.executors = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def fake_executor(self, max_workers, mp_context=None):
+        # OCR jobs run in threads of this process, where _ocr_pgs is stubbed
+        self.executors.append(max_workers)
+        return ThreadPoolExecutor(max_workers)
+
+    def fake_ocr(self, source, srt_path, language, cache_file=None):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+
+        try:
+            # the first streams finish last
+            time.sleep(0.05 * (4 - int(source[-1:])))
+            if source.startswith(b"bad"):
+                raise extract.OCRError("unreadable stream")
+
+            with open(srt_path, "w") as f:
+                f.write(source.decode())
+            return 0, 1
+        finally:
+            with self.lock:
+                self.running -= 1
+
+    def test_streams_isolated_and_ordered(self):
+        from extract.extractors import bitmap
+
+        config = extract.config.ExtractorConfig(True, ["srt"], ocr_workers=2)
+        extractor = extract.BitmapSubtitleExtractor(config, extract.prober.MediaProber())
+
+        streams = [
+            extract.StreamInfo(
+                {"index": i, "codec_name": "hdmv_pgs_subtitle", "tags": {"language": "eng"}}
+            )
+            for i in range(4)
+        ]
+        paths = [os.path.join(self.temp_dir, f"video.{i}.eng.srt") for i in range(4)]
+        pgs_data = {path: f"stream{i}".encode() for i, path in enumerate(paths)}
+        pgs_data[paths[1]] = b"bad1"
+
+        with mock.patch.object(
+            bitmap, "ProcessPoolExecutor", side_effect=self.fake_executor
+        ), mock.patch.object(bitmap, "_ocr_pgs", side_effect=self.fake_ocr):
+            with self.assertLogs("extract.extractors.bitmap", logging.ERROR) as logs:
+                files = extractor._ocr_to_srt(self.video, streams, [], pgs_data)
+            extractor.close()
+
+        self.assertEqual(files, [paths[0], paths[2], paths[3]])
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("stream 1", logs.output[0])
+        with open(paths[3]) as f:
+            self.assertEqual(f.read(), "stream3")
+
+        self.assertEqual(self.executors, [2])
+        self.assertEqual(self.max_running, 2)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+
+class TestSubprocessRunner(unittest.TestCase):
+    def test_run_piped(self):
+        import sys
+
+        script = (
+            "import os, sys\n"
+            "for arg in sys.argv[1:]:\n"
+            "    if arg.startswith('pipe:'):\n"
+            "        os.write(int(arg[5:]), b'x' * 100000 + arg[:4].encode())\n"
+        )
+        runner = extract.SubprocessRunner()
+        data = runner.run_piped([sys.executable, "-c", script], [["a"], ["b"]])
+
+        self.assertEqual(len(data), 2)
+        self.assertTrue(all(d == b"x" * 100000 + b"pipe" for d in data))
+
+        with self.assertRaises(extract.subprocess.SubprocessError):
+            runner.run_piped([sys.executable, "-c", "exit(1)"], [["a"]])
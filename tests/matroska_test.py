@@ -0,0 +1,132 @@
+import os
+import tempfile
+import unittest
+
+from extract.exceptions import MatroskaError
+from extract.matroska import read_subtitle_streams
+
+
+def element(element_id: int, data: bytes) -> bytes:
+    id_bytes = element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+    size = (len(data) | (1 << 56)).to_bytes(8, "big")  # 8 byte size vint
+    return id_bytes + size + data
+
+
+def uint(element_id: int, value: int) -> bytes:
+    return element(element_id, value.to_bytes(1, "big"))
+
+
+def string(element_id: int, value: str) -> bytes:
+    return element(element_id, value.encode())
+
+
+def track(track_type: int, codec: str, **extra: bytes) -> bytes:
+    return element(
+        0xAE, uint(0x83, track_type) + string(0x86, codec) + b"".join(extra.values())
+    )
+
+
+def matroska(tracks: list[bytes], doc_type: str = "matroska", seek=False) -> bytes:
+    header = element(0x1A45DFA3, string(0x4282, doc_type))
+    tracks_element = element(0x1654AE6B, b"".join(tracks))
+    cluster = element(0x1F43B675, b"\x00" * 32)
+
+    if seek:
+        # Tracks after the first cluster, only reachable through the SeekHead
+        seek_head = element(
+            0x114D9B74,
+            element(
+                0x4DBB,
+                element(0x53AB, b"\x16\x54\xae\x6b")
+                + element(0x53AC, (0).to_bytes(8, "big")),
+            ),
+        )
+        position = len(seek_head) + len(cluster)
+        seek_head = seek_head.replace((0).to_bytes(8, "big"), position.to_bytes(8, "big"))
+        body = seek_head + cluster + tracks_element
+    else:
+        body = tracks_element + cluster
+
+    return header + element(0x18538067, body)
+
+
+class TestMatroskaReader(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "video.mkv")
+
+    def write(self, data: bytes):
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+    def test_subtitle_tracks(self):
+        self.write(
+            matroska(
+                [
+                    track(0x01, "V_MPEG4/ISO/AVC"),
+                    track(0x02, "A_AAC", lang=string(0x22B59C, "jpn")),
+                    track(0x11, "S_TEXT/ASS", name=string(0x536E, "Signs & Songs")),
+                    track(
+                        0x11,
+                        "S_HDMV/PGS",
+                        lang=string(0x22B59C, "und"),
+                        forced=uint(0x55AA, 1),
+                        default=uint(0x88, 0),
+                    ),
+                ]
+            )
+        )
+
+        streams = read_subtitle_streams(self.path)
+
+        self.assertEqual([s["index"] for s in streams], [2, 3])
+        self.assertEqual(streams[0]["codec_name"], "ass")
+        self.assertEqual(streams[0]["tags"], {"language": "eng", "title": "Signs & Songs"})
+        self.assertEqual(streams[0]["disposition"]["default"], 1)
+        self.assertEqual(streams[1]["codec_name"], "hdmv_pgs_subtitle")
+        self.assertEqual(streams[1]["tags"], {})
+        self.assertEqual(streams[1]["disposition"]["forced"], 1)
+        self.assertEqual(streams[1]["disposition"]["default"], 0)
+
+    def test_metadata_tracks_numbered(self):
+        self.write(
+            matroska(
+                [
+                    track(0x01, "V_MPEG4/ISO/AVC"),
+                    track(0x21, "D_WEBVTT/METADATA"),
+                    track(0x11, "S_TEXT/UTF8"),
+                ]
+            )
+        )
+
+        # ffmpeg creates a data stream for the metadata track
+        self.assertEqual([s["index"] for s in read_subtitle_streams(self.path)], [2])
+
+        self.write(matroska([track(0x12, "B_VOBBTN"), track(0x11, "S_TEXT/UTF8")]))
+        with self.assertRaises(MatroskaError):
+            read_subtitle_streams(self.path)
+
+    def test_tracks_through_seek_head(self):
+        self.write(matroska([track(0x11, "S_TEXT/UTF8")], seek=True))
+
+        streams = read_subtitle_streams(self.path)
+        self.assertEqual(len(streams), 1)
+        self.assertEqual(streams[0]["codec_name"], "subrip")
+
+    def test_unsupported(self):
+        self.write(matroska([track(0x11, "S_KATE")]))
+        with self.assertRaises(MatroskaError):
+            read_subtitle_streams(self.path)
+
+        self.write(b"\x00\x00\x01\xba not matroska")
+        with self.assertRaises(MatroskaError):
+            read_subtitle_streams(self.path)
+
+    def tearDown(self) -> None:
+        import shutil
+
+        shutil.rmtree(self.temp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
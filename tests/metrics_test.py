@@ -0,0 +1,164 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import urllib.request
+
+import metrics
+from extract.subprocess import SubprocessError, SubprocessRunner
+from module import PostprocessorModule
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self) -> None:
+        self.registry = metrics.Registry()
+
+    def test_prometheus_text(self):
+        files = self.registry.counter("files_total", "Files", ["result"])
+        files.inc(result="ok")
+        files.inc(2, result="ok")
+        files.inc(result='say "hi"')
+
+        self.registry.gauge("depth", "Depth").set_function(lambda: 7)
+
+        latency = self.registry.histogram("seconds", "Latency", buckets=(0.1, 1))
+        latency.observe(0.05)
+        latency.observe(0.5)
+        latency.observe(5)
+
+        text = self.registry.to_prometheus()
+        self.assertIn("# TYPE files_total counter", text)
+        self.assertIn('files_total{result="ok"} 3', text)
+        self.assertIn('files_total{result="say \\"hi\\""} 1', text)
+        self.assertIn("depth 7", text)
+        self.assertIn('seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('seconds_bucket{le="1"} 2', text)
+        self.assertIn('seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn("seconds_sum 5.55", text)
+        self.assertIn("seconds_count 3", text)
+
+        data = self.registry.to_dict()
+        self.assertEqual(data["seconds"]["values"][0]["count"], 3)
+        self.assertEqual(data["files_total"]["values"][0]["labels"], {"result": "ok"})
+
+    def test_labels_and_kinds(self):
+        files = self.registry.counter("files_total", "Files", ["result"])
+        self.assertIs(self.registry.counter("files_total", "Files", ["result"]), files)
+
+        with self.assertRaises(ValueError):
+            files.inc()
+
+        with self.assertRaises(ValueError):
+            self.registry.gauge("files_total", "Files")
+
+    def test_hit_ratio(self):
+        requests = self.registry.counter("cache_total", "Lookups", ["result"])
+        ratio = metrics.hit_ratio(requests)
+        self.assertEqual(ratio(), 0.0)
+
+        requests.inc(3, result="hit")
+        requests.inc(result="miss")
+        self.assertEqual(ratio(), 0.75)
+
+    def test_export_and_merge(self):
+        worker = metrics.Registry()
+        for registry in (worker, self.registry):
+            registry.counter("files_total", "Files")
+            registry.histogram("seconds", "Latency", buckets=(1,))
+            registry.gauge("depth", "Depth")
+
+        worker.counter("files_total", "Files").inc(2)
+        worker.histogram("seconds", "Latency").observe(0.5)
+        worker.gauge("depth", "Depth").set(4)
+
+        self.registry.merge(worker.export())
+        self.registry.merge(worker.export())  # nothing new
+
+        self.assertEqual(self.registry.counter("files_total", "Files").value(), 2)
+        self.assertIn("seconds_count 1", self.registry.to_prometheus())
+        self.assertEqual(self.registry.to_dict()["depth"]["values"], [])
+        self.assertEqual(worker.counter("files_total", "Files").value(), 0)
+
+
+class TestExporters(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.registry = metrics.Registry()
+        self.registry.counter("files_total", "Files").inc(3)
+
+    def test_server(self):
+        server = metrics.MetricsServer("127.0.0.1", 0, self.registry).start()
+        try:
+            url = f"http://127.0.0.1:{server.port}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+                self.assertIn("files_total 3", response.read().decode())
+        finally:
+            server.stop()
+
+    def test_stats_file(self):
+        path = os.path.join(self.temp_dir, "metrics.json")
+        writer = metrics.StatsFileWriter(path, 60, self.registry).start()
+        writer.stop()
+
+        with open(path) as f:
+            data = json.load(f)
+
+        self.assertEqual(data["metrics"]["files_total"]["values"][0]["value"], 3)
+        self.assertEqual(os.listdir(self.temp_dir), ["metrics.json"])
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+
+    def test_subprocess(self):
+        runner = SubprocessRunner()
+        command = os.path.basename(sys.executable)
+        runs = metrics.REGISTRY.histogram("subextractor_subprocess_seconds", "")
+        errors = metrics.REGISTRY.counter("subextractor_subprocess_errors_total", "")
+        output = metrics.REGISTRY.counter("subextractor_subprocess_output_bytes_total", "")
+
+        before = output.value(command=command), errors.value(command=command)
+        runner.run([sys.executable, "-c", "print('x' * 9)"])
+        with self.assertRaises(SubprocessError):
+            runner.run([sys.executable, "-c", "raise SystemExit(1)"])
+
+        self.assertEqual(output.value(command=command) - before[0], 10)
+        self.assertEqual(errors.value(command=command) - before[1], 1)
+        self.assertIn((command,), dict(runs.samples()))
+
+    def test_postprocess_in_workers(self):
+        workflow = os.path.join(self.temp_dir, "postprocess.yaml")
+        with open(workflow, "w") as f:
+            f.write("srt:\n  tasks: []\n")
+
+        paths = []
+        for i in range(3):
+            paths.append(os.path.join(self.temp_dir, f"{i}.srt"))
+            with open(paths[-1], "w") as f:
+                f.write("1\n00:00:01,000 --> 00:00:02,000\nHello\n\n")
+
+        files = metrics.REGISTRY.counter("subextractor_postprocessed_files_total", "")
+        before = files.value(format="srt", result="processed")
+
+        module = PostprocessorModule(workflow, workers=2)
+        try:
+            self.assertEqual(len(module.process(paths)), 3)
+        finally:
+            module.close()
+
+        # recorded by the worker processes, merged into this process
+        self.assertEqual(files.value(format="srt", result="processed") - before, 3)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
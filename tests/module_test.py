@@ -0,0 +1,227 @@
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+import unittest
+from unittest import mock
+
+import extract.config
+from module import ExtractionModule, PostprocessorModule
+
+
+class FakeExtractor:
+    def __init__(self, config, prober) -> None:
+        pass
+
+    def extract(self, path: str) -> list[str]:
+        if path.endswith("bad.mkv"):
+            raise RuntimeError("broken file")
+
+        # finish later files first to shuffle completion order
+        time.sleep(0.01 * (5 - int(os.path.basename(path)[0])))
+        return [f"{path}.srt"]
+
+    def close(self):
+        pass
+
+
+class TestExtractionModule(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.excluded = os.path.join(self.temp_dir, "extracted.txt")
+
+        patcher = mock.patch("module.TextSubtitleExtractor", FakeExtractor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parallel_process(self):
+        module = ExtractionModule(
+            extract.config.ExtractorConfig(),
+            workers=4,
+            excluded_enable=True,
+            excluded_filelist=self.excluded,
+            excluded_append=True,
+        )
+
+        paths = ["1.mkv", "2.mkv", "3bad.mkv", "4.mkv"]
+        files = module.process(paths)
+
+        # outputs keep the input order, failed files are isolated
+        self.assertEqual(files, ["1.mkv.srt", "2.mkv.srt", "4.mkv.srt"])
+
+        with open(self.excluded) as f:
+            self.assertEqual(sorted(f.read().splitlines()), sorted(paths))
+
+    def test_failed_files_not_recorded(self):
+        paths = [os.path.join(self.temp_dir, name) for name in ("1.mkv", "2bad.mkv")]
+        for path in paths:
+            open(path, "w").close()
+
+        module = ExtractionModule(
+            extract.config.ExtractorConfig(),
+            state_file=os.path.join(self.temp_dir, "state.db"),
+        )
+        module.process(paths)
+
+        # the failed file is scanned again
+        self.assertTrue(module.state_index.is_current(paths[0]))
+        self.assertFalse(module.state_index.is_current(paths[1]))
+        self.assertEqual(list(module.iter_filelist(self.temp_dir)), [paths[1]])
+
+    def test_concurrent_excluded_append(self):
+        module = ExtractionModule(
+            extract.config.ExtractorConfig(),
+            excluded_enable=True,
+            excluded_filelist=self.excluded,
+            excluded_append=True,
+        )
+
+        def append(n):
+            for i in range(100):
+                module.add_excluded_files([f"{n}-{i}-a", f"{n}-{i}-b"])
+
+        threads = [threading.Thread(target=append, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(module.get_excluded_files()), 8 * 100 * 2)
+
+    def test_filelist_excluded(self):
+        media = os.path.join(self.temp_dir, "media")
+        os.makedirs(os.path.join(media, "show"))
+        paths = [os.path.join(media, "show", name) for name in ("1.mkv", "2.MKV", "3.srt")]
+        for path in paths:
+            open(path, "w").close()
+
+        with open(self.excluded, "w") as f:
+            f.write(paths[0] + "\n")
+
+        module = ExtractionModule(
+            extract.config.ExtractorConfig(),
+            excluded_enable=True,
+            excluded_filelist=self.excluded,
+        )
+
+        files = module.iter_filelist(media)
+        self.assertNotIsInstance(files, list)
+        self.assertEqual(list(files), [paths[1]])
+
+    def tearDown(self) -> None:
+        import shutil
+
+        shutil.rmtree(self.temp_dir)
+
+
+class TestPostprocessorModule(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.workflow = os.path.join(self.temp_dir, "postprocess.yaml")
+        self.excluded = os.path.join(self.temp_dir, "postprocessed.txt")
+
+        with open(self.workflow, "w") as f:
+            f.write("srt:\n  tasks: []\n")
+
+    def test_parallel_process(self):
+        paths = []
+        for i in range(6):
+            path = os.path.join(self.temp_dir, f"{i}.srt")
+            with open(path, "w") as f:
+                f.write(f"1\n00:00:0{i},000 --> 00:00:0{i},500\nline {i}\n")
+            paths.append(path)
+
+        # unsupported format, fails inside a worker without stopping the batch
+        paths.insert(3, os.path.join(self.temp_dir, "bad.txt"))
+
+        module = PostprocessorModule(
+            self.workflow,
+            workers=2,
+            chunksize=2,
+            excluded_enable=True,
+            excluded_filelist=self.excluded,
+            excluded_append=True,
+        )
+        try:
+            files = module.process(iter(paths))
+            executor = module.get_executor()
+
+            self.assertEqual(files, [p for p in paths if p.endswith(".srt")])
+            self.assertEqual(module.get_excluded_files(), set(paths))
+
+            # the worker processes are kept for the next run
+            self.assertEqual(module.process(paths[:1]), paths[:1])
+            self.assertIs(module.get_executor(), executor)
+        finally:
+            module.close()
+
+    def test_workflow_edit_reprocesses_files(self):
+        library = os.path.join(self.temp_dir, "lib")
+        os.mkdir(library)
+        path = os.path.join(library, "a.srt")
+        with open(path, "w") as f:
+            f.write("1\n00:00:01,000 --> 00:00:02,000\nline\n")
+
+        module = PostprocessorModule(
+            self.workflow, state_file=os.path.join(self.temp_dir, "state.db")
+        )
+        self.assertEqual(module.process(module.iter_filelist(library)), [path])
+        self.assertEqual(module.get_filelist(library), [])
+
+        # edited while the process is running
+        with open(self.workflow, "w") as f:
+            f.write("srt:\n  tasks: []\nass:\n  tasks: []\n")
+
+        self.assertEqual(module.get_filelist(library), [path])
+        self.assertEqual(module.process(module.iter_filelist(library)), [path])
+        self.assertEqual(module.get_filelist(library), [])
+
+    def test_profile_stops_tracing(self):
+        path = os.path.join(self.temp_dir, "profiled.srt")
+        with open(path, "w") as f:
+            f.write("1\n00:00:01,000 --> 00:00:02,000\nline\n")
+        with open(self.workflow, "w") as f:
+            f.write("srt:\n  tasks:\n    - selectors:\n        - uses: events_select_all\n")
+
+        module = PostprocessorModule(self.workflow, profile=True)
+        module.process([path])
+
+        # allocations are traced only while the files are formatted
+        self.assertEqual(module.profiler.files, 1)
+        self.assertTrue(module.profiler.profiles)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_formatter_reused(self):
+        module = PostprocessorModule(self.workflow)
+        formatter = module.get_formatter()
+        self.assertIs(module.get_formatter(), formatter)
+
+        # edits of the workflow file are loaded by the next run
+        with open(self.workflow, "w") as f:
+            f.write("ass:\n  tasks: []\n")
+        self.assertIsNot(module.get_formatter(), formatter)
+
+    def test_failed_files_not_recorded(self):
+        paths = [os.path.join(self.temp_dir, name) for name in ("good.srt", "bad.ass")]
+        with open(paths[0], "w") as f:
+            f.write("1\n00:00:01,000 --> 00:00:02,000\nline\n")
+        with open(paths[1], "w") as f:
+            f.write("not a subtitle")
+
+        module = PostprocessorModule(
+            self.workflow, state_file=os.path.join(self.temp_dir, "state.db")
+        )
+        module.process(paths)
+
+        self.assertTrue(module.state_index.is_current(paths[0]))
+        self.assertFalse(module.state_index.is_current(paths[1]))
+
+    def tearDown(self) -> None:
+        import shutil
+
+        shutil.rmtree(self.temp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
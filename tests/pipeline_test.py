@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import extract.config
+from module import ExtractionModule, PostprocessorModule
+from pipeline import run_pipeline
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.workflow = os.path.join(self.temp_dir, "postprocess.yaml")
+        with open(self.workflow, "w") as f:
+            f.write("srt:\n  tasks: []\n")
+
+        self.formatted = []
+        self.first_formatted = threading.Event()
+
+    def extract(self, path: str) -> list[str]:
+        if path == "last.mkv":
+            # only returns once the first subtitles went through postprocessing
+            self.assertTrue(self.first_formatted.wait(timeout=5))
+
+        return [f"{path}.srt", f"{path}.sup"]
+
+    def format(self, path: str) -> list[str]:
+        self.formatted.append(path)
+        self.first_formatted.set()
+
+        if path.startswith("bad"):
+            raise RuntimeError("broken subtitle")
+
+        return [path]
+
+    def test_stages_overlap(self):
+        extractor = mock.Mock()
+        extractor.extract.side_effect = self.extract
+        formatter = mock.Mock()
+        formatter.format.side_effect = self.format
+
+        extract_mod = ExtractionModule(extract.config.ExtractorConfig(), workers=1)
+        post_mod = PostprocessorModule(self.workflow)
+
+        with mock.patch("module.TextSubtitleExtractor", return_value=extractor), mock.patch.object(
+            post_mod, "create_formatter", return_value=formatter
+        ):
+            count = run_pipeline(
+                extract_mod,
+                post_mod,
+                ["first.mkv", "bad.mkv", "last.mkv"],
+                queue_size=1,
+            )
+
+        # .sup outputs are not postprocessed and errors are isolated per file
+        self.assertEqual(self.formatted, ["first.mkv.srt", "bad.mkv.srt", "last.mkv.srt"])
+        self.assertEqual(count, 2)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,25 @@
+import copy
 import os
+import pstats
+import re
 import tempfile
 import unittest
+import unittest.mock
 from pathlib import Path
 
 import pysubs2
 import yaml
 
-from postprocessing import SubtitleFormatter
+from postprocessing import SubtitleFormatter, actions
+from postprocessing.ass_tags import render, tokenize
+from postprocessing.columnar import EventTable
+from postprocessing.fusion import RegexSubstitution, required_literal
+from postprocessing.plan import compile_workflow
+from postprocessing.profiler import WorkflowProfiler
+from postprocessing.runner import WorkflowRunner
+from postprocessing.selection import EventSelection
+from postprocessing.snapshot import analyze_references, take_snapshot
+from postprocessing.streaming import is_streamable, stream_file
 
 
 class TestSubtitlePostprocessing(unittest.TestCase):
@@ -259,6 +272,637 @@ class TestSubtitlePostprocessing(unittest.TestCase):
         self.assertEqual(result.info["Title"], "Original Title - Modified")
         self.assertEqual(result.info["PlayResX"], "1920")  # 1280 + 640
 
+    def test_invalid_workflow(self):
+        invalid_configs = [
+            {"srt": {"tasks": [{"selectors": [{"uses": "events_select_everything"}]}]}},
+            {"srt": {"tasks": [{"selectors": [{"with": {"a": 1}}]}]}},
+            {"srt": {"tasks": [{"selection": [{"uses": "events_select_all"}]}]}},
+            {
+                "srt": {
+                    "tasks": [
+                        {
+                            "selectors": [
+                                {"uses": "events_select_all", "with": {"a": "{{1 +}}"}}
+                            ]
+                        }
+                    ]
+                }
+            },
+        ]
+
+        config_path = Path(self.temp_dir) / "invalid_config.yaml"
+        for config in invalid_configs:
+            with open(config_path, "w") as f:
+                yaml.dump(config, f)
+
+            # errors are raised when the workflow is loaded, not per file
+            with self.assertRaises(RuntimeError):
+                SubtitleFormatter(str(config_path))
+
+    def test_compiled_plan_reused(self):
+        formatter = SubtitleFormatter(str(self.config_path))
+        plan = formatter.plans["srt"]
+
+        for i in range(2):
+            test_file = Path(self.temp_dir) / f"reuse_{i}.srt"
+            ssafile = pysubs2.SSAFile()
+            ssafile.events.append(pysubs2.SSAEvent(start=0, end=1000, text="Line"))
+            ssafile.save(str(test_file))
+
+            formatter.format(str(test_file))
+
+        self.assertIs(formatter.plans["srt"], plan)
+        task = plan.steps[0].actions[0]
+        self.assertEqual(task.func_name, "events_action_update_properties")
+        self.assertEqual(task.get_kwargs({}), {"style": "Default"})
+
+    def test_output_snapshots(self):
+        references = analyze_references(
+            [
+                "int(outputs['info'][0]['PlayResX'])",
+                "outputs['events'][0].text + outputs['events'][0].style.upper()",
+                "len(outputs['styles'])",
+            ]
+        )
+        self.assertEqual(
+            references,
+            {
+                "info": {(("item", 0), ("item", "PlayResX"))},
+                "events": {(("item", 0), ("attr", "text")), (("item", 0), ("attr", "style"))},
+                "styles": {()},
+            },
+        )
+        self.assertIsNone(analyze_references(["outputs.get('info')"]))
+        self.assertIsNone(analyze_references(["globals()['outputs']"]))
+
+        # only the referenced fields are copied, as they were when taken
+        events = [pysubs2.SSAEvent(text="a", style="Default"), pysubs2.SSAEvent(text="b")]
+        snapshot = take_snapshot(events, references["events"])
+        events[0].text = "changed"
+
+        self.assertEqual(snapshot[0].text, "a")
+        self.assertNotIn(1, snapshot)
+        self.assertFalse(hasattr(snapshot[0], "start"))
+
+    def test_unreferenced_outputs_not_copied(self):
+        plan = compile_workflow(
+            [
+                {"selectors": [{"uses": "events_select_all", "id": "events"}]},
+                {
+                    "selectors": [{"uses": "info_select_current_info", "id": "info"}],
+                    "actions": [
+                        {
+                            "uses": "info_action_update",
+                            "with": {"PlayResX": "{{outputs['info'][0]['PlayResY']}}"},
+                        }
+                    ],
+                },
+            ]
+        )
+
+        events_task, info_task = plan.steps[0].selectors[0], plan.steps[1].selectors[0]
+        self.assertEqual(events_task.snapshot, frozenset())
+        self.assertEqual(info_task.snapshot, {(("item", 0), ("item", "PlayResY"))})
+
+        ssafile = pysubs2.SSAFile()
+        ssafile.info["PlayResY"] = "720"
+        ssafile.events = [pysubs2.SSAEvent(text=str(i)) for i in range(100)]
+
+        runner = WorkflowRunner(plan, ssafile)
+        with unittest.mock.patch("copy.deepcopy", wraps=copy.deepcopy) as deepcopy:
+            runner.process()
+
+        self.assertNotIn("events", runner.outputs)
+        self.assertEqual(deepcopy.call_count, 1)  # the referenced PlayResY value
+        self.assertEqual(ssafile.info["PlayResX"], "720")
+
+    def test_columnar_actions(self):
+        ssafile = pysubs2.SSAFile()
+        ssafile.events = [
+            pysubs2.SSAEvent(start=1000, end=1200, marginl=15, marginr=25, marginv=10),
+            pysubs2.SSAEvent(start=1250, end=3000, marginl=5, marginr=0, marginv=30),
+            pysubs2.SSAEvent(start=2000, end=2500, text="overlapped"),
+            pysubs2.SSAEvent(start=9000, end=9100, text="not selected"),
+        ]
+        events = list(ssafile.events)
+
+        plan = compile_workflow(
+            [
+                {
+                    "selectors": [{"uses": "events_select_all"}],
+                    "filters": [{"uses": "events_filter_regex", "with": {"regex": "^(?!not)"}}],
+                    "actions": [
+                        {
+                            "uses": "events_action_scale_margins",
+                            "with": {"x_old": 2, "x_new": 3, "y_old": 4, "y_new": 5},
+                        },
+                        {"uses": "events_action_shift", "with": {"s": 1, "ms": -500}},
+                        {"uses": "events_action_retime", "with": {"fps_old": 25, "fps_new": 50}},
+                        {
+                            "uses": "events_action_fix_durations",
+                            "with": {"min_duration": 500, "min_gap": 50},
+                        },
+                    ],
+                }
+            ]
+        )
+
+        runner = WorkflowRunner(plan, ssafile)
+        with unittest.mock.patch.object(
+            EventTable, "sync", autospec=True, side_effect=EventTable.sync
+        ) as sync:
+            runner.process()
+
+        # consecutive columnar actions are written back to the events once
+        self.assertEqual(sync.call_count, 1)
+
+        # same rounding as round()
+        self.assertEqual([e.marginl for e in events], [round(15 * 1.5), round(5 * 1.5), 0, 0])
+        self.assertEqual([e.marginr for e in events], [round(25 * 1.5), 0, 0, 0])
+        self.assertEqual([e.marginv for e in events], [round(10 * 1.25), round(30 * 1.25), 0, 0])
+
+        # (t + 500) / 2, then min duration and gap, the second event contains the third
+        self.assertEqual(
+            [(e.start, e.end) for e in events[:3]], [(750, 825), (875, 1750), (1250, 1750)]
+        )
+        self.assertEqual((events[3].start, events[3].end), (9000, 9100))
+
+    def test_selection_algebra_and_delete(self):
+        ssafile = pysubs2.SSAFile()
+        ssafile.events = [
+            pysubs2.SSAEvent(text="Hello"),
+            pysubs2.SSAEvent(text="{\\p1}m 0 0 l 10 10{\\p0}"),
+            pysubs2.SSAEvent(text="comment", type="Comment"),
+            pysubs2.SSAEvent(text="Hello"),  # equal to the first, kept
+            pysubs2.SSAEvent(text="World"),
+        ]
+        events = list(ssafile.events)
+
+        plan = compile_workflow(
+            [
+                {
+                    "selectors": [{"uses": "events_select_all", "id": "all"}],
+                    "filters": [
+                        {"uses": "events_filter_properties", "with": {"is_comment": True}}
+                    ],
+                    "actions": [{"uses": "events_action_update_properties", "id": "comments"}],
+                },
+                {
+                    "selectors": [{"uses": "events_select_all"}],
+                    "filters": [
+                        {"uses": "events_filter_properties", "with": {"is_drawing": True}},
+                        {
+                            "uses": "events_filter_union",
+                            "with": {"selection": "{{outputs['comments']}}"},
+                        },
+                    ],
+                    "actions": [{"uses": "events_action_delete"}],
+                },
+                {
+                    "selectors": [{"uses": "events_select_all"}],
+                    "filters": [
+                        {"uses": "events_filter_regex", "with": {"regex": "Hello"}},
+                        {"uses": "events_filter_invert"},
+                        {
+                            "uses": "events_filter_intersection",
+                            "with": {"selection": "{{outputs['all']}}"},
+                        },
+                    ],
+                    "actions": [
+                        {"uses": "events_action_update_properties", "with": {"text": "Bye"}}
+                    ],
+                },
+            ]
+        )
+
+        runner = WorkflowRunner(plan, ssafile)
+        runner.process()
+
+        self.assertEqual([e.text for e in ssafile.events], ["Hello", "Hello", "Bye"])
+        self.assertIs(ssafile.events[1], events[3])
+
+        # stored selections hold the events as of their task
+        stored = runner.outputs["all"]
+        self.assertEqual([e.text for e in stored][3:], ["Hello", "World"])
+        self.assertEqual(list(runner.outputs["comments"]), [events[2]])
+        self.assertIsNot(runner.outputs["comments"][0], events[2])
+
+        # and are aligned with the current events by the events they were made over
+        selection = EventSelection.all(ssafile.events).intersection(stored)
+        self.assertEqual(list(selection), ssafile.events)
+
+    def test_stored_selection_is_copied(self):
+        ssafile = pysubs2.SSAFile()
+        ssafile.events = [pysubs2.SSAEvent(text="old"), pysubs2.SSAEvent(text="x")]
+
+        # outputs.get() cannot be analysed, the whole output is deep-copied
+        plan = compile_workflow(
+            [
+                {
+                    "selectors": [{"uses": "events_select_all"}],
+                    "filters": [{"uses": "events_filter_regex", "with": {"regex": "old"}}],
+                    "actions": [{"uses": "events_action_update_properties", "id": "sel"}],
+                },
+                {
+                    "selectors": [{"uses": "events_select_all"}],
+                    "actions": [
+                        {
+                            "uses": "events_action_regex_substitution",
+                            "with": {"regex": "old", "replace": "new"},
+                        },
+                        {
+                            "uses": "events_action_update_properties",
+                            "with": {"name": "{{outputs.get('sel')[0].text}}"},
+                        },
+                    ],
+                },
+            ]
+        )
+        self.assertIsNone(plan.steps[0].actions[0].snapshot)
+
+        WorkflowRunner(plan, ssafile).process()
+
+        self.assertEqual([e.text for e in ssafile.events], ["new", "x"])
+        self.assertEqual([e.name for e in ssafile.events], ["old", "old"])
+
+    def test_selectors_select_events_once(self):
+        ssafile = pysubs2.SSAFile()
+        ssafile.events = [pysubs2.SSAEvent(start=1000, end=2000, text=t) for t in "ab"]
+
+        plan = compile_workflow(
+            [
+                {
+                    "selectors": [{"uses": "events_select_all"}] * 2,
+                    "actions": [{"uses": "events_action_shift", "with": {"ms": 10}}],
+                }
+            ]
+        )
+        WorkflowRunner(plan, ssafile).process()
+
+        # found by both selectors and shifted once
+        self.assertEqual([e.start for e in ssafile.events], [1010, 1010])
+
+    def test_copies_match_equal_events(self):
+        # pysubs2 compares the times of events
+        events = [pysubs2.SSAEvent(start=t, end=t + 1) for t in (0, 5, 0)]
+        copies = copy.deepcopy([events[2], events[0], events[1]])
+
+        # equal events are taken in list order, like list.remove()
+        selection = EventSelection.from_items(events, copies[:2])
+        self.assertEqual(selection.indices.tolist(), [0, 2])
+
+        ssafile = pysubs2.SSAFile()
+        ssafile.events = list(events)
+        actions.events_action_delete(ssafile, copies[2:])
+        self.assertEqual(ssafile.events, [events[0], events[2]])
+
+    def test_selection_keeps_item_order(self):
+        events = [pysubs2.SSAEvent(text=text) for text in ("a", "b", "c", "d")]
+        items = [events[3], events[0], events[2], events[3]]
+
+        # e.g. the events of a user selector, in its own order
+        selection = EventSelection.from_items(events, items)
+        self.assertEqual(list(selection), [events[3], events[0], events[2]])
+        self.assertIs(selection[0], events[3])
+
+        selection = selection.filter(lambda e: e.text != "a")
+        self.assertEqual(list(selection), [events[3], events[2]])
+        self.assertEqual(EventTable(events).rows(selection).tolist(), [3, 2])
+
+        # set operations are in list order
+        self.assertEqual(list(selection.union([events[1]])), events[1:])
+
+    def test_delete_is_linear(self):
+        ssafile = pysubs2.SSAFile()
+        ssafile.events = [
+            pysubs2.SSAEvent(text="x", type="Comment" if i % 2 else "Dialogue")
+            for i in range(20000)
+        ]
+
+        plan = compile_workflow(
+            [
+                {
+                    "selectors": [{"uses": "events_select_all"}],
+                    "filters": [
+                        {"uses": "events_filter_properties", "with": {"is_comment": True}}
+                    ],
+                    "actions": [{"uses": "events_action_delete"}],
+                }
+            ]
+        )
+
+        # equal events compared one by one would take minutes here
+        with unittest.mock.patch.object(
+            pysubs2.SSAEvent, "__eq__", side_effect=AssertionError("compared")
+        ):
+            WorkflowRunner(plan, ssafile).process()
+
+        self.assertEqual(len(ssafile.events), 10000)
+        self.assertFalse(any(e.is_comment for e in ssafile.events))
+
+    def test_fused_regex_tasks(self):
+        substitutions = [
+            ("{\\\\an\\d}", "[+] "),
+            ("(?i)hello", "Hi"),
+            ("Hi world", "Bye"),
+            ("\\s+$", ""),
+        ]
+        texts = ["{\\an8}hello world  ", "plain", "HELLO there", "{\\an1}x"]
+
+        ssafile = pysubs2.SSAFile()
+        ssafile.events = [pysubs2.SSAEvent(text=text) for text in texts]
+
+        plan = compile_workflow(
+            [
+                {
+                    "selectors": [{"uses": "events_select_all"}],
+                    "filters": [
+                        {"uses": "events_filter_regex", "with": {"regex": ".*"}},
+                        {"uses": "events_filter_regex", "with": {"regex": "(?!plain)"}},
+                    ],
+                    "actions": [
+                        {
+                            "uses": "events_action_regex_substitution",
+                            "with": {"regex": regex, "replace": replace},
+                        }
+                        for regex, replace in substitutions
+                    ],
+                }
+            ]
+        )
+
+        (step,) = plan.steps
+        self.assertEqual(len(step.filters), 1)
+        self.assertEqual(len(step.actions), 1)
+        self.assertIsInstance(step.actions[0].func, RegexSubstitution)
+
+        WorkflowRunner(plan, ssafile).process()
+
+        expected = []
+        for text in texts:
+            if not text.startswith("plain"):
+                for regex, replace in substitutions:
+                    text = re.sub(regex, replace, text)
+            expected.append(text)
+
+        self.assertEqual([e.text for e in ssafile.events], expected)
+        self.assertEqual(expected[0], "[+] Bye")
+
+    def test_regex_fusion_boundaries(self):
+        plan = compile_workflow(
+            [
+                {
+                    "actions": [
+                        {"uses": "events_action_regex_substitution", "with": {"regex": "a"}},
+                        {"uses": "events_action_regex_substitution", "with": {"regex": "b"}},
+                        {"uses": "events_action_regex_substitution", "id": "x"},
+                        {
+                            "uses": "events_action_regex_substitution",
+                            "with": {"regex": "{{outputs['x']}}"},
+                        },
+                        {"uses": "events_action_regex_substitution", "with": {"regex": "c"}},
+                    ],
+                }
+            ]
+        )
+
+        # tasks with an id or templates are not fused
+        self.assertEqual(len(plan.steps[0].actions), 4)
+
+        with self.assertRaises(ValueError):
+            compile_workflow(
+                [{"filters": [{"uses": "events_filter_regex", "with": {"regex": "("}}]}]
+            )
+
+    def test_required_literal(self):
+        self.assertEqual(required_literal(re.compile(r"{\\an\d}")), "{\\an")
+        self.assertEqual(required_literal(re.compile("foo.*barbaz")), "barbaz")
+        self.assertIsNone(required_literal(re.compile("a|b")))
+        self.assertIsNone(required_literal(re.compile("(?i)abc")))
+
+    def test_scale_override_tags(self):
+        texts = {
+            "{\\pos(640,360)\\fs40\\bord2\\xshad1.5}Hi {\\i1}there": (
+                "{\\pos(960,540)\\fs60\\bord3\\xshad2.25}Hi {\\i1}there"
+            ),
+            "{\\move(10,20,30,40,0,500)\\org(1,2)\\clip(0,0,640,360)}a": (
+                "{\\move(15,30,45,60,0,500)\\org(1.5,3)\\clip(0,0,960,540)}a"
+            ),
+            "{\\p1}m 0 0 l 100 0 100 100{\\p0}x": "{\\p1}m 0 0 l 150 0 150 150{\\p0}x",
+            "{\\p1\\pbo-20}m 0 0 l 100 0{\\p0}y": "{\\p1\\pbo-30}m 0 0 l 150 0{\\p0}y",
+            "{\\t(0,500,\\fs20)\\iclip(2,m 0 0 l 10 10)}c": (
+                "{\\t(0,500,\\fs30)\\iclip(2,m 0 0 l 15 15)}c"
+            ),
+            "{\\fnArial Bold\\fs}unchanged": "{\\fnArial Bold\\fs}unchanged",
+        }
+
+        for text in texts:
+            self.assertEqual(render(tokenize(text)), text)
+
+        # the drawing baseline offset, not \p with a value of "bo-20"
+        self.assertEqual(tokenize("{\\pbo-20}")[0], ("block", (("pbo", "-20"),)))
+
+        ssafile = pysubs2.SSAFile()
+        ssafile.events = [pysubs2.SSAEvent(text=text) for text in texts]
+
+        plan = compile_workflow(
+            [
+                {
+                    "selectors": [{"uses": "events_select_all"}],
+                    "actions": [
+                        {
+                            "uses": "events_action_scale_position",
+                            "with": {"x_old": 1280, "y_old": 720, "x_new": 1920, "y_new": 1080},
+                        }
+                    ],
+                }
+            ]
+        )
+        WorkflowRunner(plan, ssafile).process()
+
+        self.assertEqual([e.text for e in ssafile.events], list(texts.values()))
+        self.assertEqual(tokenize.cache_info().currsize, 0)
+
+    def test_streaming_matches_pysubs2(self):
+        plan = compile_workflow(
+            [
+                {
+                    "selectors": [{"uses": "events_select_all"}],
+                    "filters": [{"uses": "events_filter_regex", "with": {"regex": "(?!drop)"}}],
+                    "actions": [
+                        {
+                            "uses": "events_action_regex_substitution",
+                            "with": {"regex": "{\\\\an\\d}", "replace": "[+] "},
+                        }
+                    ],
+                },
+                {
+                    "selectors": [{"uses": "events_select_all"}],
+                    "filters": [{"uses": "events_filter_regex", "with": {"regex": "drop"}}],
+                    "actions": [{"uses": "events_action_delete"}],
+                },
+            ]
+        )
+        self.assertTrue(is_streamable(plan))
+
+        texts = ["<i>x</i> y", "{\\an8}top\\Nline", "drop me", "12", "", "a\\N\\Nb"]
+
+        for fmt in ("srt", "vtt"):
+            ssafile = pysubs2.SSAFile()
+            ssafile.events = [
+                pysubs2.SSAEvent(start=i * 100, end=i * 100 + 50, text=texts[i % len(texts)])
+                for i in range(50)
+            ]
+
+            loaded, streamed = (Path(self.temp_dir) / f"{name}.{fmt}" for name in "ab")
+            ssafile.save(str(loaded))
+            ssafile.save(str(streamed))
+
+            expected = pysubs2.load(str(loaded))
+            WorkflowRunner(plan, expected).process()
+            expected.save(str(loaded))
+
+            process = lambda subs: WorkflowRunner(plan, subs).process()
+            self.assertTrue(stream_file(str(streamed), process, fmt, chunk_size=4))
+            self.assertEqual(streamed.read_text(), loaded.read_text())
+
+        # pysubs2 sorts VTT cues, out of order files are not streamed
+        streamed.write_text("WEBVTT\n\n00:02.000 --> 00:03.000\nb\n\n00:01.000 --> 00:02.000\na\n")
+        self.assertFalse(stream_file(str(streamed), process, "vtt", chunk_size=1))
+        self.assertIn("00:02.000 --> 00:03.000\nb", streamed.read_text())
+        self.assertFalse([f for f in os.listdir(self.temp_dir) if f.endswith(".tmp")])
+
+    def test_streamable_workflows(self):
+        self.assertTrue(is_streamable(compile_workflow(self.load_config()["srt"]["tasks"])))
+
+        whole_file = [
+            [{"misc": [{"uses": "events_misc_remove_miscellaneous_events"}]}],
+            [{"selectors": [{"uses": "events_select_all", "id": "all"}]}],
+            [{"selectors": [{"uses": "info_select_current_info"}]}],
+            [
+                {
+                    "selectors": [{"uses": "events_select_all"}],
+                    "actions": [{"uses": "events_action_shift", "with": {"s": 1}}],
+                }
+            ],
+        ]
+        for workflow in whole_file:
+            self.assertFalse(is_streamable(compile_workflow(workflow)))
+
+    def test_unchanged_files_not_written(self):
+        test_file = Path(self.temp_dir) / "unchanged.ass"
+        ssafile = pysubs2.SSAFile()
+        ssafile.events.append(pysubs2.SSAEvent(text="Hello"))
+        ssafile.save(str(test_file))
+
+        formatter = SubtitleFormatter(str(self.config_path))
+        formatter.format(str(test_file))
+        processed = test_file.read_bytes()
+
+        # the workflow only sets info the file already has after the first run
+        os.utime(test_file, ns=(0, 0))
+        formatter.format(str(test_file))
+
+        self.assertEqual(test_file.stat().st_mtime_ns, 0)
+        self.assertEqual(test_file.read_bytes(), processed)
+
+    def test_processed_index(self):
+        index_file = str(Path(self.temp_dir) / "index.db")
+        files = {}
+        for ext in ("ass", "srt"):
+            files[ext] = Path(self.temp_dir) / f"indexed.{ext}"
+            ssafile = pysubs2.SSAFile()
+            ssafile.events.append(pysubs2.SSAEvent(text="Hello", style="Other"))
+            ssafile.save(str(files[ext]))
+
+        formatter = SubtitleFormatter(str(self.config_path), index_file)
+        for path in files.values():
+            formatter.format(str(path))
+
+        # a new formatter, e.g. after the exclusion list was reset
+        formatter = SubtitleFormatter(str(self.config_path), index_file)
+        with unittest.mock.patch("postprocessing.runner.WorkflowRunner") as runner:
+            for path in files.values():
+                self.assertEqual(formatter.format(str(path)), [str(path)])
+        runner.assert_not_called()
+
+        # modified content or another workflow is processed again
+        files["ass"].write_text(files["ass"].read_text().replace("Hello", "Bye"))
+        formatter.workflows["srt"].append({"misc": []})
+        formatter = SubtitleFormatter.from_workflows(formatter.workflows, index_file)
+        with unittest.mock.patch(
+            "postprocessing.runner.WorkflowRunner", wraps=WorkflowRunner
+        ) as runner:
+            for path in files.values():
+                formatter.format(str(path))
+        self.assertEqual(runner.call_count, 2)
+
+    def test_workflow_profiler(self):
+        workflows = {
+            "ass": [
+                {
+                    "selectors": [{"uses": "events_select_all"}],
+                    "filters": [
+                        {"uses": "events_filter_regex", "with": {"regex": "Hello"}},
+                        {"uses": "events_filter_regex", "with": {"regex": ".*1"}},
+                    ],
+                    "actions": [
+                        {"uses": "events_action_update_properties", "with": {"bold": True}}
+                    ],
+                }
+            ]
+        }
+
+        paths = []
+        for i in range(2):
+            paths.append(Path(self.temp_dir) / f"profiled{i}.ass")
+            ssafile = pysubs2.SSAFile()
+            for text in ("Hello 1", "Hello 2", "Bye 1"):
+                ssafile.events.append(pysubs2.SSAEvent(text=text))
+            ssafile.save(str(paths[-1]))
+
+        workflow_file = Path(self.temp_dir) / "profiled.yaml"
+        workflow_file.write_text(yaml.dump({"ass": {"tasks": workflows["ass"]}}))
+
+        profiler = WorkflowProfiler(cprofile=True)
+        self.addCleanup(profiler.close)
+        formatter = SubtitleFormatter(str(workflow_file), profiler=profiler)
+
+        for path in paths:
+            formatter.format(str(path))
+
+        profiles = {p.label: p for p in profiler.ranked()}
+        self.assertEqual(profiler.files, 2)
+        self.assertEqual(len(profiles), 3)
+
+        selector = profiles["ass step 1 selectors[0]: events_select_all"]
+        self.assertEqual((selector.calls, selector.items_in, selector.items_out), (2, 6, 6))
+
+        fused = profiles["ass step 1 filters[0]: events_filter_regex (fused x2)"]
+        self.assertEqual((fused.items_in, fused.items_out), (6, 2))
+
+        action = profiles["ass step 1 actions[0]: events_action_update_properties"]
+        self.assertEqual((action.calls, action.items_in, action.items_out), (2, 2, 2))
+
+        report = profiler.report().splitlines()
+        self.assertTrue(report[0].startswith("Workflow profile of 2 file(s)"))
+        self.assertEqual(len(report), 5)
+        self.assertIn(profiler.ranked()[0].label, report[2])
+
+        # the profiled tasks are kept when the workflow is loaded again
+        formatter = SubtitleFormatter(str(workflow_file), profiler=profiler)
+        formatter.format(str(paths[0]))
+        self.assertEqual(selector.calls, 3)
+
+        stats_file = str(Path(self.temp_dir) / "profile.pstats")
+        profiler.dump_stats(stats_file)
+        functions = {func for _, _, func in pstats.Stats(stats_file).stats}
+        self.assertIn("events_action_update_properties", functions)
+
+    def load_config(self) -> dict:
+        with open(self.config_path) as f:
+            return yaml.safe_load(f)
+
     def tearDown(self) -> None:
         # Clean up output files
         for f in self.output_files:
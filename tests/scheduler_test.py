@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from scheduler import FileEventScheduler
+
+
+class TestFileEventScheduler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "video.mkv")
+
+        with open(self.path, "wb") as f:
+            f.write(b"\x00" * 10)
+
+    def test_coalesce(self):
+        scheduler = FileEventScheduler(stability_window=0.05)
+
+        for _ in range(10):
+            scheduler.notify(self.path)
+
+        self.assertEqual(scheduler.pending(), 1)
+        self.assertEqual(scheduler.get(timeout=1), self.path)
+        self.assertIsNone(scheduler.get(timeout=0.1))
+
+    def test_wait_for_stable_file(self):
+        scheduler = FileEventScheduler(stability_window=0.2)
+        scheduler.notify(self.path)
+
+        def write():
+            # keep growing the file for a while, like a copy in progress
+            for _ in range(5):
+                time.sleep(0.1)
+                with open(self.path, "ab") as f:
+                    f.write(b"\x00" * 10)
+
+        writer = threading.Thread(target=write)
+        start = time.monotonic()
+        writer.start()
+
+        self.assertEqual(scheduler.get(timeout=5), self.path)
+        writer.join()
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.5)
+        self.assertEqual(os.path.getsize(self.path), 60)
+
+    def test_settled_and_missing(self):
+        scheduler = FileEventScheduler(stability_window=60)
+
+        scheduler.notify(os.path.join(self.temp_dir, "missing.mkv"), settled=True)
+        scheduler.notify(self.path, settled=True)
+
+        self.assertEqual(scheduler.get(timeout=1), self.path)
+        self.assertEqual(scheduler.pending(), 0)
+
+    def test_timeout(self):
+        scheduler = FileEventScheduler(stability_window=60)
+        scheduler.notify(self.path)
+
+        start = time.monotonic()
+        self.assertIsNone(scheduler.get(timeout=0.1))
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(scheduler.pending(), 1)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
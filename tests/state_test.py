@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from state import StateIndex
+
+
+class TestStateIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.media = os.path.join(self.temp_dir, "media")
+        self.db = os.path.join(self.temp_dir, "state.db")
+
+        for season in ("season 1", "season 2"):
+            os.makedirs(os.path.join(self.media, season))
+            for name in ("1.mkv", "2.mkv", "cover.jpg"):
+                self.write(os.path.join(self.media, season, name), b"data")
+
+    def write(self, path: str, data: bytes):
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def scan(self, index: StateIndex) -> list[str]:
+        files = sorted(index.scan(self.media, ["mkv"]))
+        index.record(files)
+        return files
+
+    def test_incremental_scan(self):
+        index = StateIndex(self.db, "extractor", "v1")
+
+        self.assertEqual(len(self.scan(index)), 4)
+        self.assertEqual(self.scan(index), [])
+
+        # new and replaced files are dispatched
+        new = os.path.join(self.media, "season 2", "3.mkv")
+        self.write(new, b"data")
+        replaced = os.path.join(self.media, "season 1", "1.mkv")
+        self.write(replaced + ".part", b"new data")
+        os.replace(replaced + ".part", replaced)
+
+        self.assertEqual(self.scan(index), [replaced, new])
+        self.assertEqual(self.scan(index), [])
+
+    def test_unchanged_directories_not_listed(self):
+        index = StateIndex(self.db, "extractor", "v1")
+        self.scan(index)
+
+        self.write(os.path.join(self.media, "season 2", "3.mkv"), b"data")
+
+        with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+            self.scan(index)
+
+        listed = [call.args[0] for call in scandir.call_args_list]
+        self.assertEqual(listed, [os.path.join(self.media, "season 2")])
+
+    def test_config_change(self):
+        self.scan(StateIndex(self.db, "extractor", "v1"))
+
+        self.assertEqual(len(self.scan(StateIndex(self.db, "extractor", "v2"))), 4)
+        self.assertEqual(len(self.scan(StateIndex(self.db, "postprocessor", "v1"))), 4)
+        self.assertEqual(self.scan(StateIndex(self.db, "extractor", "v2")), [])
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
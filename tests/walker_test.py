@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from walker import walk_files
+
+
+class TestWalkFiles(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.expected = []
+
+        for i in range(5):
+            directory = os.path.join(self.temp_dir, f"season {i}", "extras")
+            os.makedirs(directory)
+
+            for name in (f"episode {i}.mkv", f"EPISODE {i}.MP4", f"episode {i}.nfo"):
+                for d in (directory, os.path.dirname(directory)):
+                    path = os.path.join(d, name)
+                    open(path, "w").close()
+
+                    if not name.endswith(".nfo"):
+                        self.expected.append(path)
+
+    def test_walk(self):
+        files = list(walk_files(self.temp_dir, ["mkv", "mp4"], workers=4))
+
+        self.assertEqual(len(files), len(set(files)))
+        self.assertEqual(sorted(files), sorted(self.expected))
+
+    def test_symlinked_directory_not_followed(self):
+        os.symlink(
+            os.path.join(self.temp_dir, "season 0"), os.path.join(self.temp_dir, "link")
+        )
+
+        files = list(walk_files(self.temp_dir, ["mkv", "mp4"]))
+        self.assertEqual(sorted(files), sorted(self.expected))
+
+    def test_stop_early(self):
+        walker = walk_files(self.temp_dir, ["mkv"], workers=2)
+        self.assertTrue(next(walker).endswith(".mkv"))
+        walker.close()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
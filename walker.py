@@ -0,0 +1,96 @@
+"""
+Parallel, streaming directory traversal.
+"""
+
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# directories scanned concurrently, listing is I/O bound (e.g. on network mounts)
+DEFAULT_WALK_WORKERS = 8
+
+
+def walk_files(
+    path: str, extensions: Iterable[str], workers: int = DEFAULT_WALK_WORKERS
+) -> Iterator[str]:
+    """
+    Recursively find files with the given extensions.
+
+    Subdirectories are listed concurrently with os.scandir and files are yielded
+    as soon as their directory has been listed, so callers can start working
+    while the walk is still running. Like os.walk, symlinks to directories are
+    not followed and unreadable directories are skipped. The order of the files
+    is not defined.
+
+    Args:
+        path: Directory to walk
+        extensions: File extensions to match, without dot and case-insensitive
+        workers: Number of directories listed concurrently
+
+    Yields:
+        Paths of the matching files
+    """
+    suffixes = {"." + ext.lower().lstrip(".") for ext in extensions}
+
+    results: queue.SimpleQueue[list[str] | None] = queue.SimpleQueue()
+    stop = threading.Event()
+    pending = 1
+    pending_lock = threading.Lock()
+
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="walker")
+
+    def scan(directory: str):
+        nonlocal pending
+        files = []
+
+        try:
+            if not stop.is_set():
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        try:
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            is_dir = False
+
+                        if is_dir:
+                            if not entry.is_symlink():
+                                with pending_lock:
+                                    pending += 1
+                                executor.submit(scan, entry.path)
+                        elif os.path.splitext(entry.name)[1].lower() in suffixes:
+                            files.append(entry.path)
+
+        except OSError as e:
+            logger.debug(f"Skipping unreadable directory {directory}: {e}")
+
+        except RuntimeError:
+            # executor was shut down because the consumer stopped early
+            pass
+
+        finally:
+            results.put(files)
+
+            with pending_lock:
+                pending -= 1
+                done = pending == 0
+
+            if done:
+                results.put(None)
+
+    executor.submit(scan, path)
+
+    try:
+        while True:
+            files = results.get()
+            if files is None:
+                break
+
+            yield from files
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)